@@ -5,12 +5,15 @@ YouTube RSS监控系统 - 自动定时监控
 每小时自动检查频道更新并加入数据库
 """
 
+import os
 import time
+import socket
 import schedule
 import logging
 import signal
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
+from config import Config
 from main_rss import YouTubeMonitorRSS
 
 # 配置日志
@@ -29,6 +32,8 @@ class AutoMonitor:
     def __init__(self):
         self.monitor = YouTubeMonitorRSS()
         self.running = True
+        self.interval_hours = 1
+        self.worker_id = Config.WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
         
         # 设置信号处理器，优雅退出
         signal.signal(signal.SIGINT, self.signal_handler)
@@ -39,20 +44,22 @@ class AutoMonitor:
         print(f"\n收到退出信号 {signum}，正在停止监控...")
         self.running = False
     
-    def check_updates_job(self):
+    def check_updates_job(self, spread: bool = True):
         """定时任务：检查更新"""
         try:
             print(f"\n🔍 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始自动检查更新...")
             logger.info("开始自动检查更新")
             
-            # 执行更新检查
-            result = self.monitor.check_channel_updates()
+            # 执行更新检查，把频道请求分散到检查间隔的一部分时间内
+            spread_seconds = self.interval_hours * 3600 * Config.POLL_SPREAD_RATIO if spread else 0
+            result = self.monitor.check_channel_updates(spread_seconds=spread_seconds)
             
             total_channels = result.get('total_channels', 0)
             total_new_videos = result.get('total_new_videos', 0)
+            elapsed_seconds = result.get('elapsed_seconds', 0)
             
-            print(f"✅ 检查完成: {total_channels} 个频道, 发现 {total_new_videos} 个新视频")
-            logger.info(f"自动检查完成: {total_channels} 个频道, {total_new_videos} 个新视频")
+            print(f"✅ 检查完成: {total_channels} 个频道, 发现 {total_new_videos} 个新视频, 耗时 {elapsed_seconds:.1f} 秒")
+            logger.info(f"自动检查完成: {total_channels} 个频道, {total_new_videos} 个新视频, 耗时 {elapsed_seconds} 秒")
             
             if total_new_videos > 0:
                 print(f"🎉 发现 {total_new_videos} 个新视频已添加到数据库!")
@@ -62,23 +69,137 @@ class AutoMonitor:
             print(f"❌ {error_msg}")
             logger.error(error_msg)
     
-    def start_monitoring(self, interval_hours: int = 1):
+    def check_due_channels_job(self):
+        """定时任务：只检查到期的频道（自适应调度）"""
+        try:
+            result = self.monitor.check_channel_updates(due_only=True)
+            
+            total_channels = result.get('total_channels', 0)
+            total_new_videos = result.get('total_new_videos', 0)
+            
+            if total_channels > 0:
+                logger.info(f"自适应检查完成: {total_channels} 个到期频道, {total_new_videos} 个新视频")
+            
+            if total_new_videos > 0:
+                print(f"🎉 发现 {total_new_videos} 个新视频已添加到数据库!")
+            
+        except Exception as e:
+            error_msg = f"自适应检查失败: {e}"
+            print(f"❌ {error_msg}")
+            logger.error(error_msg)
+    
+    def check_shards_job(self, adaptive: bool = False):
+        """多节点定时任务：逐个领取分片租约并检查分片内的频道，直到没有可领取的分片"""
+        try:
+            # 本轮只领取开始前就到期的分片，自适应模式下刚释放的分片不会在同一轮被反复领取
+            pass_start = datetime.now()
+            shards = total_channels = total_new_videos = 0
+            busy_seconds = 0.0
+            
+            while self.running:
+                lease = self.monitor.db.claim_shard_lease(self.worker_id, Config.LEASE_SECONDS,
+                                                          ready_before=pass_start)
+                if not lease:
+                    break
+                
+                channels, new_videos, elapsed = self._check_shard(lease, adaptive)
+                shards += 1
+                total_channels += channels
+                total_new_videos += new_videos
+                busy_seconds += elapsed
+            
+            if shards == 0:
+                return
+            
+            rate = total_channels / busy_seconds if busy_seconds > 0 else 0
+            print(f"✅ 节点 {self.worker_id}: {shards} 个分片, {total_channels} 个频道, "
+                  f"发现 {total_new_videos} 个新视频, {rate:.1f} 频道/秒")
+            logger.info(f"分片检查完成: {shards} 个分片, {total_channels} 个频道, {total_new_videos} 个新视频, "
+                        f"耗时 {busy_seconds:.1f} 秒, {rate:.1f} 频道/秒")
+            
+            if total_new_videos > 0:
+                print(f"🎉 发现 {total_new_videos} 个新视频已添加到数据库!")
+            
+        except Exception as e:
+            error_msg = f"分片检查失败: {e}"
+            print(f"❌ {error_msg}")
+            logger.error(error_msg)
+    
+    def _check_shard(self, lease: dict, adaptive: bool):
+        """检查一个已领取分片内的频道并释放租约，返回 (频道数, 新视频数, 耗时秒数)"""
+        db = self.monitor.db
+        shard = lease['shard']
+        started = time.perf_counter()
+        
+        channels = db.get_shard_channels(shard, due_only=adaptive)
+        result = {}
+        if channels:
+            result = self.monitor.check_channel_updates(channels=channels, progress=self._lease_renewer(shard))
+        new_videos = result.get('total_new_videos', 0)
+        
+        # 自适应模式由各频道的下次检查时间决定，分片下一轮就可以再领取；定时模式下一个间隔后再领取
+        if adaptive:
+            next_run_at = datetime.now()
+        else:
+            next_run_at = lease['claimed_at'] + timedelta(hours=self.interval_hours)
+        if not db.release_shard_lease(shard, self.worker_id, next_run_at):
+            logger.warning(f"分片 {shard} 的租约已过期并被其他节点接管")
+        
+        elapsed = time.perf_counter() - started
+        db.record_worker_stats(self.worker_id, 1, len(channels), new_videos, elapsed)
+        return len(channels), new_videos, elapsed
+    
+    def _lease_renewer(self, shard: int):
+        """进度回调：检查分片期间定期续租，耗时较长的分片不会被其他节点当作崩溃接管"""
+        last_renewed = time.monotonic()
+        
+        def renew(done, total, new_videos):
+            nonlocal last_renewed
+            if time.monotonic() - last_renewed < Config.LEASE_SECONDS / 3:
+                return
+            last_renewed = time.monotonic()
+            if not self.monitor.db.renew_shard_lease(shard, self.worker_id, Config.LEASE_SECONDS):
+                logger.warning(f"分片 {shard} 续租失败，租约可能已被其他节点接管")
+        
+        return renew
+    
+    def start_monitoring(self, interval_hours: int = 1, adaptive: bool = False, shared: bool = False):
         """开始自动监控"""
+        self.interval_hours = interval_hours
         print("🎬 YouTube RSS自动监控系统")
         print("=" * 50)
-        print(f"⏰ 监控间隔: 每 {interval_hours} 小时")
+        if adaptive:
+            print(f"⏰ 自适应调度: 每 {Config.SCHEDULE_TICK_MINUTES} 分钟检查到期频道")
+        else:
+            print(f"⏰ 监控间隔: 每 {interval_hours} 小时")
+        if shared:
+            print(f"🤝 多节点分片: 节点 {self.worker_id}，每 {Config.SCHEDULE_TICK_MINUTES} 分钟领取空闲分片")
         print(f"🕐 开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("💡 按 Ctrl+C 停止监控")
         print("=" * 50)
         
         # 立即执行一次检查
         print("🚀 执行首次检查...")
-        self.check_updates_job()
+        if shared:
+            self.check_shards_job(adaptive)
+        elif adaptive:
+            self.check_due_channels_job()
+        else:
+            self.check_updates_job()
         
         # 设置定时任务
-        schedule.every(interval_hours).hours.do(self.check_updates_job)
-        
-        logger.info(f"自动监控启动，间隔 {interval_hours} 小时")
+        if shared:
+            # 各节点都定期领取空闲分片；分片何时可再领取由租约的 next_run_at 决定，不会重复检查
+            schedule.every(Config.SCHEDULE_TICK_MINUTES).minutes.do(self.check_shards_job, adaptive)
+            logger.info(f"自动监控启动，多节点分片模式（节点 {self.worker_id}），"
+                        f"每 {Config.SCHEDULE_TICK_MINUTES} 分钟领取空闲分片")
+        elif adaptive:
+            # 每个频道的检查间隔根据其发布频率计算，这里只需定期检查哪些频道到期
+            schedule.every(Config.SCHEDULE_TICK_MINUTES).minutes.do(self.check_due_channels_job)
+            logger.info(f"自动监控启动，自适应调度，每 {Config.SCHEDULE_TICK_MINUTES} 分钟检查到期频道")
+        else:
+            schedule.every(interval_hours).hours.do(self.check_updates_job)
+            logger.info(f"自动监控启动，间隔 {interval_hours} 小时")
         
         # 主循环
         try:
@@ -120,15 +241,42 @@ class AutoMonitor:
                 for i, channel in enumerate(channels, 1):
                     print(f"  {i}. {channel['channel_name']}")
             
+            self.show_worker_status()
+            
         except Exception as e:
             print(f"❌ 获取状态失败: {e}")
 
+    def show_worker_status(self):
+        """显示多节点分片轮询的租约和各节点处理量（最近一天活跃的节点）"""
+        db = self.monitor.db
+        workers = db.get_worker_stats(active_since=datetime.now() - timedelta(days=1))
+        if not workers:
+            return
+        
+        now = datetime.now()
+        held = {}
+        for lease in db.get_shard_leases():
+            if lease.get('owner') and lease['expires_at'] > now:
+                held[lease['owner']] = held.get(lease['owner'], 0) + 1
+        
+        print()
+        print("🤝 轮询节点:")
+        for worker in workers:
+            busy_seconds = worker.get('busy_seconds') or 0
+            rate = worker['channels_checked'] / busy_seconds if busy_seconds > 0 else 0
+            print(f"  {worker['worker_id']}: 持有 {held.get(worker['worker_id'], 0)} 个分片, "
+                  f"累计 {worker['shards_processed']} 个分片 / {worker['channels_checked']} 个频道 / "
+                  f"{worker['new_videos']} 个新视频, {rate:.1f} 频道/秒, "
+                  f"最近活跃 {worker['last_seen_at'].strftime('%Y-%m-%d %H:%M:%S')}")
+
 def main():
     """主函数"""
     import argparse
     
     parser = argparse.ArgumentParser(description='YouTube RSS自动监控系统')
     parser.add_argument('--hours', type=int, default=1, help='监控间隔小时数 (默认: 1)')
+    parser.add_argument('--adaptive', action='store_true', help='按频道发布频率自适应调度检查')
+    parser.add_argument('--shared', action='store_true', help='多节点分片：与其他节点通过数据库租约分担频道')
     parser.add_argument('--status', action='store_true', help='显示当前状态')
     parser.add_argument('--test', action='store_true', help='执行一次测试检查')
     
@@ -143,10 +291,10 @@ def main():
         elif args.test:
             # 测试检查
             print("🧪 执行测试检查...")
-            auto_monitor.check_updates_job()
+            auto_monitor.check_updates_job(spread=False)
         else:
             # 开始自动监控
-            auto_monitor.start_monitoring(args.hours)
+            auto_monitor.start_monitoring(args.hours, adaptive=args.adaptive, shared=args.shared)
             
     except Exception as e:
         print(f"❌ 程序执行失败: {e}")
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查周期基准测试
+本地模拟YouTube（feed和频道页面，可配置延迟、错误率、更新比例和304比例），对 N 个频道完整运行
+check_channel_updates，统计每秒检查的频道数、每个频道的MongoDB操作数和峰值内存（RSS），
+结果可追加到JSONL文件中，便于对比不同版本的性能
+
+用法:
+    python3 benchmarks/bench_check_cycle.py [--channels 100,1000,10000] [--cycles 3] [--latency-ms 50]
+        [--error-rate 0] [--update-ratio 0.1] [--etag-ratio 0.8] [--workers 8] [--db mongodb|mongomock]
+        [--output benchmarks/results.jsonl]
+默认使用 MONGODB_URL 上单独的 youtube_monitor_bench 数据库（每次运行前后删除）；
+--db mongomock 使用内存中的mongomock（pip install mongomock），不需要MongoDB服务，但数据库耗时与真实情况差别很大
+
+单独启动模拟服务（手动测试用）:
+    python3 benchmarks/bench_check_cycle.py --serve 8765
+    YOUTUBE_BASE_URL=http://127.0.0.1:8765 python3 main_rss.py add @bench0
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+FEED_ENTRIES = 15  # YouTube的feed只包含最新的15个视频
+BENCH_DATABASE = 'youtube_monitor_bench'
+
+
+# ===== 模拟的YouTube =====
+def bench_channel_id(index: int) -> str:
+    return f"UCbench{index:017d}"
+
+
+def ratio_hit(key: str, ratio: float) -> bool:
+    """按键的哈希稳定地选出 ratio 比例（每次运行选出的频道相同）"""
+    return zlib.crc32(key.encode('utf-8')) % 10000 < ratio * 10000
+
+
+def build_feed(channel_id: str, total_videos: int) -> bytes:
+    """生成与YouTube格式相同的feed，包含最新的 FEED_ENTRIES 个视频"""
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    entries = []
+    for n in range(total_videos - 1, max(total_videos - FEED_ENTRIES, 0) - 1, -1):
+        video_id = f"{channel_id[-7:]}{n:04d}"
+        published = (base + timedelta(hours=6 * n)).isoformat()
+        entries.append(f"""
+ <entry>
+  <id>yt:video:{video_id}</id>
+  <yt:videoId>{video_id}</yt:videoId>
+  <yt:channelId>{channel_id}</yt:channelId>
+  <title>Benchmark video {n}</title>
+  <link rel="alternate" href="https://www.youtube.com/watch?v={video_id}"/>
+  <author><name>Bench {channel_id}</name><uri>https://www.youtube.com/channel/{channel_id}</uri></author>
+  <published>{published}</published>
+  <updated>{published}</updated>
+  <media:group>
+   <media:title>Benchmark video {n}</media:title>
+   <media:content url="https://www.youtube.com/v/{video_id}?version=3" type="application/x-shockwave-flash" width="640" height="390"/>
+   <media:thumbnail url="https://i.ytimg.com/vi/{video_id}/hqdefault.jpg" width="480" height="360"/>
+   <media:description>Synthetic video {n} of {channel_id}</media:description>
+   <media:community><media:starRating count="10" average="5.00" min="1" max="5"/><media:statistics views="{n * 100}"/></media:community>
+  </media:group>
+ </entry>""")
+
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns:media="http://search.yahoo.com/mrss/" xmlns="http://www.w3.org/2005/Atom">
+ <link rel="self" href="http://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"/>
+ <id>yt:channel:{channel_id}</id>
+ <yt:channelId>{channel_id}</yt:channelId>
+ <title>Bench {channel_id}</title>
+ <link rel="alternate" href="https://www.youtube.com/channel/{channel_id}"/>
+ <author><name>Bench {channel_id}</name><uri>https://www.youtube.com/channel/{channel_id}</uri></author>
+ <published>2020-01-01T00:00:00+00:00</published>{''.join(entries)}
+</feed>""".encode('utf-8')
+
+
+class StubYouTubeHandler(BaseHTTPRequestHandler):
+    """/feeds/videos.xml 按当前周期返回feed（或304/500），/@handle、/c/name 返回带channelId的页面；
+    POST /_bench/cycle?n=K 切换到第K个周期并清零计数，GET /_bench/stats 返回本周期各状态码的响应数"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/_bench/stats':
+            with self.server.lock:
+                body = json.dumps(self.server.status_counts).encode('utf-8')
+            self._send(200, body, 'application/json', count=False)
+            return
+
+        options = self.server.options
+        if options.latency_ms:
+            time.sleep(options.latency_ms / 1000 * random.uniform(0.5, 1.5))
+
+        if url.path == '/feeds/videos.xml':
+            channel_id = parse_qs(url.query).get('channel_id', [''])[0]
+            self._send_feed(channel_id)
+            return
+
+        match = re.match(r'^/(?:@|c/)bench(\d+)$', url.path)
+        if match:
+            page = f'<html><script>var ytInitialData = {{"channelId":"{bench_channel_id(int(match.group(1)))}"}};</script></html>'
+            self._send(200, page.encode('utf-8'), 'text/html; charset=utf-8')
+            return
+
+        self._send(404, b'not found', 'text/plain')
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/_bench/cycle':
+            self.server.generation.value = int(parse_qs(url.query).get('n', ['0'])[0])
+            with self.server.lock:
+                self.server.status_counts = {}
+            self._send(200, b'ok', 'text/plain', count=False)
+            return
+        self._send(404, b'not found', 'text/plain')
+
+    def _send_feed(self, channel_id: str):
+        options = self.server.options
+        generation = self.server.generation.value
+        if not channel_id.startswith('UCbench'):
+            self._send(404, b'not found', 'text/plain')
+            return
+        if ratio_hit(f"error:{channel_id}:{generation}", options.error_rate):
+            self._send(500, b'internal error', 'text/plain')
+            return
+
+        # 每个周期有 update_ratio 比例的频道发布一个新视频
+        total_videos = FEED_ENTRIES + sum(
+            1 for cycle in range(1, generation + 1) if ratio_hit(f"update:{channel_id}:{cycle}", options.update_ratio)
+        )
+        headers = {}
+        if ratio_hit(f"etag:{channel_id}", options.etag_ratio):
+            etag = f'"{channel_id}-{total_videos}"'
+            if self.headers.get('If-None-Match') == etag:
+                self._send(304, b'', None, {'ETag': etag})
+                return
+            headers['ETag'] = etag
+
+        self._send(200, build_feed(channel_id, total_videos), 'text/xml; charset=UTF-8', headers)
+
+    def _send(self, status: int, body: bytes, content_type: str = None, headers: dict = None, count: bool = True):
+        if count:
+            with self.server.lock:
+                self.server.status_counts[str(status)] = self.server.status_counts.get(str(status), 0) + 1
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_stub(options, port: int, generation, ready=None):
+    """运行模拟服务（在单独的进程中，不与被测代码争用GIL，也不计入被测进程的内存）"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubYouTubeHandler)
+    server.daemon_threads = True
+    server.options = options
+    server.generation = generation
+    server.status_counts = {}
+    server.lock = threading.Lock()
+    if ready is not None:
+        ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+# ===== 数据库操作计数 =====
+class MongoOpCounter:
+    """统计发往MongoDB的命令数（不含握手、心跳等连接维护命令）"""
+    IGNORED_COMMANDS = {'hello', 'ismaster', 'isMaster', 'ping', 'buildInfo', 'endSessions',
+                        'saslStart', 'saslContinue', 'killCursors'}
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, n: int = 1):
+        with self._lock:
+            self.count += n
+
+    def take(self) -> int:
+        with self._lock:
+            count, self.count = self.count, 0
+            return count
+
+
+def count_pymongo_commands(counter: MongoOpCounter):
+    """通过pymongo的命令监听统计真实MongoDB的操作数（getMore也计入）"""
+    from pymongo import monitoring
+
+    class Listener(monitoring.CommandListener):
+        def started(self, event):
+            if event.command_name not in MongoOpCounter.IGNORED_COMMANDS:
+                counter.add()
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    monitoring.register(Listener())
+
+
+def use_mongomock(counter: MongoOpCounter):
+    """用mongomock代替MongoDB，按集合方法的调用次数计数"""
+    import mongomock
+    import database_mongodb
+    from config import Config
+    from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+    client = mongomock.MongoClient()
+    # mongomock不支持固定集合，预先把events建成普通集合
+    client[Config.MONGODB_DATABASE].create_collection('events')
+    database_mongodb.MongoClient = lambda *args, **kwargs: client
+
+    collection = mongomock.collection.Collection
+    methods = ['find', 'find_one', 'find_one_and_update', 'find_one_and_delete', 'insert_one', 'insert_many',
+               'replace_one', 'update_one', 'update_many', 'delete_one', 'delete_many', 'aggregate',
+               'count_documents', 'estimated_document_count', 'bulk_write']
+    originals = {name: getattr(collection, name) for name in methods}
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        # mongomock 4.x 的bulk_write不兼容新版pymongo的操作对象，这里逐条执行
+        upserted_ids, modified = {}, 0
+        for i, op in enumerate(requests):
+            if isinstance(op, InsertOne):
+                originals['insert_one'](self, op._doc)
+                continue
+            if isinstance(op, ReplaceOne):
+                result = originals['replace_one'](self, op._filter, op._doc, upsert=op._upsert)
+            elif isinstance(op, UpdateMany):
+                result = originals['update_many'](self, op._filter, op._doc, upsert=op._upsert)
+            elif isinstance(op, UpdateOne):
+                result = originals['update_one'](self, op._filter, op._doc, upsert=op._upsert)
+            elif isinstance(op, DeleteOne):
+                originals['delete_one'](self, op._filter)
+                continue
+            else:
+                raise NotImplementedError(type(op).__name__)
+            modified += result.modified_count
+            if result.upserted_id is not None:
+                upserted_ids[i] = result.upserted_id
+        return SimpleNamespace(upserted_ids=upserted_ids, modified_count=modified)
+
+    originals['bulk_write'] = bulk_write
+
+    def counted(method):
+        def wrapper(*args, **kwargs):
+            counter.add()
+            return method(*args, **kwargs)
+        return wrapper
+
+    for name, method in originals.items():
+        setattr(collection, name, counted(method))
+
+
+def peak_rss_mb() -> float:
+    """本进程的峰值内存（MB）"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# ===== 单次运行（在子进程中，峰值内存互不影响） =====
+def run_single(options, base_url: str) -> dict:
+    """对 options.single 个频道运行 options.cycles 个检查周期"""
+    from config import Config
+
+    Config.STORAGE_BACKEND = 'mongodb'
+    Config.MONGODB_DATABASE = options.database
+    Config.YOUTUBE_BASE_URL = base_url
+    Config.POLL_WORKERS = options.workers
+    Config.RATE_LIMIT_PER_SECOND = options.rate or 1e9
+    Config.RATE_LIMIT_BURST = options.rate or 1e9
+    Config.THUMBNAIL_PREFETCH = False
+
+    counter = MongoOpCounter()
+    if options.db == 'mongomock':
+        use_mongomock(counter)
+    else:
+        count_pymongo_commands(counter)
+
+    import logging
+    from main_rss import YouTubeMonitorRSS
+    # 检查周期会逐个频道输出日志，测试时只保留严重错误
+    logging.disable(logging.ERROR)
+
+    monitor = YouTubeMonitorRSS()
+    if options.db == 'mongodb':
+        # 清掉上次中断时残留的数据，重新建集合和索引
+        monitor.db.client.drop_database(options.database)
+        monitor.db.migrate()
+
+    count = options.single
+    for start in range(0, count, 1000):
+        monitor.db.add_channels([
+            {
+                'channel_id': bench_channel_id(i),
+                'channel_name': f"Bench {i}",
+                'channel_url': f"https://www.youtube.com/channel/{bench_channel_id(i)}"
+            }
+            for i in range(start, min(start + 1000, count))
+        ])
+    rss_before = peak_rss_mb()
+
+    import requests
+    cycles = []
+    for cycle in range(options.cycles):
+        requests.post(f"{base_url}/_bench/cycle?n={cycle}", timeout=10)
+        counter.take()
+
+        started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = monitor.check_channel_updates()
+        elapsed = time.perf_counter() - started
+        responses = requests.get(f"{base_url}/_bench/stats", timeout=10).json()
+
+        channel_results = result.get('channel_results', [])
+        cycles.append({
+            'cycle': cycle,
+            'elapsed_seconds': round(elapsed, 3),
+            'channels_per_second': round(count / elapsed, 1),
+            'db_ops_per_channel': round(counter.take() / count, 2),
+            'new_videos': result.get('total_new_videos', 0),
+            'not_modified': result.get('not_modified_count', 0),
+            'unchanged': result.get('hash_hit_count', 0),
+            'errors': sum(1 for r in channel_results if r['status'] == 'error' or r['fetch_status'] == 'failed'),
+            # 模拟服务收到的请求数（包括重试和curl兜底），以及其中返回5xx的次数
+            'requests_per_channel': round(sum(responses.values()) / count, 2),
+            'server_errors': sum(n for status, n in responses.items() if status.startswith('5'))
+        })
+
+    if options.db == 'mongodb':
+        monitor.db.client.drop_database(options.database)
+    monitor.db.close_connection()
+
+    return {
+        'channels': count,
+        'rss_after_seed_mb': round(rss_before, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'cycles': cycles
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检查周期基准测试')
+    parser.add_argument('--channels', default='100,1000,10000', help='频道数，逗号分隔 (默认: 100,1000,10000)')
+    parser.add_argument('--cycles', type=int, default=3, help='每组运行的检查周期数，第1个周期为冷启动 (默认: 3)')
+    parser.add_argument('--latency-ms', type=float, default=50, help='模拟服务的平均响应延迟 (默认: 50)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='每个周期返回500的频道比例 (默认: 0)')
+    parser.add_argument('--update-ratio', type=float, default=0.1, help='每个周期发布新视频的频道比例 (默认: 0.1)')
+    parser.add_argument('--etag-ratio', type=float, default=0.8,
+                        help='返回ETag（未变化时304）的频道比例，其余靠内容哈希判断 (默认: 0.8)')
+    parser.add_argument('--workers', type=int, default=8, help='并发检查的线程数 POLL_WORKERS (默认: 8)')
+    parser.add_argument('--rate', type=float, default=0, help='每秒请求数限制，0为不限制 (默认: 0)')
+    parser.add_argument('--db', choices=['mongodb', 'mongomock'], default='mongodb', help='数据库 (默认: mongodb)')
+    parser.add_argument('--database', default=BENCH_DATABASE, help=f'测试用的数据库名，会被删除 (默认: {BENCH_DATABASE})')
+    parser.add_argument('--output', help='把结果追加到该JSONL文件')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='只启动模拟服务')
+    parser.add_argument('--single', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.database in ('youtube_monitor', os.getenv('MONGODB_DATABASE')):
+        print(f"❌ 测试会删除数据库 {args.database}，请使用单独的数据库名")
+        sys.exit(1)
+
+    if args.single:
+        print(json.dumps(run_single(args, args.base_url)))
+        return
+
+    if args.serve:
+        print(f"🌐 模拟服务: http://127.0.0.1:{args.serve} (频道 @bench0、@bench1 ...)")
+        serve_stub(args, args.serve, multiprocessing.Value('i', 0))
+        return
+
+    sizes = [int(value) for value in args.channels.split(',') if value.strip()]
+    if args.db == 'mongomock' and max(sizes) > 500:
+        print("⚠️ mongomock的查询都是全集合扫描，频道数超过几百时主要在测mongomock本身，吞吐量请以真实MongoDB为准")
+
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve_stub, args=(args, 0, multiprocessing.Value('i', 0), ready),
+                                     daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{ready.get(timeout=30)}"
+
+    print(f"🚀 延迟 {args.latency_ms}ms, 错误率 {args.error_rate}, 更新比例 {args.update_ratio}, "
+          f"ETag比例 {args.etag_ratio}, 并发 {args.workers}, 数据库 {args.db}")
+    print(f"{'频道数':>8}{'周期':>6}{'耗时(s)':>10}{'频道/秒':>10}{'DB操作/频道':>12}"
+          f"{'新视频':>8}{'304':>7}{'哈希命中':>8}{'错误':>6}{'请求/频道':>10}{'5xx':>6}{'峰值RSS(MB)':>13}")
+    print("-" * 108)
+
+    records = []
+    try:
+        for count in sizes:
+            # 每组在单独的子进程中运行，峰值内存互不影响
+            command = [sys.executable, os.path.abspath(__file__), '--single', str(count), '--base-url', base_url]
+            for name in ('cycles', 'workers', 'rate', 'db', 'database'):
+                command += [f"--{name}", str(getattr(args, name))]
+            completed = subprocess.run(command, capture_output=True, text=True, cwd=REPO_DIR)
+            if completed.returncode != 0:
+                print(f"❌ {count} 个频道的测试失败:\n{completed.stderr[-2000:]}")
+                continue
+
+            record = json.loads(completed.stdout.strip().splitlines()[-1])
+            records.append(record)
+            for cycle in record['cycles']:
+                print(f"{count:>8}{cycle['cycle']:>6}{cycle['elapsed_seconds']:>10.2f}{cycle['channels_per_second']:>10.1f}"
+                      f"{cycle['db_ops_per_channel']:>12.2f}{cycle['new_videos']:>8}{cycle['not_modified']:>7}"
+                      f"{cycle['unchanged']:>8}{cycle['errors']:>6}{cycle['requests_per_channel']:>10.2f}"
+                      f"{cycle['server_errors']:>6}{record['peak_rss_mb']:>13.1f}")
+    finally:
+        server.terminate()
+
+    if args.output and records:
+        options = {name: getattr(args, name) for name in
+                   ('latency_ms', 'error_rate', 'update_ratio', 'etag_ratio', 'workers', 'rate', 'db')}
+        with open(args.output, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps({
+                    'time': datetime.now().isoformat(timespec='seconds'),
+                    'revision': git_revision(),
+                    'options': options,
+                    **record
+                }, ensure_ascii=False) + '\n')
+        print(f"\n📝 结果已追加到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RSS解析微基准测试
+对比原 ElementTree 全量解析与 feed_parser 流式解析的耗时
+
+用法: python3 benchmarks/bench_feed_parser.py [--repeat 2000] [--max-results 20]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import timeit
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feed_parser import parse_feed, parse_datetime
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def legacy_parse(xml_content: bytes, channel_id: str, max_results: int = 50):
+    """原 YouTubeRSSMonitor.get_latest_videos 中的解析逻辑（作为对照）"""
+    root = ET.fromstring(xml_content)
+
+    ns = {
+        'atom': 'http://www.w3.org/2005/Atom',
+        'yt': 'http://www.youtube.com/xml/schemas/2015',
+        'media': 'http://search.yahoo.com/mrss/'
+    }
+
+    videos = []
+    entries = root.findall('.//atom:entry', ns)
+
+    for entry in entries[:max_results]:
+        video_id = entry.find('.//yt:videoId', ns)
+        title = entry.find('.//atom:title', ns)
+        published = entry.find('.//atom:published', ns)
+        updated = entry.find('.//atom:updated', ns)
+        link = entry.find('.//atom:link[@rel="alternate"]', ns)
+
+        media_group = entry.find('.//media:group', ns)
+        description = None
+        thumbnail_url = None
+
+        if media_group is not None:
+            desc_elem = media_group.find('.//media:description', ns)
+            if desc_elem is not None:
+                description = desc_elem.text
+
+            thumb_elem = media_group.find('.//media:thumbnail', ns)
+            if thumb_elem is not None:
+                thumbnail_url = thumb_elem.get('url')
+
+        videos.append({
+            'video_id': video_id.text if video_id is not None else '',
+            'channel_id': channel_id,
+            'title': title.text if title is not None else 'Unknown',
+            'description': description or '',
+            'video_url': link.get('href') if link is not None else '',
+            'published_at': parse_datetime(published.text) if published is not None else datetime.now(),
+            'updated_at': parse_datetime(updated.text) if updated is not None else datetime.now(),
+            'thumbnail_url': thumbnail_url,
+            'duration': None,
+            'view_count': None,
+            'like_count': None,
+            'comment_count': None
+        })
+
+    return videos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RSS解析微基准测试')
+    parser.add_argument('--repeat', type=int, default=2000, help='每个fixture解析次数 (默认: 2000)')
+    parser.add_argument('--max-results', type=int, default=20, help='解析的最大条目数 (默认: 20)')
+    args = parser.parse_args()
+
+    fixtures = sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.xml')))
+    if not fixtures:
+        print(f"❌ 没有找到fixture: {FIXTURES_DIR}")
+        sys.exit(1)
+
+    print(f"{'fixture':<28}{'大小':>10}{'ElementTree(µs)':>18}{'iterparse(µs)':>16}{'加速比':>8}")
+    print("-" * 80)
+
+    for path in fixtures:
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        # 先校验两种解析结果一致
+        legacy = legacy_parse(content, 'UCbench', args.max_results)
+        streaming = parse_feed(content, 'UCbench', args.max_results)
+        if legacy != streaming:
+            print(f"❌ 解析结果不一致: {os.path.basename(path)}")
+            sys.exit(1)
+
+        legacy_time = min(timeit.repeat(lambda: legacy_parse(content, 'UCbench', args.max_results),
+                                        number=args.repeat, repeat=3)) / args.repeat
+        streaming_time = min(timeit.repeat(lambda: parse_feed(content, 'UCbench', args.max_results),
+                                           number=args.repeat, repeat=3)) / args.repeat
+
+        print(f"{os.path.basename(path):<28}{len(content):>10}{legacy_time * 1e6:>18.1f}"
+              f"{streaming_time * 1e6:>16.1f}{legacy_time / streaming_time:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
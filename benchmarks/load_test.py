@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Web接口压测
+并发请求主要的读接口，统计每个接口的吞吐量（RPS）和延迟分位数
+
+先启动服务（开发模式 python3 web_ui.py 或生产模式 ./start_production.sh），再运行:
+    python3 benchmarks/load_test.py [--url http://127.0.0.1:8080] [--concurrency 16] [--requests 2000]
+加 --bust-cache 时每个请求带不同的查询参数，绕过响应缓存直接压MongoDB
+"""
+
+import argparse
+import itertools
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(values, ratio):
+    """计算分位数（values已排序）"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(ratio * (len(values) - 1))))
+    return values[index]
+
+
+def run_route(base_url, path, total, concurrency, bust_cache):
+    """对单个接口发起 total 次请求，返回统计结果"""
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+    counter = itertools.count()
+
+    def one_request(_):
+        url = base_url + path
+        if bust_cache:
+            url += ('&' if '?' in url else '?') + f"_={next(counter)}"
+        start = time.perf_counter()
+        try:
+            response = session.get(url, timeout=30)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one_request, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'rps': total / elapsed,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'errors': sum(1 for _, ok in results if not ok)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web接口压测')
+    parser.add_argument('--url', default='http://127.0.0.1:8080', help='服务地址 (默认: http://127.0.0.1:8080)')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发数 (默认: 16)')
+    parser.add_argument('--requests', type=int, default=2000, help='每个接口的请求数 (默认: 2000)')
+    parser.add_argument('--bust-cache', action='store_true', help='绕过响应缓存')
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    try:
+        channels = requests.get(f"{base_url}/api/channels", timeout=10).json().get('channels', [])
+    except (requests.RequestException, ValueError) as e:
+        print(f"❌ 无法连接服务 {base_url}: {e}")
+        sys.exit(1)
+
+    routes = ['/api/channels', '/api/stats', '/api/videos/recent?days=7']
+    if channels:
+        routes.append(f"/api/channels/{channels[0]['channel_id']}/videos")
+    else:
+        print("⚠️ 数据库中没有频道，跳过频道视频接口")
+
+    # 预热（建立连接、填充缓存）
+    for path in routes:
+        requests.get(base_url + path, timeout=30)
+
+    print(f"🚀 并发 {args.concurrency}，每个接口 {args.requests} 次请求"
+          f"{'（绕过缓存）' if args.bust_cache else ''}")
+    print(f"{'接口':<48}{'RPS':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'错误':>8}")
+    print("-" * 86)
+
+    for path in routes:
+        stats = run_route(base_url, path, args.requests, args.concurrency, args.bust_cache)
+        print(f"{path:<48}{stats['rps']:>10.1f}{stats['p50']:>10.1f}{stats['p99']:>10.1f}{stats['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,12 @@ class Config:
     YOUTUBE_API_VERSION = 'v3'
     
     # 数据库配置
+    # 存储后端：mongodb（默认）或 sqlite（内嵌数据库，无需单独的数据库服务，适合小规模部署）
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'mongodb')
+    SQLITE_PATH = os.getenv('SQLITE_PATH', 'youtube_monitor.db')
+    # 启动时数据库结构版本落后则自动迁移；关闭后需手动运行 python main_rss.py migrate
+    AUTO_MIGRATE = os.getenv('AUTO_MIGRATE', 'true').lower() == 'true'
+    
     # MongoDB配置
     MONGODB_URL = os.getenv('MONGODB_URL', 'mongodb://localhost:27017/')
     MONGODB_DATABASE = os.getenv('MONGODB_DATABASE', 'youtube_monitor')
@@ -23,6 +29,81 @@ class Config:
     CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', 3600))  # 默认1小时
     MAX_VIDEOS_PER_CHECK = int(os.getenv('MAX_VIDEOS_PER_CHECK', 50))
     RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', 365))
+    STATS_BUCKET_DAYS = int(os.getenv('STATS_BUCKET_DAYS', 30))  # 频道统计按天分桶保留的天数
+    POLL_WORKERS = int(os.getenv('POLL_WORKERS', 8))  # 并发检查频道的线程数
+    
+    # 自适应轮询调度配置
+    SCHEDULE_MIN_INTERVAL = int(os.getenv('SCHEDULE_MIN_INTERVAL', 1800))  # 最短检查间隔，默认30分钟
+    SCHEDULE_MAX_INTERVAL = int(os.getenv('SCHEDULE_MAX_INTERVAL', 86400))  # 最长检查间隔，默认1天
+    SCHEDULE_EWMA_ALPHA = float(os.getenv('SCHEDULE_EWMA_ALPHA', 0.3))  # 发布间隔EWMA平滑系数
+    SCHEDULE_POLL_FACTOR = float(os.getenv('SCHEDULE_POLL_FACTOR', 0.25))  # 检查间隔 = 平均发布间隔 × 该系数
+    SCHEDULE_TICK_MINUTES = int(os.getenv('SCHEDULE_TICK_MINUTES', 5))  # 调度器检查到期频道的周期
+    
+    # 多节点分片轮询配置（auto_monitor.py --shared）
+    WORKER_ID = os.getenv('WORKER_ID', '')  # 节点标识，默认 主机名:进程号
+    LEASE_SECONDS = int(os.getenv('LEASE_SECONDS', 600))  # 分片租约时长，节点崩溃后最多这么久分片被其他节点接管
+    
+    # 频道ID解析缓存配置
+    RESOLVE_CACHE_TTL = int(os.getenv('RESOLVE_CACHE_TTL', 30 * 24 * 3600))  # 解析成功的缓存时间，默认30天
+    RESOLVE_NEGATIVE_TTL = int(os.getenv('RESOLVE_NEGATIVE_TTL', 3600))  # 解析失败的缓存时间，默认1小时
+    RESOLVE_CACHE_SIZE = int(os.getenv('RESOLVE_CACHE_SIZE', 4096))  # 进程内LRU缓存条目数
+    
+    # 请求限流配置（按主机的令牌桶，所有线程共享）
+    YOUTUBE_BASE_URL = os.getenv('YOUTUBE_BASE_URL', 'https://www.youtube.com').rstrip('/')
+    RATE_LIMIT_PER_SECOND = float(os.getenv('RATE_LIMIT_PER_SECOND', 5))  # 每个主机每秒请求数
+    RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', 10))  # 允许的突发请求数
+    RATE_LIMIT_RETRIES = int(os.getenv('RATE_LIMIT_RETRIES', 2))  # 被限流后的重试次数
+    RATE_LIMIT_DEFAULT_BACKOFF = int(os.getenv('RATE_LIMIT_DEFAULT_BACKOFF', 60))  # 429没有Retry-After时的暂停秒数
+    RATE_LIMIT_MAX_BACKOFF = int(os.getenv('RATE_LIMIT_MAX_BACKOFF', 600))  # Retry-After暂停的上限秒数
+    POLL_SPREAD_RATIO = float(os.getenv('POLL_SPREAD_RATIO', 0.5))  # 定时检查时把频道分散到间隔的这一比例内
+    SCHEDULE_JITTER = float(os.getenv('SCHEDULE_JITTER', 0.1))  # 自适应调度下次检查时间的随机抖动比例
+    ASYNC_MAX_IN_FLIGHT = int(os.getenv('ASYNC_MAX_IN_FLIGHT', 100))  # 异步客户端同时进行的请求数
+    ASYNC_MAX_CONNECTIONS = int(os.getenv('ASYNC_MAX_CONNECTIONS', 20))  # 异步客户端的连接数上限（HTTP/2时通常只用一个连接多路复用）
+    FALLBACK_POOL_SIZE = int(os.getenv('FALLBACK_POOL_SIZE', 4))  # 备用连接的连接池大小
+    FALLBACK_BREAKER_FAILURES = int(os.getenv('FALLBACK_BREAKER_FAILURES', 5))  # 备用连接连续失败多少次后按主机熔断
+    FALLBACK_BREAKER_RESET = int(os.getenv('FALLBACK_BREAKER_RESET', 300))  # 熔断多少秒后放行一次试探请求
+    FALLBACK_VERIFY_SSL = os.getenv('FALLBACK_VERIFY_SSL', 'false').lower() == 'true'  # 备用连接是否验证证书
+
+    # 新视频通知配置（video_notifier.py）
+    NOTIFY_WEBHOOK_URL = os.getenv('NOTIFY_WEBHOOK_URL', '')  # 默认的webhook地址（命令行没有指定输出时使用）
+    NOTIFY_WEBHOOK_TIMEOUT = int(os.getenv('NOTIFY_WEBHOOK_TIMEOUT', 10))  # webhook请求超时秒数
+    NOTIFY_BATCH_SIZE = int(os.getenv('NOTIFY_BATCH_SIZE', 100))  # 每批最多推送的视频数
+    NOTIFY_BATCH_SECONDS = float(os.getenv('NOTIFY_BATCH_SECONDS', 2))  # 变更流收到视频后最多等待多久凑成一批
+    NOTIFY_POLL_SECONDS = float(os.getenv('NOTIFY_POLL_SECONDS', 5))  # 高水位轮询的间隔秒数
+    NOTIFY_POLL_LAG = float(os.getenv('NOTIFY_POLL_LAG', 5))  # 轮询只读取这么多秒之前发现的视频，等待并发写入提交
+    NOTIFY_RETRY_MAX = int(os.getenv('NOTIFY_RETRY_MAX', 60))  # 推送失败后重试间隔的上限秒数
+
+    # Web接口响应缓存配置（本进程的写入会立即失效，其他进程的写入最多延迟TTL）
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 30))  # 缓存有效期（秒）
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 256))  # 最多缓存的响应数
+    
+    # 视频列表分页配置
+    VIDEO_PAGE_SIZE = int(os.getenv('VIDEO_PAGE_SIZE', 50))  # 每页默认视频数
+    VIDEO_PAGE_SIZE_MAX = int(os.getenv('VIDEO_PAGE_SIZE_MAX', 200))  # 每页最多视频数
+
+    # Web服务配置（生产模式见 gunicorn.conf.py）
+    WEB_HOST = os.getenv('WEB_HOST', '127.0.0.1')
+    WEB_PORT = int(os.getenv('WEB_PORT', 8080))
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', 4))  # worker进程数
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 16))  # 每个worker的线程数（每个打开的页面的事件流占用一个线程）
+    
+    # 后台任务配置（网页上的手动检查更新）
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))  # 每个Web进程同时执行的任务数
+    JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 900))  # 执行中超过该时间没有进度的任务视为已中断
+    JOB_HEARTBEAT_SECONDS = int(os.getenv('JOB_HEARTBEAT_SECONDS', 30))  # 工作进程刷新任务心跳的间隔，排队任务超过3倍间隔没有心跳视为进程已退出
+    JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', 7 * 24 * 3600))  # 已完成任务的保留时间
+    
+    # 实时事件推送配置（SSE）
+    EVENTS_CAPPED_BYTES = int(os.getenv('EVENTS_CAPPED_BYTES', 8 * 1024 * 1024))  # events固定集合大小
+    SSE_HEARTBEAT_SECONDS = int(os.getenv('SSE_HEARTBEAT_SECONDS', 15))  # 空闲时发送心跳的间隔
+    SSE_QUEUE_SIZE = int(os.getenv('SSE_QUEUE_SIZE', 1000))  # 每个连接积压的事件上限，超出后断开让客户端重连
+    
+    # 缩略图磁盘缓存配置
+    THUMBNAIL_CACHE_DIR = os.getenv('THUMBNAIL_CACHE_DIR', 'thumbnail_cache')
+    THUMBNAIL_CACHE_MAX_MB = int(os.getenv('THUMBNAIL_CACHE_MAX_MB', 512))  # 缓存总大小上限
+    THUMBNAIL_PREFETCH = os.getenv('THUMBNAIL_PREFETCH', 'false').lower() == 'true'  # 发现新视频时预先下载缩略图
+    THUMBNAIL_PREFETCH_WORKERS = int(os.getenv('THUMBNAIL_PREFETCH_WORKERS', 2))
+    THUMBNAIL_EXPORT_WORKERS = int(os.getenv('THUMBNAIL_EXPORT_WORKERS', 4))  # 打包下载时同时下载的缩略图数
     
     # 日志配置
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -1,17 +1,33 @@
+import json
+import time
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from typing import List, Dict, Optional, Set, Tuple
+from pymongo import MongoClient, ASCENDING, DESCENDING, CursorType, ReturnDocument, ReplaceOne, UpdateOne, UpdateMany
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError, OperationFailure
 from config import Config
+from storage import StorageBackend
 
-class MongoDBManager:
+class MongoDBManager(StorageBackend):
+    # 数据库结构版本：新增集合/索引或需要迁移数据时加1，并在 MIGRATIONS 末尾追加对应步骤
+    SCHEMA_VERSION = 4
+    MIGRATIONS = [
+        (1, '创建集合、索引和默认配置', '_migrate_v1_baseline'),
+        (2, '为视频回填冗余的频道名称和URL', '_migrate_v2_video_channel_fields'),
+        (3, '监控日志按状态查询的索引', '_migrate_v3_log_status_index'),
+        (4, '频道分片号和多节点分片租约', '_migrate_v4_shard_leases'),
+    ]
+    
     def __init__(self):
+        super().__init__()
         self.client = None
         self.db = None
         self.logger = logging.getLogger(__name__)
+        
+        started = time.perf_counter()
         self._connect()
-        self._init_database()
+        version = self._ensure_schema()
+        self.logger.info(f"MongoDB就绪: 结构版本 v{version}, 启动耗时 {(time.perf_counter() - started) * 1000:.0f}ms")
     
     def _connect(self):
         """连接到MongoDB"""
@@ -30,9 +46,7 @@ class MongoDBManager:
                 maxPoolSize=50                  # 连接池大小
             )
             
-            # 测试连接
-            self.client.admin.command('ping')
-            
+            # 不单独ping：启动时读取结构版本就是第一次请求，连接失败会在那里抛出
             self.db = self.client[Config.MONGODB_DATABASE]
             self.logger.info(f"成功连接到MongoDB数据库: {Config.MONGODB_DATABASE}")
             
@@ -43,55 +57,171 @@ class MongoDBManager:
             self.logger.error(f"数据库初始化失败: {e}")
             raise
     
-    def _init_database(self):
-        """初始化数据库集合和索引"""
+    # ===== 结构版本与迁移 =====
+    def get_schema_version(self) -> int:
+        """读取数据库当前的结构版本（从未迁移过为0）"""
+        doc = self.db.config.find_one({'config_key': 'schema_version'}, {'_id': 0, 'config_value': 1})
+        return int(doc['config_value']) if doc else 0
+    
+    def _ensure_schema(self) -> int:
+        """启动时只读取一次结构版本，版本落后时才执行迁移（建集合、建索引等）"""
         try:
-            # 创建集合（如果不存在）
-            collections = ['channels', 'videos', 'monitor_logs', 'config']
-            for collection_name in collections:
-                if collection_name not in self.db.list_collection_names():
-                    self.db.create_collection(collection_name)
-                    self.logger.info(f"创建集合: {collection_name}")
-            
-            # 创建索引
-            self._create_indexes()
-            
-            # 插入默认配置
-            self._insert_default_config()
+            version = self.get_schema_version()
             
-            self.logger.info("MongoDB数据库初始化完成")
-            
-        except Exception as e:
-            self.logger.error(f"数据库初始化失败: {e}")
+        except ConnectionFailure as e:
+            self.logger.error(f"MongoDB连接失败: {e}")
             raise
+        
+        if version < self.SCHEMA_VERSION:
+            if not Config.AUTO_MIGRATE:
+                self.logger.warning(f"数据库结构版本 v{version} 低于程序要求的 v{self.SCHEMA_VERSION}，"
+                                    f"请运行: python main_rss.py migrate")
+                return version
+            return self.migrate()['to_version']
+        
+        if version > self.SCHEMA_VERSION:
+            self.logger.warning(f"数据库结构版本 v{version} 高于程序支持的 v{self.SCHEMA_VERSION}，请升级程序")
+        return version
     
-    def _create_indexes(self):
-        """创建性能优化索引"""
+    def migrate(self, force: bool = False) -> Dict:
+        """依次执行落后的迁移步骤，每步完成后记录版本；force=True时从头重新执行（如索引被误删）
+        各步骤都可以重复执行，多个进程同时启动时一起迁移也不会出错"""
+        started = time.perf_counter()
+        from_version = 0 if force else self.get_schema_version()
+        version = from_version
+        
         try:
-            # channels集合索引
-            self.db.channels.create_index("channel_id", unique=True)
-            self.db.channels.create_index("is_active")
-            self.db.channels.create_index("updated_at")
-            
-            # videos集合索引
-            self.db.videos.create_index("video_id", unique=True)
-            self.db.videos.create_index("channel_id")
-            self.db.videos.create_index("published_at")
-            self.db.videos.create_index("discovered_at")
-            self.db.videos.create_index([("channel_id", ASCENDING), ("published_at", DESCENDING)])
-            
-            # monitor_logs集合索引
-            self.db.monitor_logs.create_index("channel_id")
-            self.db.monitor_logs.create_index("check_time")
-            self.db.monitor_logs.create_index([("channel_id", ASCENDING), ("check_time", DESCENDING)])
-            
-            # config集合索引
-            self.db.config.create_index("config_key", unique=True)
-            
-            self.logger.info("MongoDB索引创建完成")
+            for step_version, description, method_name in self.MIGRATIONS:
+                if step_version <= version:
+                    continue
+                
+                self.logger.info(f"数据库迁移 v{step_version}: {description}")
+                getattr(self, method_name)()
+                self._save_schema_version(step_version)
+                version = step_version
             
         except Exception as e:
-            self.logger.error(f"创建索引失败: {e}")
+            self.logger.error(f"数据库迁移失败（停留在 v{version}）: {e}")
+            raise
+        
+        elapsed = time.perf_counter() - started
+        if version != from_version:
+            self.logger.info(f"数据库迁移完成: v{from_version} -> v{version}, 耗时 {elapsed:.2f} 秒")
+        
+        return {'from_version': from_version, 'to_version': version, 'elapsed_seconds': round(elapsed, 3)}
+    
+    def _save_schema_version(self, version: int):
+        """记录结构版本"""
+        self.db.config.update_one(
+            {'config_key': 'schema_version'},
+            {
+                '$set': {'config_value': str(version), 'description': '数据库结构版本', 'updated_at': datetime.now()},
+                '$setOnInsert': {'created_at': datetime.now()}
+            },
+            upsert=True
+        )
+    
+    def _migrate_v1_baseline(self):
+        """创建集合、固定集合、索引和默认配置"""
+        existing = set(self.db.list_collection_names())
+        
+        # 创建集合（如果不存在）
+        collections = ['channels', 'channel_stats', 'feed_states', 'channel_resolutions', 'videos', 'monitor_logs', 'jobs', 'config']
+        for collection_name in collections:
+            if collection_name not in existing:
+                self.db.create_collection(collection_name)
+                self.logger.info(f"创建集合: {collection_name}")
+        
+        # 实时事件使用固定大小集合（capped），旧事件自动覆盖，支持tailable游标
+        if 'events' not in existing:
+            self.db.create_collection('events', capped=True, size=Config.EVENTS_CAPPED_BYTES)
+            self.logger.info("创建集合: events")
+        
+        # 创建索引
+        self._create_indexes()
+        
+        # 首次创建统计集合时根据已有视频初始化计数
+        if 'channel_stats' not in existing:
+            self.rebuild_channel_stats()
+        
+        # 插入默认配置
+        self._insert_default_config()
+    
+    def _migrate_v2_video_channel_fields(self):
+        """旧版本的视频文档没有冗余的频道名称和URL"""
+        self.backfill_video_channel_fields()
+    
+    def _migrate_v3_log_status_index(self):
+        """查询最近一次检查周期汇总（status='cycle'）时不扫描频道日志"""
+        self.db.monitor_logs.create_index([("status", ASCENDING), ("check_time", DESCENDING)])
+    
+    def _migrate_v4_shard_leases(self):
+        """为已有频道写入分片号，每个分片创建一个租约文档（已有的不覆盖）"""
+        operations = [
+            UpdateOne({'channel_id': doc['channel_id']}, {'$set': {'shard': self.channel_shard(doc['channel_id'])}})
+            for doc in self.db.channels.find({'shard': {'$exists': False}}, {'_id': 0, 'channel_id': 1})
+        ]
+        if operations:
+            self.db.channels.bulk_write(operations, ordered=False)
+        self.db.channels.create_index([("shard", ASCENDING), ("is_active", ASCENDING), ("next_check_at", ASCENDING)])
+        
+        epoch = datetime(1970, 1, 1)
+        self.db.shard_leases.bulk_write([
+            UpdateOne(
+                {'_id': shard},
+                {'$setOnInsert': {'owner': None, 'claimed_at': None, 'expires_at': epoch, 'next_run_at': epoch}},
+                upsert=True
+            )
+            for shard in range(self.LEASE_SHARDS)
+        ], ordered=False)
+        self.db.shard_leases.create_index([("next_run_at", ASCENDING)])
+    
+    def _create_indexes(self):
+        """创建性能优化索引（失败时抛出异常，迁移不会记录新版本）"""
+        # channels集合索引
+        self.db.channels.create_index("channel_id", unique=True)
+        self.db.channels.create_index("is_active")
+        self.db.channels.create_index("updated_at")
+        self.db.channels.create_index([("is_active", ASCENDING), ("next_check_at", ASCENDING)])
+        
+        # channel_stats集合索引
+        self.db.channel_stats.create_index("channel_id", unique=True)
+        
+        # feed_states集合索引
+        self.db.feed_states.create_index("channel_id", unique=True)
+        
+        # channel_resolutions集合索引（expires_at为TTL索引，过期自动删除）
+        self.db.channel_resolutions.create_index("key", unique=True)
+        self.db.channel_resolutions.create_index("expires_at", expireAfterSeconds=0)
+        
+        # videos集合索引
+        self.db.videos.create_index("video_id", unique=True)
+        self.db.videos.create_index("channel_id")
+        self.db.videos.create_index("published_at")
+        self.db.videos.create_index("discovered_at")
+        self.db.videos.create_index([("channel_id", ASCENDING), ("published_at", DESCENDING)])
+        # 游标分页索引：(排序字段, video_id) 作为唯一的键集顺序
+        self.db.videos.create_index([("channel_id", ASCENDING), ("published_at", DESCENDING), ("video_id", DESCENDING)])
+        self.db.videos.create_index([("discovered_at", DESCENDING), ("video_id", DESCENDING)])
+        
+        # monitor_logs集合索引
+        self.db.monitor_logs.create_index("channel_id")
+        self.db.monitor_logs.create_index("check_time")
+        self.db.monitor_logs.create_index([("channel_id", ASCENDING), ("check_time", DESCENDING)])
+        
+        # jobs集合索引：同一dedup_key只能有一个进行中的任务（跨进程去重），完成的任务按TTL清理
+        self.db.jobs.create_index("job_id", unique=True)
+        self.db.jobs.create_index(
+            "dedup_key", unique=True,
+            partialFilterExpression={'active': True}, name='dedup_key_active'
+        )
+        self.db.jobs.create_index("created_at")
+        self.db.jobs.create_index("finished_at", expireAfterSeconds=Config.JOB_RETENTION_SECONDS)
+        
+        # config集合索引
+        self.db.config.create_index("config_key", unique=True)
+        
+        self.logger.info("MongoDB索引创建完成")
     
     def _insert_default_config(self):
         """插入默认配置"""
@@ -131,20 +261,27 @@ class MongoDBManager:
             self.logger.error(f"插入默认配置失败: {e}")
     
     # ===== 频道管理 =====
+    def _build_channel_doc(self, channel_id: str, channel_name: str, channel_url: str,
+                           description: str = None, subscriber_count: int = None) -> Dict:
+        """构建频道文档"""
+        return {
+            'channel_id': channel_id,
+            'channel_name': channel_name,
+            'channel_url': channel_url,
+            'description': description,
+            'subscriber_count': subscriber_count,
+            'shard': self.channel_shard(channel_id),
+            'created_at': datetime.now(),
+            'updated_at': datetime.now(),
+            'is_active': True
+        }
+    
     def add_channel(self, channel_id: str, channel_name: str, channel_url: str, 
                    description: str = None, subscriber_count: int = None) -> bool:
         """添加要监控的频道"""
         try:
-            channel_doc = {
-                'channel_id': channel_id,
-                'channel_name': channel_name,
-                'channel_url': channel_url,
-                'description': description,
-                'subscriber_count': subscriber_count,
-                'created_at': datetime.now(),
-                'updated_at': datetime.now(),
-                'is_active': True
-            }
+            channel_doc = self._build_channel_doc(channel_id, channel_name, channel_url,
+                                                  description, subscriber_count)
             
             # 使用upsert操作，如果存在则更新，不存在则插入
             result = self.db.channels.replace_one(
@@ -152,6 +289,8 @@ class MongoDBManager:
                 channel_doc,
                 upsert=True
             )
+            self._propagate_channel_fields([channel_doc])
+            self._notify_write('channels', f'channel:{channel_id}')
             
             self.logger.info(f"添加频道成功: {channel_name}")
             return True
@@ -160,6 +299,94 @@ class MongoDBManager:
             self.logger.error(f"添加频道失败: {e}")
             return False
     
+    def add_channels(self, channels: List[Dict]) -> List[str]:
+        """批量添加频道（一次无序bulk_write），返回成功保存的频道ID列表"""
+        if not channels:
+            return []
+        
+        try:
+            channel_docs = [
+                self._build_channel_doc(
+                    channel['channel_id'], channel['channel_name'], channel['channel_url'],
+                    channel.get('description'), channel.get('subscriber_count')
+                )
+                for channel in channels
+            ]
+            operations = [
+                ReplaceOne({'channel_id': doc['channel_id']}, doc, upsert=True)
+                for doc in channel_docs
+            ]
+            self.db.channels.bulk_write(operations, ordered=False)
+            saved_ids = [channel['channel_id'] for channel in channels]
+            
+        except BulkWriteError as e:
+            failed_indexes = {error['index'] for error in e.details.get('writeErrors', [])}
+            saved_ids = [channel['channel_id'] for i, channel in enumerate(channels) if i not in failed_indexes]
+            self.logger.error(f"批量添加频道部分失败: {len(failed_indexes)} 个")
+            
+        except Exception as e:
+            self.logger.error(f"批量添加频道失败: {e}")
+            return []
+        
+        saved = set(saved_ids)
+        self._propagate_channel_fields([doc for doc in channel_docs if doc['channel_id'] in saved])
+        self._notify_write('channels', *(f'channel:{channel_id}' for channel_id in saved_ids))
+        self.logger.info(f"批量添加频道成功: {len(saved_ids)} 个")
+        return saved_ids
+    
+    def _propagate_channel_fields(self, channel_docs: List[Dict]) -> int:
+        """把频道名称和URL同步到该频道的视频文档（只更新不一致的视频），返回更新的视频数"""
+        if not channel_docs:
+            return 0
+        
+        try:
+            operations = [
+                UpdateMany(
+                    {
+                        'channel_id': doc['channel_id'],
+                        '$or': [
+                            {'channel_name': {'$ne': doc['channel_name']}},
+                            {'channel_url': {'$ne': doc['channel_url']}}
+                        ]
+                    },
+                    {'$set': {'channel_name': doc['channel_name'], 'channel_url': doc['channel_url']}}
+                )
+                for doc in channel_docs
+            ]
+            result = self.db.videos.bulk_write(operations, ordered=False)
+            if result.modified_count:
+                self.logger.info(f"同步频道信息到 {result.modified_count} 个视频")
+            return result.modified_count
+            
+        except Exception as e:
+            self.logger.error(f"同步频道信息到视频失败: {e}")
+            return 0
+    
+    def backfill_video_channel_fields(self) -> int:
+        """为所有视频回填冗余的频道名称和URL（用于迁移旧数据），返回更新的视频数"""
+        try:
+            channels = list(self.db.channels.find({}, {'_id': 0, 'channel_id': 1, 'channel_name': 1, 'channel_url': 1}))
+            modified = 0
+            for start in range(0, len(channels), 500):
+                modified += self._propagate_channel_fields(channels[start:start + 500])
+            
+            self._notify_write('videos', 'channel:*')
+            self.logger.info(f"回填视频频道信息完成: {len(channels)} 个频道, {modified} 个视频")
+            return modified
+            
+        except Exception as e:
+            self.logger.error(f"回填视频频道信息失败: {e}")
+            return 0
+    
+    def get_channel(self, channel_id: str) -> Optional[Dict]:
+        """获取单个频道"""
+        try:
+            return self.db.channels.find_one({'channel_id': channel_id}, {'_id': 0})
+            
+        except Exception as e:
+            self.logger.error(f"获取频道失败: {e}")
+            return None
+    
     def get_active_channels(self) -> List[Dict]:
         """获取所有活跃的监控频道"""
         try:
@@ -174,6 +401,54 @@ class MongoDBManager:
             self.logger.error(f"获取频道列表失败: {e}")
             return []
     
+    def get_due_channels(self, now: datetime = None) -> List[Dict]:
+        """获取到期需要检查的活跃频道（从未调度过的频道也算到期）"""
+        try:
+            now = now or datetime.now()
+            channels = list(self.db.channels.find(
+                {
+                    'is_active': True,
+                    '$or': [
+                        {'next_check_at': {'$lte': now}},
+                        {'next_check_at': None}
+                    ]
+                },
+                {'_id': 0}
+            ).sort('channel_name', 1))
+            
+            return channels
+            
+        except Exception as e:
+            self.logger.error(f"获取到期频道失败: {e}")
+            return []
+    
+    def update_channel_schedules(self, schedules: List[Dict]) -> bool:
+        """批量更新频道的检查间隔和下次检查时间，每条包含 channel_id/poll_interval/next_check_at"""
+        if not schedules:
+            return True
+        
+        try:
+            operations = [
+                UpdateOne(
+                    {'channel_id': schedule['channel_id']},
+                    {
+                        '$set': {
+                            'poll_interval': schedule['poll_interval'],
+                            'next_check_at': schedule['next_check_at'],
+                            'last_checked_at': datetime.now()
+                        }
+                    }
+                )
+                for schedule in schedules
+            ]
+            self.db.channels.bulk_write(operations, ordered=False)
+            self._notify_write('channels')
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"更新频道调度失败: {e}")
+            return False
+    
     def update_channel_status(self, channel_id: str, is_active: bool) -> bool:
         """更新频道监控状态"""
         try:
@@ -186,6 +461,7 @@ class MongoDBManager:
                     }
                 }
             )
+            self._notify_write('channels', f'channel:{channel_id}')
             
             return result.modified_count > 0
             
@@ -193,29 +469,127 @@ class MongoDBManager:
             self.logger.error(f"更新频道状态失败: {e}")
             return False
     
+    # ===== RSS抓取状态 =====
+    def get_feed_states(self, channel_ids: List[str]) -> Dict[str, Dict]:
+        """批量获取频道的RSS抓取状态（ETag、Last-Modified、内容哈希）"""
+        try:
+            cursor = self.db.feed_states.find(
+                {'channel_id': {'$in': list(channel_ids)}},
+                {'_id': 0}
+            )
+            return {state['channel_id']: state for state in cursor}
+            
+        except Exception as e:
+            self.logger.error(f"获取RSS抓取状态失败: {e}")
+            return {}
+    
+    def save_feed_state(self, channel_id: str, etag: str = None, last_modified: str = None,
+                        content_hash: str = None) -> bool:
+        """保存频道的RSS抓取状态"""
+        try:
+            self.db.feed_states.update_one(
+                {'channel_id': channel_id},
+                {
+                    '$set': {
+                        'etag': etag,
+                        'last_modified': last_modified,
+                        'content_hash': content_hash,
+                        'updated_at': datetime.now()
+                    }
+                },
+                upsert=True
+            )
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"保存RSS抓取状态失败: {e}")
+            return False
+    
+    # ===== 频道ID解析缓存 =====
+    def get_channel_resolution(self, key: str) -> Optional[Dict]:
+        """获取频道URL的解析结果缓存"""
+        try:
+            return self.db.channel_resolutions.find_one(
+                {'key': key, 'expires_at': {'$gt': datetime.now()}},
+                {'_id': 0}
+            )
+            
+        except Exception as e:
+            self.logger.error(f"获取频道解析缓存失败: {e}")
+            return None
+    
+    def save_channel_resolution(self, key: str, channel_id: Optional[str], channel_name: str = None,
+                                ttl_seconds: int = None) -> bool:
+        """保存频道URL的解析结果（channel_id为None表示解析失败）"""
+        try:
+            ttl_seconds = ttl_seconds or Config.RESOLVE_CACHE_TTL
+            self.db.channel_resolutions.update_one(
+                {'key': key},
+                {
+                    '$set': {
+                        'channel_id': channel_id,
+                        'channel_name': channel_name,
+                        'expires_at': datetime.now() + timedelta(seconds=ttl_seconds),
+                        'updated_at': datetime.now()
+                    }
+                },
+                upsert=True
+            )
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"保存频道解析缓存失败: {e}")
+            return False
+    
     # ===== 视频管理 =====
+    def _build_video_doc(self, video_data: Dict) -> Dict:
+        """构建视频文档"""
+        return {
+            'video_id': video_data['video_id'],
+            'channel_id': video_data['channel_id'],
+            'channel_name': video_data.get('channel_name'),  # 冗余频道信息，列表查询无需关联channels
+            'channel_url': video_data.get('channel_url'),
+            'title': video_data['title'],
+            'description': video_data.get('description', ''),
+            'video_url': video_data['video_url'],
+            'thumbnail_url': video_data.get('thumbnail_url', ''),
+            'duration': video_data.get('duration', ''),
+            'view_count': video_data.get('view_count', 0),
+            'like_count': video_data.get('like_count', 0),
+            'comment_count': video_data.get('comment_count', 0),
+            'published_at': datetime.fromisoformat(video_data['published_at'].replace('Z', '+00:00')) if isinstance(video_data['published_at'], str) else video_data['published_at'],
+            'discovered_at': datetime.now(),
+            'updated_at': datetime.now(),
+            'tags': video_data.get('tags', []),
+            'category_id': video_data.get('category_id'),
+            'is_new': video_data.get('is_new', True)  # 新添加的字段，默认为新视频
+        }
+    
+    def _fill_channel_fields(self, video_docs: List[Dict]):
+        """为缺少频道名称的视频文档补充冗余的频道信息（一次$in查询）"""
+        channel_ids = list({doc['channel_id'] for doc in video_docs if not doc.get('channel_name')})
+        if not channel_ids:
+            return
+        
+        channels = {
+            channel['channel_id']: channel
+            for channel in self.db.channels.find(
+                {'channel_id': {'$in': channel_ids}},
+                {'_id': 0, 'channel_id': 1, 'channel_name': 1, 'channel_url': 1}
+            )
+        }
+        for doc in video_docs:
+            channel = channels.get(doc['channel_id'])
+            if channel and not doc.get('channel_name'):
+                doc['channel_name'] = channel.get('channel_name')
+                doc['channel_url'] = channel.get('channel_url')
+    
     def add_video(self, video_data: Dict) -> bool:
         """添加新视频到数据库"""
         try:
             # 准备视频文档
-            video_doc = {
-                'video_id': video_data['video_id'],
-                'channel_id': video_data['channel_id'],
-                'title': video_data['title'],
-                'description': video_data.get('description', ''),
-                'video_url': video_data['video_url'],
-                'thumbnail_url': video_data.get('thumbnail_url', ''),
-                'duration': video_data.get('duration', ''),
-                'view_count': video_data.get('view_count', 0),
-                'like_count': video_data.get('like_count', 0),
-                'comment_count': video_data.get('comment_count', 0),
-                'published_at': datetime.fromisoformat(video_data['published_at'].replace('Z', '+00:00')) if isinstance(video_data['published_at'], str) else video_data['published_at'],
-                'discovered_at': datetime.now(),
-                'updated_at': datetime.now(),
-                'tags': video_data.get('tags', []),
-                'category_id': video_data.get('category_id'),
-                'is_new': video_data.get('is_new', True)  # 新添加的字段，默认为新视频
-            }
+            video_doc = self._build_video_doc(video_data)
+            self._fill_channel_fields([video_doc])
             
             # 使用upsert操作
             result = self.db.videos.replace_one(
@@ -224,6 +598,11 @@ class MongoDBManager:
                 upsert=True
             )
             
+            # 只有新插入的视频才计入频道统计
+            if result.upserted_id is not None:
+                self._inc_channel_stats([video_doc])
+            self._notify_write('videos', f"channel:{video_doc['channel_id']}")
+            
             self.logger.info(f"添加视频成功: {video_data['title']}")
             return True
             
@@ -231,6 +610,50 @@ class MongoDBManager:
             self.logger.error(f"添加视频失败: {e}")
             return False
     
+    def add_videos(self, videos: List[Dict]) -> List[str]:
+        """批量添加视频（一次无序bulk_write），返回成功保存的视频ID列表"""
+        if not videos:
+            return []
+        
+        video_docs = [self._build_video_doc(video) for video in videos]
+        
+        try:
+            self._fill_channel_fields(video_docs)
+            operations = [
+                ReplaceOne({'video_id': doc['video_id']}, doc, upsert=True)
+                for doc in video_docs
+            ]
+            result = self.db.videos.bulk_write(operations, ordered=False)
+            saved_ids = [doc['video_id'] for doc in video_docs]
+            upserted_indexes = set(result.upserted_ids or {})
+            
+        except BulkWriteError as e:
+            # 无序写入时其余操作仍会执行，只排除出错的条目
+            failed_indexes = {error['index'] for error in e.details.get('writeErrors', [])}
+            saved_ids = [doc['video_id'] for i, doc in enumerate(video_docs) if i not in failed_indexes]
+            upserted_indexes = {item['index'] for item in e.details.get('upserted', [])}
+            self.logger.error(f"批量添加视频部分失败: {len(failed_indexes)} 个")
+            
+        except Exception as e:
+            self.logger.error(f"批量添加视频失败: {e}")
+            return []
+        
+        # 只有新插入的视频才计入频道统计
+        self._inc_channel_stats([doc for i, doc in enumerate(video_docs) if i in upserted_indexes])
+        self._notify_write('videos', *{f"channel:{doc['channel_id']}" for doc in video_docs})
+        
+        self.logger.info(f"批量添加视频成功: {len(saved_ids)} 个")
+        return saved_ids
+    
+    def get_video(self, video_id: str) -> Optional[Dict]:
+        """获取单个视频"""
+        try:
+            return self.db.videos.find_one({'video_id': video_id}, {'_id': 0})
+            
+        except Exception as e:
+            self.logger.error(f"获取视频失败: {e}")
+            return None
+    
     def video_exists(self, video_id: str) -> bool:
         """检查视频是否已存在"""
         try:
@@ -241,6 +664,22 @@ class MongoDBManager:
             self.logger.error(f"检查视频存在性失败: {e}")
             return False
     
+    def get_existing_video_ids(self, video_ids: List[str]) -> Set[str]:
+        """批量检查视频是否存在，返回数据库中已有的视频ID集合"""
+        if not video_ids:
+            return set()
+        
+        try:
+            cursor = self.db.videos.find(
+                {'video_id': {'$in': list(video_ids)}},
+                {'_id': 0, 'video_id': 1}
+            )
+            return {doc['video_id'] for doc in cursor}
+            
+        except Exception as e:
+            self.logger.error(f"批量检查视频存在性失败: {e}")
+            return set()
+    
     def update_video_status(self, video_ids: List[str], is_new: bool = False) -> bool:
         """更新视频的新旧状态"""
         try:
@@ -248,6 +687,8 @@ class MongoDBManager:
                 {'video_id': {'$in': video_ids}},
                 {'$set': {'is_new': is_new, 'updated_at': datetime.now()}}
             )
+            # 视频ID不带频道信息，所有频道的视频列表都要失效
+            self._notify_write('videos', 'channel:*')
             
             self.logger.info(f"更新了 {result.modified_count} 个视频的状态")
             return result.modified_count > 0
@@ -259,9 +700,14 @@ class MongoDBManager:
     def delete_video(self, video_id: str) -> bool:
         """删除单个视频"""
         try:
-            result = self.db.videos.delete_one({'video_id': video_id})
+            deleted = self.db.videos.find_one_and_delete(
+                {'video_id': video_id},
+                projection={'_id': 0, 'channel_id': 1, 'published_at': 1, 'discovered_at': 1}
+            )
             
-            if result.deleted_count > 0:
+            if deleted:
+                self._dec_channel_stats(deleted)
+                self._notify_write('videos', f"channel:{deleted['channel_id']}")
                 self.logger.info(f"删除视频成功: {video_id}")
                 return True
             else:
@@ -287,6 +733,13 @@ class MongoDBManager:
             logs_result = self.db.monitor_logs.delete_many({'channel_id': channel_id})
             logs_deleted = logs_result.deleted_count
             
+            # 删除RSS抓取状态
+            self.db.feed_states.delete_one({'channel_id': channel_id})
+            
+            # 删除频道统计计数
+            self.db.channel_stats.delete_one({'channel_id': channel_id})
+            self._notify_write('channels', 'videos', 'logs', f'channel:{channel_id}')
+            
             self.logger.info(f"删除频道完成: {channel_id}, 删除了 {videos_deleted} 个视频, {logs_deleted} 个日志")
             
             return {
@@ -302,46 +755,46 @@ class MongoDBManager:
     def get_channel_videos(self, channel_id: str, limit: int = None) -> List[Dict]:
         """获取指定频道的所有视频"""
         try:
-            query = {'channel_id': channel_id}
-            
-            # 构建聚合管道
-            pipeline = [
-                {'$match': query},
-                {
-                    '$lookup': {
-                        'from': 'channels',
-                        'localField': 'channel_id',
-                        'foreignField': 'channel_id',
-                        'as': 'channel_info'
-                    }
-                },
-                {'$unwind': '$channel_info'},
-                {
-                    '$project': {
-                        '_id': 0,
-                        'video_id': 1,
-                        'title': 1,
-                        'video_url': 1,
-                        'thumbnail_url': 1,
-                        'published_at': 1,
-                        'discovered_at': 1,
-                        'is_new': 1,
-                        'channel_name': '$channel_info.channel_name'
-                    }
-                },
-                {'$sort': {'published_at': -1}}
-            ]
+            cursor = self.db.videos.find(
+                {'channel_id': channel_id},
+                {'_id': 0, 'video_id': 1, 'title': 1, 'video_url': 1, 'thumbnail_url': 1,
+                 'published_at': 1, 'discovered_at': 1, 'is_new': 1, 'channel_name': 1}
+            ).sort('published_at', -1)
             
             if limit:
-                pipeline.append({'$limit': limit})
+                cursor = cursor.limit(limit)
             
-            result = list(self.db.videos.aggregate(pipeline))
-            return result
+            return list(cursor)
             
         except Exception as e:
             self.logger.error(f"获取频道视频失败: {e}")
             return []
     
+    def iter_channel_videos(self, channel_id: str, is_new: bool = None,
+                            since: datetime = None, until: datetime = None):
+        """按发布时间倒序逐条读取频道视频（游标，不一次性加载），可按新旧状态和发布时间过滤"""
+        query = {'channel_id': channel_id}
+        if is_new is not None:
+            query['is_new'] = is_new
+        if since or until:
+            query['published_at'] = {}
+            if since:
+                query['published_at']['$gte'] = since
+            if until:
+                query['published_at']['$lt'] = until
+        
+        try:
+            cursor = self.db.videos.find(
+                query,
+                {'_id': 0, 'video_id': 1, 'title': 1, 'thumbnail_url': 1, 'published_at': 1}
+            ).sort([('published_at', DESCENDING), ('video_id', DESCENDING)]).batch_size(200)
+            
+            for video in cursor:
+                yield video
+                
+        except Exception as e:
+            self.logger.error(f"读取频道视频失败: {e}")
+    
     def get_latest_video_date(self, channel_id: str) -> Optional[datetime]:
         """获取频道最新视频的发布日期"""
         try:
@@ -361,55 +814,101 @@ class MongoDBManager:
             self.logger.error(f"获取最新视频日期失败: {e}")
             return None
     
+    def get_recent_publish_times(self, channel_id: str, limit: int = 20) -> List[datetime]:
+        """获取频道最近若干个视频的发布时间（走channel_id+published_at复合索引）"""
+        try:
+            cursor = self.db.videos.find(
+                {'channel_id': channel_id},
+                {'_id': 0, 'published_at': 1}
+            ).sort('published_at', -1).limit(limit)
+            
+            return [doc['published_at'] for doc in cursor if doc.get('published_at')]
+            
+        except Exception as e:
+            self.logger.error(f"获取视频发布时间失败: {e}")
+            return []
+    
     def get_recent_videos(self, days: int = 7) -> List[Dict]:
         """获取最近几天发现的视频"""
         try:
             cutoff_date = datetime.now() - timedelta(days=days)
             
-            pipeline = [
-                {
-                    '$match': {
-                        'discovered_at': {'$gte': cutoff_date}
-                    }
-                },
-                {
-                    '$lookup': {
-                        'from': 'channels',
-                        'localField': 'channel_id',
-                        'foreignField': 'channel_id',
-                        'as': 'channel_info'
-                    }
-                },
-                {
-                    '$unwind': '$channel_info'
-                },
-                {
-                    '$project': {
-                        '_id': 0,
-                        'video_id': 1,
-                        'title': 1,
-                        'video_url': 1,
-                        'published_at': 1,
-                        'discovered_at': 1,
-                        'channel_name': '$channel_info.channel_name',
-                        'channel_url': '$channel_info.channel_url'
-                    }
-                },
-                {
-                    '$sort': {'discovered_at': -1}
-                }
-            ]
-            
-            result = list(self.db.videos.aggregate(pipeline))
-            return result
+            return list(self.db.videos.find(
+                {'discovered_at': {'$gte': cutoff_date}},
+                {'_id': 0, 'video_id': 1, 'title': 1, 'video_url': 1, 'published_at': 1,
+                 'discovered_at': 1, 'channel_name': 1, 'channel_url': 1}
+            ).sort('discovered_at', -1))
             
         except Exception as e:
             self.logger.error(f"获取最近视频失败: {e}")
             return []
     
+    # ===== 游标分页 =====
+    def _find_video_page(self, query: Dict, sort_field: str, limit: int,
+                         after: Optional[Tuple[datetime, str]], projection: Dict) -> Dict:
+        """按 (sort_field, video_id) 倒序做键集分页，多取一条判断是否还有下一页"""
+        if after:
+            sort_value, video_id = after
+            query = {'$and': [query, {'$or': [
+                {sort_field: {'$lt': sort_value}},
+                {sort_field: sort_value, 'video_id': {'$lt': video_id}}
+            ]}]}
+        
+        videos = list(self.db.videos.find(query, projection)
+                      .sort([(sort_field, DESCENDING), ('video_id', DESCENDING)])
+                      .limit(limit + 1))
+        
+        next_cursor = None
+        if len(videos) > limit:
+            videos = videos[:limit]
+            next_cursor = self.encode_cursor(videos[-1][sort_field], videos[-1]['video_id'])
+        
+        return {'videos': videos, 'next_cursor': next_cursor}
+    
+    def get_channel_videos_page(self, channel_id: str, limit: int, cursor: str = None) -> Dict:
+        """按发布时间倒序分页获取频道视频，返回 {'videos', 'next_cursor'}；游标无效时抛出ValueError"""
+        after = self.decode_cursor(cursor) if cursor else None
+        try:
+            page = self._find_video_page(
+                {'channel_id': channel_id}, 'published_at', limit, after,
+                {'_id': 0, 'video_id': 1, 'channel_id': 1, 'title': 1, 'video_url': 1, 'thumbnail_url': 1,
+                 'published_at': 1, 'discovered_at': 1, 'is_new': 1, 'channel_name': 1}
+            )
+            return page
+            
+        except Exception as e:
+            self.logger.error(f"分页获取频道视频失败: {e}")
+            return {'videos': [], 'next_cursor': None}
+    
+    def get_recent_videos_page(self, days: int, limit: int, cursor: str = None) -> Dict:
+        """按发现时间倒序分页获取最近几天的视频，返回 {'videos', 'next_cursor'}；游标无效时抛出ValueError"""
+        after = self.decode_cursor(cursor) if cursor else None
+        try:
+            cutoff_date = datetime.now() - timedelta(days=days)
+            page = self._find_video_page(
+                {'discovered_at': {'$gte': cutoff_date}}, 'discovered_at', limit, after,
+                {'_id': 0, 'video_id': 1, 'channel_id': 1, 'title': 1, 'video_url': 1,
+                 'published_at': 1, 'discovered_at': 1, 'channel_name': 1, 'channel_url': 1}
+            )
+            return page
+            
+        except Exception as e:
+            self.logger.error(f"分页获取最近视频失败: {e}")
+            return {'videos': [], 'next_cursor': None}
+    
+    def get_channel_video_count(self, channel_id: str) -> int:
+        """获取频道视频总数（读取channel_stats计数）"""
+        try:
+            stats = self.db.channel_stats.find_one({'channel_id': channel_id}, {'_id': 0, 'total_videos': 1})
+            return stats.get('total_videos', 0) if stats else 0
+            
+        except Exception as e:
+            self.logger.error(f"获取频道视频总数失败: {e}")
+            return 0
+    
     # ===== 监控日志 =====
-    def add_monitor_log(self, channel_id: str, new_videos_count: int = 0, 
-                       status: str = 'success', message: str = '') -> bool:
+    def add_monitor_log(self, channel_id: Optional[str], new_videos_count: int = 0, 
+                       status: str = 'success', message: str = '', details: Dict = None) -> bool:
         """添加监控日志"""
         try:
             log_doc = {
@@ -419,14 +918,42 @@ class MongoDBManager:
                 'status': status,
                 'message': message
             }
+            if details is not None:
+                log_doc['details'] = details
             
             self.db.monitor_logs.insert_one(log_doc)
+            self._notify_write('logs')
             return True
             
         except Exception as e:
             self.logger.error(f"添加监控日志失败: {e}")
             return False
     
+    def add_monitor_logs(self, logs: List[Dict]) -> bool:
+        """批量添加监控日志，每条包含 channel_id/new_videos_count/status/message"""
+        if not logs:
+            return True
+        
+        try:
+            log_docs = [
+                {
+                    'channel_id': log['channel_id'],
+                    'check_time': datetime.now(),
+                    'new_videos_count': log.get('new_videos_count', 0),
+                    'status': log.get('status', 'success'),
+                    'message': log.get('message', '')
+                }
+                for log in logs
+            ]
+            
+            self.db.monitor_logs.insert_many(log_docs, ordered=False)
+            self._notify_write('logs')
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"批量添加监控日志失败: {e}")
+            return False
+    
     def get_monitor_stats(self, channel_id: str = None, days: int = 30) -> List[Dict]:
         """获取监控统计信息"""
         try:
@@ -447,6 +974,297 @@ class MongoDBManager:
             self.logger.error(f"获取监控统计失败: {e}")
             return []
     
+    def get_last_cycle_log(self) -> Optional[Dict]:
+        """获取最近一次检查周期的汇总日志"""
+        try:
+            return self.db.monitor_logs.find_one({'status': 'cycle'}, {'_id': 0}, sort=[('check_time', DESCENDING)])
+            
+        except Exception as e:
+            self.logger.error(f"获取检查周期汇总失败: {e}")
+            return None
+    
+    # ===== 实时事件 =====
+    def add_events(self, events: List[Dict]) -> bool:
+        """发布实时事件，每条包含 type/data（写入events集合，供Web端推送）"""
+        if not events:
+            return True
+        
+        try:
+            now = datetime.now()
+            self.db.events.insert_many(
+                [{'type': event['type'], 'data': event['data'], 'created_at': now} for event in events],
+                ordered=False
+            )
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"发布实时事件失败: {e}")
+            return False
+    
+    def tail_events(self, since: datetime):
+        """打开events集合的tailable游标，返回 created_at >= since 的事件（包括之后新写入的）"""
+        return self.db.events.find(
+            {'created_at': {'$gte': since}},
+            cursor_type=CursorType.TAILABLE_AWAIT
+        ).max_await_time_ms(1000)
+    
+    # ===== 新视频通知 =====
+    def get_videos_discovered_after(self, after: Tuple[datetime, str], until: datetime = None,
+                                    limit: int = 100) -> List[Dict]:
+        """按 (discovered_at, video_id) 正序读取高水位之后发现的视频（使用discovered_at的分页索引）"""
+        try:
+            discovered_at, video_id = after
+            query = {'$or': [
+                {'discovered_at': {'$gt': discovered_at}},
+                {'discovered_at': discovered_at, 'video_id': {'$gt': video_id}}
+            ]}
+            if until:
+                query = {'$and': [query, {'discovered_at': {'$lte': until}}]}
+            
+            return list(self.db.videos.find(query, {'_id': 0})
+                        .sort([('discovered_at', ASCENDING), ('video_id', ASCENDING)])
+                        .limit(limit))
+            
+        except Exception as e:
+            self.logger.error(f"读取新发现的视频失败: {e}")
+            return []
+    
+    def watch_new_videos(self, resume_token: Dict = None):
+        """打开videos集合插入事件的变更流（需要副本集）；单机MongoDB不支持时返回None"""
+        pipeline = [{'$match': {'operationType': 'insert'}}]
+        try:
+            return self.db.videos.watch(pipeline, resume_after=resume_token, max_await_time_ms=1000)
+            
+        except OperationFailure as e:
+            # 280/286：断点已不在oplog中，只能从当前位置重新开始
+            if resume_token and e.code in (280, 286):
+                self.logger.warning(f"变更流断点已失效，从当前位置开始: {e}")
+                return self.db.videos.watch(pipeline, max_await_time_ms=1000)
+            self.logger.info(f"MongoDB不支持变更流（需要副本集）: {e}")
+            return None
+    
+    # ===== 多节点分片租约 =====
+    @staticmethod
+    def _lease_to_dict(doc: Dict) -> Dict:
+        lease = dict(doc)
+        lease['shard'] = lease.pop('_id')
+        return lease
+    
+    def claim_shard_lease(self, owner: str, lease_seconds: int, ready_before: datetime = None) -> Optional[Dict]:
+        """用一次 find_one_and_update 领取最早到期的空闲分片，多个节点同时领取时每个分片只会交给其中一个；
+        节点崩溃后租约到期，分片的 next_run_at 没有推进，会被其他节点重新领取"""
+        try:
+            now = datetime.now()
+            doc = self.db.shard_leases.find_one_and_update(
+                {'expires_at': {'$lte': now}, 'next_run_at': {'$lte': ready_before or now}},
+                {'$set': {'owner': owner, 'claimed_at': now, 'expires_at': now + timedelta(seconds=lease_seconds)}},
+                sort=[('next_run_at', ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+            return self._lease_to_dict(doc) if doc else None
+            
+        except Exception as e:
+            self.logger.error(f"领取分片租约失败: {e}")
+            return None
+    
+    def renew_shard_lease(self, shard: int, owner: str, lease_seconds: int) -> bool:
+        """续租；租约已被其他节点接管时返回False"""
+        try:
+            result = self.db.shard_leases.update_one(
+                {'_id': shard, 'owner': owner},
+                {'$set': {'expires_at': datetime.now() + timedelta(seconds=lease_seconds)}}
+            )
+            return result.matched_count > 0
+            
+        except Exception as e:
+            self.logger.error(f"分片续租失败: {e}")
+            return False
+    
+    def release_shard_lease(self, shard: int, owner: str, next_run_at: datetime) -> bool:
+        """释放租约并设置分片下次可领取的时间；租约已被其他节点接管时返回False"""
+        try:
+            result = self.db.shard_leases.update_one(
+                {'_id': shard, 'owner': owner},
+                {'$set': {'owner': None, 'expires_at': datetime.now(), 'next_run_at': next_run_at}}
+            )
+            return result.matched_count > 0
+            
+        except Exception as e:
+            self.logger.error(f"释放分片租约失败: {e}")
+            return False
+    
+    def get_shard_leases(self) -> List[Dict]:
+        """获取所有分片的租约状态"""
+        try:
+            return [self._lease_to_dict(doc) for doc in self.db.shard_leases.find().sort('_id', 1)]
+            
+        except Exception as e:
+            self.logger.error(f"获取分片租约失败: {e}")
+            return []
+    
+    def get_shard_channels(self, shard: int, due_only: bool = False, now: datetime = None) -> List[Dict]:
+        """获取分片内的活跃频道（due_only=True时只返回到期的频道）"""
+        try:
+            query = {'shard': shard, 'is_active': True}
+            if due_only:
+                query['$or'] = [
+                    {'next_check_at': {'$lte': now or datetime.now()}},
+                    {'next_check_at': None}
+                ]
+            return list(self.db.channels.find(query, {'_id': 0}).sort('channel_name', 1))
+            
+        except Exception as e:
+            self.logger.error(f"获取分片频道失败: {e}")
+            return []
+    
+    def record_worker_stats(self, worker_id: str, shards: int, channels: int, new_videos: int,
+                            busy_seconds: float) -> bool:
+        """累加轮询节点的处理量"""
+        try:
+            now = datetime.now()
+            self.db.poll_workers.update_one(
+                {'_id': worker_id},
+                {
+                    '$inc': {
+                        'shards_processed': shards,
+                        'channels_checked': channels,
+                        'new_videos': new_videos,
+                        'busy_seconds': busy_seconds
+                    },
+                    '$set': {'last_seen_at': now},
+                    '$setOnInsert': {'started_at': now}
+                },
+                upsert=True
+            )
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"记录节点处理量失败: {e}")
+            return False
+    
+    def get_worker_stats(self, active_since: datetime = None) -> List[Dict]:
+        """获取轮询节点的累计处理量（按最近活跃时间倒序）"""
+        try:
+            query = {'last_seen_at': {'$gte': active_since}} if active_since else {}
+            workers = []
+            for doc in self.db.poll_workers.find(query).sort('last_seen_at', -1):
+                doc['worker_id'] = doc.pop('_id')
+                workers.append(doc)
+            return workers
+            
+        except Exception as e:
+            self.logger.error(f"获取节点处理量失败: {e}")
+            return []
+    
+    # ===== 性能指标 =====
+    @staticmethod
+    def _metric_series_id(metric: str, labels: List[str]) -> str:
+        return metric + json.dumps(labels, ensure_ascii=False)
+    
+    def add_metric_series(self, series: List[Dict]) -> bool:
+        """累加性能指标（每个序列一个文档，$inc 各分桶，多个进程同时写入也不会丢失）"""
+        if not series:
+            return True
+        
+        try:
+            operations = [
+                UpdateOne(
+                    {'_id': self._metric_series_id(item['metric'], item['labels'])},
+                    {
+                        '$inc': {f'values.{name}': value for name, value in item['values'].items()},
+                        '$setOnInsert': {'metric': item['metric'], 'labels': item['labels']}
+                    },
+                    upsert=True
+                )
+                for item in series
+            ]
+            self.db.metric_series.bulk_write(operations, ordered=False)
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"记录性能指标失败: {e}")
+            return False
+    
+    def get_metric_series(self) -> List[Dict]:
+        """获取所有进程累加的性能指标"""
+        try:
+            return list(self.db.metric_series.find({}, {'_id': 0, 'metric': 1, 'labels': 1, 'values': 1}))
+            
+        except Exception as e:
+            self.logger.error(f"获取性能指标失败: {e}")
+            return []
+    
+    # ===== 后台任务 =====
+    def create_job(self, job_doc: Dict) -> bool:
+        """创建后台任务；已有相同dedup_key的进行中任务（或写入失败）时返回False"""
+        try:
+            self.db.jobs.insert_one({**job_doc, 'active': True})
+            return True
+            
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            self.logger.error(f"创建后台任务失败: {e}")
+            return False
+    
+    def get_active_job(self, dedup_key: str) -> Optional[Dict]:
+        """获取指定dedup_key的进行中任务"""
+        try:
+            return self.db.jobs.find_one({'dedup_key': dedup_key, 'active': True}, {'_id': 0})
+            
+        except Exception as e:
+            self.logger.error(f"获取进行中任务失败: {e}")
+            return None
+    
+    def update_job(self, job_id: str, fields: Dict, finished: bool = False, expected_status: str = None) -> bool:
+        """更新任务状态和进度；finished=True时释放去重键；expected_status不为None时只在任务仍处于该状态时更新"""
+        try:
+            update = {'$set': {**fields, 'updated_at': datetime.now()}}
+            if finished:
+                update['$set']['finished_at'] = datetime.now()
+                update['$unset'] = {'active': ''}
+            
+            query = {'job_id': job_id}
+            if expected_status is not None:
+                query['status'] = expected_status
+            result = self.db.jobs.update_one(query, update)
+            return result.matched_count > 0
+            
+        except Exception as e:
+            self.logger.error(f"更新后台任务失败: {e}")
+            return False
+    
+    def heartbeat_jobs(self, worker_id: str) -> int:
+        """刷新该工作进程所有进行中任务的心跳时间"""
+        try:
+            result = self.db.jobs.update_many(
+                {'worker_id': worker_id, 'active': True},
+                {'$set': {'heartbeat_at': datetime.now()}}
+            )
+            return result.modified_count
+            
+        except Exception as e:
+            self.logger.error(f"刷新后台任务心跳失败: {e}")
+            return 0
+    
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """获取单个任务"""
+        try:
+            return self.db.jobs.find_one({'job_id': job_id}, {'_id': 0, 'active': 0})
+            
+        except Exception as e:
+            self.logger.error(f"获取后台任务失败: {e}")
+            return None
+    
+    def get_recent_jobs(self, limit: int = 20) -> List[Dict]:
+        """获取最近的任务"""
+        try:
+            return list(self.db.jobs.find({}, {'_id': 0, 'active': 0}).sort('created_at', -1).limit(limit))
+            
+        except Exception as e:
+            self.logger.error(f"获取后台任务列表失败: {e}")
+            return []
+    
     # ===== 配置管理 =====
     def get_config(self, key: str) -> Optional[str]:
         """获取配置值"""
@@ -492,6 +1310,7 @@ class MongoDBManager:
             )
             
             deleted_count = result.deleted_count
+            self._notify_write('logs')
             self.logger.info(f"清理了 {deleted_count} 条过期日志")
             return deleted_count
             
@@ -507,8 +1326,8 @@ class MongoDBManager:
             # 活跃频道数量
             stats['active_channels'] = self.db.channels.count_documents({'is_active': True})
             
-            # 视频总数
-            stats['total_videos'] = self.db.videos.count_documents({})
+            # 视频总数（使用集合元数据，不扫描文档）
+            stats['total_videos'] = self.db.videos.estimated_document_count()
             
             # 最近7天新增视频
             cutoff_date = datetime.now() - timedelta(days=7)
@@ -517,7 +1336,7 @@ class MongoDBManager:
             )
             
             # 日志总数
-            stats['total_logs'] = self.db.monitor_logs.count_documents({})
+            stats['total_logs'] = self.db.monitor_logs.estimated_document_count()
             
             return stats
             
@@ -540,52 +1359,160 @@ class MongoDBManager:
             self.logger.error(f"数据库连接测试失败: {e}")
             return False
     
-    # ===== 聚合查询示例 =====
-    def get_channel_video_stats(self) -> List[Dict]:
-        """获取每个频道的视频统计"""
+    # ===== 频道统计计数 =====
+    def _inc_channel_stats(self, video_docs: List[Dict]):
+        """新视频入库后增加频道计数（总数、最新发布时间、按发现日期分桶）"""
+        if not video_docs:
+            return
+        
+        try:
+            per_channel = {}
+            for doc in video_docs:
+                stats = per_channel.setdefault(doc['channel_id'], {'count': 0, 'latest': None, 'daily': {}})
+                stats['count'] += 1
+                if doc.get('published_at') and (stats['latest'] is None or doc['published_at'] > stats['latest']):
+                    stats['latest'] = doc['published_at']
+                day = self._stats_day(doc['discovered_at'])
+                stats['daily'][day] = stats['daily'].get(day, 0) + 1
+            
+            expired_days = self._expired_stats_days()
+            operations = []
+            for channel_id, stats in per_channel.items():
+                update = {
+                    '$inc': {'total_videos': stats['count'],
+                             **{f'daily.{day}': count for day, count in stats['daily'].items()}},
+                    '$set': {'updated_at': datetime.now()},
+                    # 同一次更新中删除超出保留天数的分桶
+                    '$unset': {f'daily.{day}': '' for day in expired_days if day not in stats['daily']}
+                }
+                if stats['latest'] is not None:
+                    update['$max'] = {'latest_video_date': stats['latest']}
+                operations.append(UpdateOne({'channel_id': channel_id}, update, upsert=True))
+            
+            self.db.channel_stats.bulk_write(operations, ordered=False)
+            
+        except Exception as e:
+            self.logger.error(f"更新频道统计失败: {e}")
+    
+    def _expired_stats_days(self) -> List[str]:
+        """刚超出保留天数的分桶键（保留窗口之前 STATS_BUCKET_DAYS 天）；
+        更早的分桶只会留在这段时间内一直没有新视频的频道上，由 rebuild_channel_stats 清理"""
+        cutoff_date = datetime.now() - timedelta(days=Config.STATS_BUCKET_DAYS)
+        return [self._stats_day(cutoff_date - timedelta(days=i)) for i in range(1, Config.STATS_BUCKET_DAYS + 1)]
+    
+    def _dec_channel_stats(self, video_doc: Dict):
+        """视频删除后减少频道计数"""
+        try:
+            update = {'$inc': {'total_videos': -1}, '$set': {'updated_at': datetime.now()}}
+            cutoff_date = datetime.now() - timedelta(days=Config.STATS_BUCKET_DAYS)
+            if video_doc.get('discovered_at') and video_doc['discovered_at'] >= cutoff_date:
+                # 超出保留天数的分桶已被删除，不再减少（避免重新生成负数的分桶）
+                update['$inc'][f"daily.{self._stats_day(video_doc['discovered_at'])}"] = -1
+            
+            stats = self.db.channel_stats.find_one_and_update(
+                {'channel_id': video_doc['channel_id']}, update,
+                projection={'_id': 0, 'latest_video_date': 1}
+            )
+            
+            # 删除的是最新视频时重新查询最新发布时间
+            if stats and stats.get('latest_video_date') == video_doc.get('published_at'):
+                self.db.channel_stats.update_one(
+                    {'channel_id': video_doc['channel_id']},
+                    {'$set': {'latest_video_date': self.get_latest_video_date(video_doc['channel_id'])}}
+                )
+            
+        except Exception as e:
+            self.logger.error(f"更新频道统计失败: {e}")
+    
+    def rebuild_channel_stats(self) -> int:
+        """根据videos集合重建所有频道的统计计数（用于修复不一致），返回频道数"""
         try:
+            stats = {}
+            
             pipeline = [
-                {
-                    '$lookup': {
-                        'from': 'videos',
-                        'localField': 'channel_id',
-                        'foreignField': 'channel_id',
-                        'as': 'videos'
-                    }
-                },
-                {
-                    '$project': {
-                        '_id': 0,
-                        'channel_id': 1,
-                        'channel_name': 1,
-                        'is_active': 1,
-                        'total_videos': {'$size': '$videos'},
-                        'latest_video_date': {
-                            '$max': '$videos.published_at'
-                        },
-                        'videos_last_7_days': {
-                            '$size': {
-                                '$filter': {
-                                    'input': '$videos',
-                                    'cond': {
-                                        '$gte': [
-                                            '$$this.discovered_at',
-                                            datetime.now() - timedelta(days=7)
-                                        ]
-                                    }
-                                }
-                            }
-                        }
-                    }
-                },
-                {
-                    '$match': {'is_active': True}
+                {'$group': {
+                    '_id': '$channel_id',
+                    'total_videos': {'$sum': 1},
+                    'latest_video_date': {'$max': '$published_at'}
+                }}
+            ]
+            for row in self.db.videos.aggregate(pipeline, allowDiskUse=True):
+                stats[row['_id']] = {
+                    'channel_id': row['_id'],
+                    'total_videos': row['total_videos'],
+                    'latest_video_date': row['latest_video_date'],
+                    'daily': {},
+                    'updated_at': datetime.now()
                 }
+            
+            # 只保留最近 STATS_BUCKET_DAYS 天的分桶
+            cutoff_date = datetime.now() - timedelta(days=Config.STATS_BUCKET_DAYS)
+            pipeline = [
+                {'$match': {'discovered_at': {'$gte': cutoff_date}}},
+                {'$group': {
+                    '_id': {
+                        'channel_id': '$channel_id',
+                        'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$discovered_at'}}
+                    },
+                    'count': {'$sum': 1}
+                }}
+            ]
+            for row in self.db.videos.aggregate(pipeline, allowDiskUse=True):
+                channel_stats = stats.get(row['_id']['channel_id'])
+                if channel_stats:
+                    channel_stats['daily'][row['_id']['day']] = row['count']
+            
+            operations = [
+                ReplaceOne({'channel_id': channel_id}, doc, upsert=True)
+                for channel_id, doc in stats.items()
             ]
+            if operations:
+                self.db.channel_stats.bulk_write(operations, ordered=False)
+            self.db.channel_stats.delete_many({'channel_id': {'$nin': list(stats)}})
+            self._notify_write('videos')
+            
+            self.logger.info(f"重建频道统计完成: {len(stats)} 个频道")
+            return len(stats)
+            
+        except Exception as e:
+            self.logger.error(f"重建频道统计失败: {e}")
+            return 0
+    
+    def get_channel_video_stats(self) -> List[Dict]:
+        """获取每个频道的视频统计（读取增量维护的计数，不扫描videos集合）"""
+        try:
+            channels = list(self.db.channels.find(
+                {'is_active': True},
+                {'_id': 0, 'channel_id': 1, 'channel_name': 1, 'is_active': 1}
+            ))
+            
+            stats_by_channel = {
+                doc['channel_id']: doc
+                for doc in self.db.channel_stats.find(
+                    {'channel_id': {'$in': [channel['channel_id'] for channel in channels]}},
+                    {'_id': 0}
+                )
+            }
+            
+            # 最近7天（含今天）的分桶
+            today = datetime.now()
+            recent_days = {self._stats_day(today - timedelta(days=i)) for i in range(7)}
+            
+            result = []
+            for channel in channels:
+                stats = stats_by_channel.get(channel['channel_id'], {})
+                daily = stats.get('daily', {})
+                result.append({
+                    'channel_id': channel['channel_id'],
+                    'channel_name': channel['channel_name'],
+                    'is_active': channel['is_active'],
+                    'total_videos': stats.get('total_videos', 0),
+                    'latest_video_date': stats.get('latest_video_date'),
+                    'videos_last_7_days': sum(count for day, count in daily.items() if day in recent_days)
+                })
             
-            result = list(self.db.channels.aggregate(pipeline))
             return result
             
         except Exception as e:
             self.logger.error(f"获取频道视频统计失败: {e}")
-            return [] 
\ No newline at end of file
+            return []
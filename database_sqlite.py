@@ -0,0 +1,1571 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite存储后端
+内嵌数据库，不需要单独启动数据库服务，适合小规模/边缘部署（STORAGE_BACKEND=sqlite）；
+WAL模式下多个线程/进程可以同时读，批量写入在一个事务中完成
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import weakref
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Set, Tuple
+
+from config import Config
+from storage import StorageBackend
+
+
+def _adapt_datetime(value: datetime) -> str:
+    """时间统一存为UTC无时区的 'YYYY-MM-DD HH:MM:SS.ffffff'，字符串顺序即时间顺序（与MongoDB一致）"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(sep=' ', timespec='microseconds')
+
+
+def _convert_datetime(value: bytes) -> datetime:
+    return datetime.fromisoformat(value.decode('utf-8'))
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter('DATETIME', _convert_datetime)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id TEXT PRIMARY KEY,
+    channel_name TEXT,
+    channel_url TEXT,
+    description TEXT,
+    subscriber_count INTEGER,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    shard INTEGER,
+    poll_interval INTEGER,
+    next_check_at DATETIME,
+    last_checked_at DATETIME,
+    created_at DATETIME,
+    updated_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_channels_active_name ON channels (is_active, channel_name);
+CREATE INDEX IF NOT EXISTS idx_channels_active_next_check ON channels (is_active, next_check_at);
+
+CREATE TABLE IF NOT EXISTS channel_stats (
+    channel_id TEXT PRIMARY KEY,
+    total_videos INTEGER NOT NULL DEFAULT 0,
+    latest_video_date DATETIME,
+    updated_at DATETIME
+);
+CREATE TABLE IF NOT EXISTS channel_stats_daily (
+    channel_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (channel_id, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_channel_stats_daily_day ON channel_stats_daily (day);
+
+CREATE TABLE IF NOT EXISTS feed_states (
+    channel_id TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    updated_at DATETIME
+);
+
+CREATE TABLE IF NOT EXISTS channel_resolutions (
+    key TEXT PRIMARY KEY,
+    channel_id TEXT,
+    channel_name TEXT,
+    expires_at DATETIME,
+    updated_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_channel_resolutions_expires ON channel_resolutions (expires_at);
+
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    channel_name TEXT,
+    channel_url TEXT,
+    title TEXT,
+    description TEXT,
+    video_url TEXT,
+    thumbnail_url TEXT,
+    duration TEXT,
+    view_count INTEGER,
+    like_count INTEGER,
+    comment_count INTEGER,
+    published_at DATETIME,
+    discovered_at DATETIME,
+    updated_at DATETIME,
+    tags TEXT,
+    category_id TEXT,
+    is_new INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_videos_channel_published ON videos (channel_id, published_at DESC, video_id DESC);
+CREATE INDEX IF NOT EXISTS idx_videos_discovered ON videos (discovered_at DESC, video_id DESC);
+
+CREATE TABLE IF NOT EXISTS monitor_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel_id TEXT,
+    check_time DATETIME,
+    new_videos_count INTEGER,
+    status TEXT,
+    message TEXT,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_monitor_logs_check_time ON monitor_logs (check_time);
+CREATE INDEX IF NOT EXISTS idx_monitor_logs_channel_check_time ON monitor_logs (channel_id, check_time DESC);
+CREATE INDEX IF NOT EXISTS idx_monitor_logs_status_check_time ON monitor_logs (status, check_time DESC);
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    data TEXT,
+    created_at DATETIME
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    type TEXT,
+    dedup_key TEXT,
+    channel_id TEXT,
+    status TEXT,
+    total_channels INTEGER,
+    channels_done INTEGER,
+    new_videos INTEGER,
+    error TEXT,
+    elapsed_seconds REAL,
+    worker_id TEXT,
+    heartbeat_at DATETIME,
+    active INTEGER,
+    created_at DATETIME,
+    started_at DATETIME,
+    updated_at DATETIME,
+    finished_at DATETIME
+);
+-- 同一dedup_key只能有一个进行中的任务（跨进程去重）
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedup_key_active ON jobs (dedup_key) WHERE active = 1;
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs (finished_at);
+
+-- 多节点分片租约（每个分片一行，SQLite只适用于同一台机器上的多个进程）
+CREATE TABLE IF NOT EXISTS shard_leases (
+    shard INTEGER PRIMARY KEY,
+    owner TEXT,
+    claimed_at DATETIME,
+    expires_at DATETIME,
+    next_run_at DATETIME
+);
+CREATE TABLE IF NOT EXISTS poll_workers (
+    worker_id TEXT PRIMARY KEY,
+    shards_processed INTEGER NOT NULL DEFAULT 0,
+    channels_checked INTEGER NOT NULL DEFAULT 0,
+    new_videos INTEGER NOT NULL DEFAULT 0,
+    busy_seconds REAL NOT NULL DEFAULT 0,
+    started_at DATETIME,
+    last_seen_at DATETIME
+);
+
+CREATE TABLE IF NOT EXISTS metric_series (
+    metric TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, labels, name)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS config (
+    config_key TEXT PRIMARY KEY,
+    config_value TEXT,
+    description TEXT,
+    created_at DATETIME,
+    updated_at DATETIME
+);
+"""
+
+VIDEO_COLUMNS = ('video_id', 'channel_id', 'channel_name', 'channel_url', 'title', 'description',
+                 'video_url', 'thumbnail_url', 'duration', 'view_count', 'like_count', 'comment_count',
+                 'published_at', 'discovered_at', 'updated_at', 'tags', 'category_id', 'is_new')
+
+JOB_COLUMNS = ('job_id', 'type', 'dedup_key', 'channel_id', 'status', 'total_channels', 'channels_done',
+               'new_videos', 'error', 'elapsed_seconds', 'worker_id', 'heartbeat_at', 'active', 'created_at',
+               'started_at', 'updated_at', 'finished_at')
+
+BOOL_COLUMNS = ('is_active', 'is_new')
+
+
+class _EventTail:
+    """SQLite没有tailable游标：轮询events表，行为与MongoDB的TAILABLE_AWAIT游标一致（每轮迭代最多等待约1秒）"""
+
+    def __init__(self, manager: 'SQLiteManager', since: datetime):
+        self.manager = manager
+        self.since = since
+        self.last_id = 0
+        self.alive = True
+
+    def __iter__(self):
+        deadline = time.monotonic() + 1
+        while self.alive:
+            rows = self.manager._query(
+                'SELECT id, type, data, created_at FROM events WHERE created_at >= ? AND id > ? ORDER BY id',
+                (self.since, self.last_id)
+            )
+            if rows:
+                for row in rows:
+                    self.last_id = row['id']
+                    yield {'_id': row['id'], 'type': row['type'], 'data': json.loads(row['data']),
+                           'created_at': row['created_at']}
+                return
+
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(0.2)
+
+    def close(self):
+        self.alive = False
+
+
+class _ThreadConnection:
+    """线程局部变量只持有这个对象：线程结束时它被回收，连接随之关闭（线程池每个周期新建线程也不会积累连接）"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        weakref.finalize(self, conn.close)
+
+
+class SQLiteManager(StorageBackend):
+    # 数据库结构版本（保存在 PRAGMA user_version 中）：修改表结构时加1，同时修改 SCHEMA 并在 MIGRATIONS 中追加一步
+    SCHEMA_VERSION = 6
+    MIGRATIONS = [
+        (1, '建表、建索引和默认配置', '_migrate_v1_baseline'),
+        (2, '监控日志增加details列和按状态查询的索引', '_migrate_v2_log_details'),
+        (3, '频道分片号和多节点分片租约', '_migrate_v3_shard_leases'),
+        (4, '后台任务增加工作进程和心跳列', '_migrate_v4_job_heartbeat'),
+        (5, '频道统计分桶按日期删除的索引', '_migrate_v5_stats_daily_day'),
+        (6, '多进程累加的性能指标', '_migrate_v6_metric_series'),
+    ]
+    # events表保留的最新事件条数（相当于MongoDB的固定集合）
+    EVENTS_MAX_ROWS = 10000
+
+    def __init__(self, path: str = None):
+        super().__init__()
+        self.path = path or Config.SQLITE_PATH
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()  # 每个线程一个连接
+        self._connections = weakref.WeakSet()  # 仍在使用的连接（线程结束后自动移除）
+        self._connections_lock = threading.Lock()
+        
+        started = time.perf_counter()
+        version = self._ensure_schema()
+        self.logger.info(f"SQLite就绪: {self.path}, 结构版本 v{version}, 启动耗时 {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    # ===== 连接与初始化 =====
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """当前线程的数据库连接"""
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=30,
+                detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=OFF')
+            holder = self._local.holder = _ThreadConnection(conn)
+            with self._connections_lock:
+                self._connections.add(holder)
+        return holder.conn
+
+    # ===== 结构版本与迁移 =====
+    def get_schema_version(self) -> int:
+        """读取数据库当前的结构版本（新文件为0）"""
+        return self.conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def _ensure_schema(self) -> int:
+        """启动时只读取结构版本，版本落后时才建表建索引"""
+        version = self.get_schema_version()
+        if version < self.SCHEMA_VERSION:
+            if not Config.AUTO_MIGRATE:
+                self.logger.warning(f"数据库结构版本 v{version} 低于程序要求的 v{self.SCHEMA_VERSION}，"
+                                    f"请运行: python main_rss.py migrate")
+                return version
+            return self.migrate()['to_version']
+
+        if version > self.SCHEMA_VERSION:
+            self.logger.warning(f"数据库结构版本 v{version} 高于程序支持的 v{self.SCHEMA_VERSION}，请升级程序")
+        return version
+
+    def migrate(self, force: bool = False) -> Dict:
+        """依次执行落后的迁移步骤，每步完成后记录版本（各步骤都可以重复执行）"""
+        started = time.perf_counter()
+        from_version = 0 if force else self.get_schema_version()
+        version = from_version
+
+        try:
+            for step_version, description, method_name in self.MIGRATIONS:
+                if step_version <= version:
+                    continue
+
+                self.logger.info(f"数据库迁移 v{step_version}: {description}")
+                getattr(self, method_name)()
+                self.conn.execute(f'PRAGMA user_version = {step_version}')
+                version = step_version
+
+        except Exception as e:
+            self.logger.error(f"数据库迁移失败（停留在 v{version}）: {e}")
+            raise
+
+        elapsed = time.perf_counter() - started
+        if version != from_version:
+            self.logger.info(f"数据库迁移完成: v{from_version} -> v{version}, 耗时 {elapsed:.2f} 秒")
+
+        return {'from_version': from_version, 'to_version': version, 'elapsed_seconds': round(elapsed, 3)}
+
+    def _migrate_v1_baseline(self):
+        """建表建索引（语句都带 IF NOT EXISTS）并插入默认配置"""
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+        self._insert_default_config()
+
+    def _migrate_v2_log_details(self):
+        """v1的monitor_logs表没有details列（新建的表已经包含）"""
+        columns = {row['name'] for row in self._query('PRAGMA table_info(monitor_logs)')}
+        with self.conn:
+            if 'details' not in columns:
+                self.conn.execute('ALTER TABLE monitor_logs ADD COLUMN details TEXT')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_monitor_logs_status_check_time '
+                              'ON monitor_logs (status, check_time DESC)')
+
+    def _migrate_v3_shard_leases(self):
+        """旧的channels表没有shard列；为已有频道写入分片号，每个分片插入一行租约（已有的不覆盖）"""
+        columns = {row['name'] for row in self._query('PRAGMA table_info(channels)')}
+        epoch = datetime(1970, 1, 1)
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+        with self.conn:
+            if 'shard' not in columns:
+                self.conn.execute('ALTER TABLE channels ADD COLUMN shard INTEGER')
+            self.conn.executemany(
+                'UPDATE channels SET shard = ? WHERE channel_id = ?',
+                [(self.channel_shard(row['channel_id']), row['channel_id'])
+                 for row in self._query('SELECT channel_id FROM channels WHERE shard IS NULL')]
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_channels_shard '
+                              'ON channels (shard, is_active, next_check_at)')
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO shard_leases (shard, expires_at, next_run_at) VALUES (?, ?, ?)',
+                [(shard, epoch, epoch) for shard in range(self.LEASE_SHARDS)]
+            )
+
+    def _migrate_v4_job_heartbeat(self):
+        """旧的jobs表没有worker_id和heartbeat_at列（新建的表已经包含）"""
+        columns = {row['name'] for row in self._query('PRAGMA table_info(jobs)')}
+        with self.conn:
+            for column, column_type in (('worker_id', 'TEXT'), ('heartbeat_at', 'DATETIME')):
+                if column not in columns:
+                    self.conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {column_type}')
+
+    def _migrate_v5_stats_daily_day(self):
+        """写入频道统计时按日期删除过期分桶"""
+        with self.conn:
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_channel_stats_daily_day ON channel_stats_daily (day)')
+
+    def _migrate_v6_metric_series(self):
+        """新建metric_series表（语句都带 IF NOT EXISTS）"""
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def _insert_default_config(self):
+        """插入默认配置"""
+        try:
+            now = datetime.now()
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO config (config_key, config_value, description, created_at, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [
+                        ('check_interval', '3600', '检查间隔（秒），默认1小时', now, now),
+                        ('max_videos_per_check', '50', '每次检查最多获取的视频数量', now, now),
+                        ('retention_days', '365', '日志保留天数', now, now)
+                    ]
+                )
+
+        except Exception as e:
+            self.logger.error(f"插入默认配置失败: {e}")
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict:
+        """把查询结果转换为与MongoDB文档相同形式的字典"""
+        doc = dict(row)
+        for column in BOOL_COLUMNS:
+            if doc.get(column) is not None:
+                doc[column] = bool(doc[column])
+        if 'tags' in doc:
+            doc['tags'] = json.loads(doc['tags']) if doc['tags'] else []
+        if 'details' in doc:
+            if doc['details']:
+                doc['details'] = json.loads(doc['details'])
+            else:
+                del doc['details']  # 与MongoDB一致：没有details的日志不带这个字段
+        return doc
+
+    def _query(self, sql: str, params=()) -> List[sqlite3.Row]:
+        return self.conn.execute(sql, params).fetchall()
+
+    def _find(self, sql: str, params=()) -> List[Dict]:
+        return [self._row_to_dict(row) for row in self._query(sql, params)]
+
+    def _find_one(self, sql: str, params=()) -> Optional[Dict]:
+        row = self.conn.execute(sql, params).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    @staticmethod
+    def _placeholders(values) -> str:
+        return ','.join('?' * len(values))
+
+    # ===== 频道管理 =====
+    def _upsert_channels(self, channels: List[Dict]) -> List[Tuple]:
+        """在当前事务中覆盖写入频道，返回写入的 (channel_name, channel_url, channel_id)"""
+        now = datetime.now()
+        rows = [
+            (channel['channel_id'], channel['channel_name'], channel['channel_url'],
+             channel.get('description'), channel.get('subscriber_count'),
+             self.channel_shard(channel['channel_id']), now, now)
+            for channel in channels
+        ]
+        # 与MongoDB的replace_one一致：整条覆盖，调度字段重置
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO channels (channel_id, channel_name, channel_url, description, '
+            'subscriber_count, shard, is_active, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)',
+            rows
+        )
+        return [(row[1], row[2], row[0]) for row in rows]
+
+    def _propagate_channel_fields(self, fields: List[Tuple]) -> int:
+        """在当前事务中把频道名称和URL同步到该频道的视频（只更新不一致的视频），返回更新的视频数"""
+        modified = 0
+        for channel_name, channel_url, channel_id in fields:
+            cursor = self.conn.execute(
+                'UPDATE videos SET channel_name = ?, channel_url = ? WHERE channel_id = ? '
+                'AND (channel_name IS NOT ? OR channel_url IS NOT ?)',
+                (channel_name, channel_url, channel_id, channel_name, channel_url)
+            )
+            modified += cursor.rowcount
+        if modified:
+            self.logger.info(f"同步频道信息到 {modified} 个视频")
+        return modified
+
+    def add_channel(self, channel_id: str, channel_name: str, channel_url: str,
+                    description: str = None, subscriber_count: int = None) -> bool:
+        """添加要监控的频道"""
+        try:
+            with self.conn:
+                fields = self._upsert_channels([{
+                    'channel_id': channel_id, 'channel_name': channel_name, 'channel_url': channel_url,
+                    'description': description, 'subscriber_count': subscriber_count
+                }])
+                self._propagate_channel_fields(fields)
+            self._notify_write('channels', f'channel:{channel_id}')
+
+            self.logger.info(f"添加频道成功: {channel_name}")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"添加频道失败: {e}")
+            return False
+
+    def add_channels(self, channels: List[Dict]) -> List[str]:
+        """批量添加频道（一个事务），返回成功保存的频道ID列表"""
+        if not channels:
+            return []
+
+        try:
+            with self.conn:
+                self._propagate_channel_fields(self._upsert_channels(channels))
+            saved_ids = [channel['channel_id'] for channel in channels]
+
+        except Exception as e:
+            self.logger.error(f"批量添加频道失败: {e}")
+            return []
+
+        self._notify_write('channels', *(f'channel:{channel_id}' for channel_id in saved_ids))
+        self.logger.info(f"批量添加频道成功: {len(saved_ids)} 个")
+        return saved_ids
+
+    def backfill_video_channel_fields(self) -> int:
+        """为所有视频回填冗余的频道名称和URL（用于迁移旧数据），返回更新的视频数"""
+        try:
+            with self.conn:
+                channels = self._query('SELECT channel_name, channel_url, channel_id FROM channels')
+                modified = self._propagate_channel_fields([tuple(channel) for channel in channels])
+
+            self._notify_write('videos', 'channel:*')
+            self.logger.info(f"回填视频频道信息完成: {modified} 个视频")
+            return modified
+
+        except Exception as e:
+            self.logger.error(f"回填视频频道信息失败: {e}")
+            return 0
+
+    def get_channel(self, channel_id: str) -> Optional[Dict]:
+        """获取单个频道"""
+        try:
+            return self._find_one('SELECT * FROM channels WHERE channel_id = ?', (channel_id,))
+
+        except Exception as e:
+            self.logger.error(f"获取频道失败: {e}")
+            return None
+
+    def get_active_channels(self) -> List[Dict]:
+        """获取所有活跃的监控频道"""
+        try:
+            return self._find('SELECT * FROM channels WHERE is_active = 1 ORDER BY channel_name')
+
+        except Exception as e:
+            self.logger.error(f"获取频道列表失败: {e}")
+            return []
+
+    def get_due_channels(self, now: datetime = None) -> List[Dict]:
+        """获取到期需要检查的活跃频道（从未调度过的频道也算到期）"""
+        try:
+            return self._find(
+                'SELECT * FROM channels WHERE is_active = 1 '
+                'AND (next_check_at IS NULL OR next_check_at <= ?) ORDER BY channel_name',
+                (now or datetime.now(),)
+            )
+
+        except Exception as e:
+            self.logger.error(f"获取到期频道失败: {e}")
+            return []
+
+    def update_channel_schedules(self, schedules: List[Dict]) -> bool:
+        """批量更新频道的检查间隔和下次检查时间，每条包含 channel_id/poll_interval/next_check_at"""
+        if not schedules:
+            return True
+
+        try:
+            now = datetime.now()
+            with self.conn:
+                self.conn.executemany(
+                    'UPDATE channels SET poll_interval = ?, next_check_at = ?, last_checked_at = ? '
+                    'WHERE channel_id = ?',
+                    [(schedule['poll_interval'], schedule['next_check_at'], now, schedule['channel_id'])
+                     for schedule in schedules]
+                )
+            self._notify_write('channels')
+            return True
+
+        except Exception as e:
+            self.logger.error(f"更新频道调度失败: {e}")
+            return False
+
+    def update_channel_status(self, channel_id: str, is_active: bool) -> bool:
+        """更新频道监控状态"""
+        try:
+            with self.conn:
+                cursor = self.conn.execute(
+                    'UPDATE channels SET is_active = ?, updated_at = ? WHERE channel_id = ? AND is_active != ?',
+                    (is_active, datetime.now(), channel_id, is_active)
+                )
+            self._notify_write('channels', f'channel:{channel_id}')
+
+            return cursor.rowcount > 0
+
+        except Exception as e:
+            self.logger.error(f"更新频道状态失败: {e}")
+            return False
+
+    # ===== RSS抓取状态 =====
+    def get_feed_states(self, channel_ids: List[str]) -> Dict[str, Dict]:
+        """批量获取频道的RSS抓取状态（ETag、Last-Modified、内容哈希）"""
+        channel_ids = list(channel_ids)
+        if not channel_ids:
+            return {}
+
+        try:
+            states = {}
+            # 分批查询，避免超过SQLite的参数个数上限
+            for start in range(0, len(channel_ids), 500):
+                batch = channel_ids[start:start + 500]
+                for state in self._find(
+                    f'SELECT * FROM feed_states WHERE channel_id IN ({self._placeholders(batch)})', batch
+                ):
+                    states[state['channel_id']] = state
+            return states
+
+        except Exception as e:
+            self.logger.error(f"获取RSS抓取状态失败: {e}")
+            return {}
+
+    def save_feed_state(self, channel_id: str, etag: str = None, last_modified: str = None,
+                        content_hash: str = None) -> bool:
+        """保存频道的RSS抓取状态"""
+        try:
+            with self.conn:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO feed_states (channel_id, etag, last_modified, content_hash, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (channel_id, etag, last_modified, content_hash, datetime.now())
+                )
+            return True
+
+        except Exception as e:
+            self.logger.error(f"保存RSS抓取状态失败: {e}")
+            return False
+
+    # ===== 频道ID解析缓存 =====
+    def get_channel_resolution(self, key: str) -> Optional[Dict]:
+        """获取频道URL的解析结果缓存"""
+        try:
+            return self._find_one(
+                'SELECT * FROM channel_resolutions WHERE key = ? AND expires_at > ?',
+                (key, datetime.now())
+            )
+
+        except Exception as e:
+            self.logger.error(f"获取频道解析缓存失败: {e}")
+            return None
+
+    def save_channel_resolution(self, key: str, channel_id: Optional[str], channel_name: str = None,
+                                ttl_seconds: int = None) -> bool:
+        """保存频道URL的解析结果（channel_id为None表示解析失败）"""
+        try:
+            ttl_seconds = ttl_seconds or Config.RESOLVE_CACHE_TTL
+            now = datetime.now()
+            with self.conn:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO channel_resolutions (key, channel_id, channel_name, expires_at, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, channel_id, channel_name, now + timedelta(seconds=ttl_seconds), now)
+                )
+                # 没有TTL索引，写入时顺便清理过期记录
+                self.conn.execute('DELETE FROM channel_resolutions WHERE expires_at <= ?', (now,))
+            return True
+
+        except Exception as e:
+            self.logger.error(f"保存频道解析缓存失败: {e}")
+            return False
+
+    # ===== 视频管理 =====
+    def _build_video_row(self, video_data: Dict) -> Dict:
+        """构建视频记录（字段与MongoDB的视频文档相同）"""
+        published_at = video_data['published_at']
+        if isinstance(published_at, str):
+            published_at = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
+        if published_at.tzinfo is not None:
+            published_at = published_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+        return {
+            'video_id': video_data['video_id'],
+            'channel_id': video_data['channel_id'],
+            'channel_name': video_data.get('channel_name'),  # 冗余频道信息，列表查询无需关联channels
+            'channel_url': video_data.get('channel_url'),
+            'title': video_data['title'],
+            'description': video_data.get('description', ''),
+            'video_url': video_data['video_url'],
+            'thumbnail_url': video_data.get('thumbnail_url', ''),
+            'duration': video_data.get('duration', ''),
+            'view_count': video_data.get('view_count', 0),
+            'like_count': video_data.get('like_count', 0),
+            'comment_count': video_data.get('comment_count', 0),
+            'published_at': published_at,
+            'discovered_at': datetime.now(),
+            'updated_at': datetime.now(),
+            'tags': video_data.get('tags', []),
+            'category_id': video_data.get('category_id'),
+            'is_new': video_data.get('is_new', True)
+        }
+
+    def _fill_channel_fields(self, video_rows: List[Dict]):
+        """为缺少频道名称的视频补充冗余的频道信息"""
+        channel_ids = list({row['channel_id'] for row in video_rows if not row.get('channel_name')})
+        if not channel_ids:
+            return
+
+        channels = {}
+        for start in range(0, len(channel_ids), 500):
+            batch = channel_ids[start:start + 500]
+            channels.update((channel['channel_id'], channel) for channel in self._find(
+                f'SELECT channel_id, channel_name, channel_url FROM channels '
+                f'WHERE channel_id IN ({self._placeholders(batch)})', batch
+            ))
+        for row in video_rows:
+            channel = channels.get(row['channel_id'])
+            if channel and not row.get('channel_name'):
+                row['channel_name'] = channel['channel_name']
+                row['channel_url'] = channel['channel_url']
+
+    def _save_videos(self, video_rows: List[Dict]) -> List[Dict]:
+        """在一个事务中覆盖写入视频并更新频道统计，返回新插入的视频"""
+        with self.conn:
+            self._fill_channel_fields(video_rows)
+
+            video_ids = [row['video_id'] for row in video_rows]
+            existing = set()
+            for start in range(0, len(video_ids), 500):
+                batch = video_ids[start:start + 500]
+                existing.update(row['video_id'] for row in self._query(
+                    f'SELECT video_id FROM videos WHERE video_id IN ({self._placeholders(batch)})', batch
+                ))
+
+            self.conn.executemany(
+                f'INSERT OR REPLACE INTO videos ({", ".join(VIDEO_COLUMNS)}) '
+                f'VALUES ({self._placeholders(VIDEO_COLUMNS)})',
+                [
+                    tuple(json.dumps(row['tags']) if column == 'tags' else row[column] for column in VIDEO_COLUMNS)
+                    for row in video_rows
+                ]
+            )
+
+            # 只有新插入的视频才计入频道统计
+            inserted = [row for row in video_rows if row['video_id'] not in existing]
+            self._inc_channel_stats(inserted)
+
+        return inserted
+
+    def add_video(self, video_data: Dict) -> bool:
+        """添加新视频到数据库"""
+        try:
+            video_row = self._build_video_row(video_data)
+            self._save_videos([video_row])
+            self._notify_write('videos', f"channel:{video_row['channel_id']}")
+
+            self.logger.info(f"添加视频成功: {video_data['title']}")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"添加视频失败: {e}")
+            return False
+
+    def add_videos(self, videos: List[Dict]) -> List[str]:
+        """批量添加视频（一个事务），返回成功保存的视频ID列表"""
+        if not videos:
+            return []
+
+        try:
+            video_rows = [self._build_video_row(video) for video in videos]
+            self._save_videos(video_rows)
+
+        except Exception as e:
+            self.logger.error(f"批量添加视频失败: {e}")
+            return []
+
+        self._notify_write('videos', *{f"channel:{row['channel_id']}" for row in video_rows})
+
+        self.logger.info(f"批量添加视频成功: {len(video_rows)} 个")
+        return [row['video_id'] for row in video_rows]
+
+    def get_video(self, video_id: str) -> Optional[Dict]:
+        """获取单个视频"""
+        try:
+            return self._find_one('SELECT * FROM videos WHERE video_id = ?', (video_id,))
+
+        except Exception as e:
+            self.logger.error(f"获取视频失败: {e}")
+            return None
+
+    def video_exists(self, video_id: str) -> bool:
+        """检查视频是否已存在"""
+        try:
+            return self.conn.execute('SELECT 1 FROM videos WHERE video_id = ?', (video_id,)).fetchone() is not None
+
+        except Exception as e:
+            self.logger.error(f"检查视频存在性失败: {e}")
+            return False
+
+    def get_existing_video_ids(self, video_ids: List[str]) -> Set[str]:
+        """批量检查视频是否存在，返回数据库中已有的视频ID集合"""
+        video_ids = list(video_ids)
+        if not video_ids:
+            return set()
+
+        try:
+            existing = set()
+            for start in range(0, len(video_ids), 500):
+                batch = video_ids[start:start + 500]
+                existing.update(row['video_id'] for row in self._query(
+                    f'SELECT video_id FROM videos WHERE video_id IN ({self._placeholders(batch)})', batch
+                ))
+            return existing
+
+        except Exception as e:
+            self.logger.error(f"批量检查视频存在性失败: {e}")
+            return set()
+
+    def update_video_status(self, video_ids: List[str], is_new: bool = False) -> bool:
+        """更新视频的新旧状态"""
+        try:
+            modified = 0
+            now = datetime.now()
+            with self.conn:
+                for start in range(0, len(video_ids), 500):
+                    batch = list(video_ids[start:start + 500])
+                    cursor = self.conn.execute(
+                        f'UPDATE videos SET is_new = ?, updated_at = ? '
+                        f'WHERE video_id IN ({self._placeholders(batch)}) AND is_new != ?',
+                        [is_new, now, *batch, is_new]
+                    )
+                    modified += cursor.rowcount
+            # 视频ID不带频道信息，所有频道的视频列表都要失效
+            self._notify_write('videos', 'channel:*')
+
+            self.logger.info(f"更新了 {modified} 个视频的状态")
+            return modified > 0
+
+        except Exception as e:
+            self.logger.error(f"更新视频状态失败: {e}")
+            return False
+
+    def delete_video(self, video_id: str) -> bool:
+        """删除单个视频"""
+        try:
+            with self.conn:
+                deleted = self._find_one(
+                    'SELECT channel_id, published_at, discovered_at FROM videos WHERE video_id = ?', (video_id,)
+                )
+                if deleted:
+                    self.conn.execute('DELETE FROM videos WHERE video_id = ?', (video_id,))
+                    self._dec_channel_stats(deleted)
+
+            if deleted:
+                self._notify_write('videos', f"channel:{deleted['channel_id']}")
+                self.logger.info(f"删除视频成功: {video_id}")
+                return True
+            else:
+                self.logger.warning(f"未找到要删除的视频: {video_id}")
+                return False
+
+        except Exception as e:
+            self.logger.error(f"删除视频失败: {e}")
+            return False
+
+    def delete_channel_and_videos(self, channel_id: str) -> Dict[str, int]:
+        """删除频道及其所有视频"""
+        try:
+            with self.conn:
+                videos_deleted = self.conn.execute('DELETE FROM videos WHERE channel_id = ?', (channel_id,)).rowcount
+                channels_deleted = self.conn.execute('DELETE FROM channels WHERE channel_id = ?', (channel_id,)).rowcount
+                logs_deleted = self.conn.execute('DELETE FROM monitor_logs WHERE channel_id = ?', (channel_id,)).rowcount
+                self.conn.execute('DELETE FROM feed_states WHERE channel_id = ?', (channel_id,))
+                self.conn.execute('DELETE FROM channel_stats WHERE channel_id = ?', (channel_id,))
+                self.conn.execute('DELETE FROM channel_stats_daily WHERE channel_id = ?', (channel_id,))
+            self._notify_write('channels', 'videos', 'logs', f'channel:{channel_id}')
+
+            self.logger.info(f"删除频道完成: {channel_id}, 删除了 {videos_deleted} 个视频, {logs_deleted} 个日志")
+
+            return {
+                'channels_deleted': channels_deleted,
+                'videos_deleted': videos_deleted,
+                'logs_deleted': logs_deleted
+            }
+
+        except Exception as e:
+            self.logger.error(f"删除频道失败: {e}")
+            return {'channels_deleted': 0, 'videos_deleted': 0, 'logs_deleted': 0}
+
+    def get_channel_videos(self, channel_id: str, limit: int = None) -> List[Dict]:
+        """获取指定频道的所有视频"""
+        try:
+            return self._find(
+                'SELECT video_id, title, video_url, thumbnail_url, published_at, discovered_at, is_new, channel_name '
+                'FROM videos WHERE channel_id = ? ORDER BY published_at DESC LIMIT ?',
+                (channel_id, limit or -1)
+            )
+
+        except Exception as e:
+            self.logger.error(f"获取频道视频失败: {e}")
+            return []
+
+    def iter_channel_videos(self, channel_id: str, is_new: bool = None,
+                            since: datetime = None, until: datetime = None):
+        """按发布时间倒序逐条读取频道视频（游标，不一次性加载），可按新旧状态和发布时间过滤"""
+        conditions, params = ['channel_id = ?'], [channel_id]
+        if is_new is not None:
+            conditions.append('is_new = ?')
+            params.append(is_new)
+        if since:
+            conditions.append('published_at >= ?')
+            params.append(since)
+        if until:
+            conditions.append('published_at < ?')
+            params.append(until)
+
+        try:
+            # 用独立连接读取：生成器可能跨线程消费，且读取期间不影响当前线程的写入事务
+            conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            try:
+                cursor = conn.execute(
+                    f'SELECT video_id, title, thumbnail_url, published_at FROM videos '
+                    f'WHERE {" AND ".join(conditions)} ORDER BY published_at DESC, video_id DESC',
+                    params
+                )
+                for row in cursor:
+                    yield dict(row)
+            finally:
+                conn.close()
+
+        except Exception as e:
+            self.logger.error(f"读取频道视频失败: {e}")
+
+    def get_latest_video_date(self, channel_id: str) -> Optional[datetime]:
+        """获取频道最新视频的发布日期"""
+        try:
+            row = self.conn.execute(
+                'SELECT published_at FROM videos WHERE channel_id = ? ORDER BY published_at DESC LIMIT 1',
+                (channel_id,)
+            ).fetchone()
+            return row['published_at'] if row else None
+
+        except Exception as e:
+            self.logger.error(f"获取最新视频日期失败: {e}")
+            return None
+
+    def get_recent_publish_times(self, channel_id: str, limit: int = 20) -> List[datetime]:
+        """获取频道最近若干个视频的发布时间（走channel_id+published_at复合索引）"""
+        try:
+            rows = self._query(
+                'SELECT published_at FROM videos WHERE channel_id = ? ORDER BY published_at DESC LIMIT ?',
+                (channel_id, limit)
+            )
+            return [row['published_at'] for row in rows if row['published_at']]
+
+        except Exception as e:
+            self.logger.error(f"获取视频发布时间失败: {e}")
+            return []
+
+    def get_recent_videos(self, days: int = 7) -> List[Dict]:
+        """获取最近几天发现的视频"""
+        try:
+            return self._find(
+                'SELECT video_id, title, video_url, published_at, discovered_at, channel_name, channel_url '
+                'FROM videos WHERE discovered_at >= ? ORDER BY discovered_at DESC',
+                (datetime.now() - timedelta(days=days),)
+            )
+
+        except Exception as e:
+            self.logger.error(f"获取最近视频失败: {e}")
+            return []
+
+    # ===== 游标分页 =====
+    def _find_video_page(self, condition: str, params: list, sort_field: str, limit: int,
+                         after: Optional[Tuple[datetime, str]], columns: str) -> Dict:
+        """按 (sort_field, video_id) 倒序做键集分页，多取一条判断是否还有下一页"""
+        if after:
+            sort_value, video_id = after
+            condition += f' AND ({sort_field} < ? OR ({sort_field} = ? AND video_id < ?))'
+            params = [*params, sort_value, sort_value, video_id]
+
+        videos = self._find(
+            f'SELECT {columns} FROM videos WHERE {condition} '
+            f'ORDER BY {sort_field} DESC, video_id DESC LIMIT ?',
+            [*params, limit + 1]
+        )
+
+        next_cursor = None
+        if len(videos) > limit:
+            videos = videos[:limit]
+            next_cursor = self.encode_cursor(videos[-1][sort_field], videos[-1]['video_id'])
+
+        return {'videos': videos, 'next_cursor': next_cursor}
+
+    def get_channel_videos_page(self, channel_id: str, limit: int, cursor: str = None) -> Dict:
+        """按发布时间倒序分页获取频道视频，返回 {'videos', 'next_cursor'}；游标无效时抛出ValueError"""
+        after = self.decode_cursor(cursor) if cursor else None
+        try:
+            return self._find_video_page(
+                'channel_id = ?', [channel_id], 'published_at', limit, after,
+                'video_id, channel_id, title, video_url, thumbnail_url, published_at, discovered_at, '
+                'is_new, channel_name'
+            )
+
+        except Exception as e:
+            self.logger.error(f"分页获取频道视频失败: {e}")
+            return {'videos': [], 'next_cursor': None}
+
+    def get_recent_videos_page(self, days: int, limit: int, cursor: str = None) -> Dict:
+        """按发现时间倒序分页获取最近几天的视频，返回 {'videos', 'next_cursor'}；游标无效时抛出ValueError"""
+        after = self.decode_cursor(cursor) if cursor else None
+        try:
+            return self._find_video_page(
+                'discovered_at >= ?', [datetime.now() - timedelta(days=days)], 'discovered_at', limit, after,
+                'video_id, channel_id, title, video_url, published_at, discovered_at, channel_name, channel_url'
+            )
+
+        except Exception as e:
+            self.logger.error(f"分页获取最近视频失败: {e}")
+            return {'videos': [], 'next_cursor': None}
+
+    def get_channel_video_count(self, channel_id: str) -> int:
+        """获取频道视频总数（读取channel_stats计数）"""
+        try:
+            row = self.conn.execute(
+                'SELECT total_videos FROM channel_stats WHERE channel_id = ?', (channel_id,)
+            ).fetchone()
+            return row['total_videos'] if row else 0
+
+        except Exception as e:
+            self.logger.error(f"获取频道视频总数失败: {e}")
+            return 0
+
+    # ===== 监控日志 =====
+    def add_monitor_log(self, channel_id: Optional[str], new_videos_count: int = 0,
+                        status: str = 'success', message: str = '', details: Dict = None) -> bool:
+        """添加监控日志"""
+        return self.add_monitor_logs([{
+            'channel_id': channel_id,
+            'new_videos_count': new_videos_count,
+            'status': status,
+            'message': message,
+            'details': details
+        }])
+
+    def add_monitor_logs(self, logs: List[Dict]) -> bool:
+        """批量添加监控日志，每条包含 channel_id/new_videos_count/status/message（可选details）"""
+        if not logs:
+            return True
+
+        try:
+            now = datetime.now()
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT INTO monitor_logs (channel_id, check_time, new_videos_count, status, message, details) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    [(log['channel_id'], now, log.get('new_videos_count', 0),
+                      log.get('status', 'success'), log.get('message', ''),
+                      json.dumps(log['details'], ensure_ascii=False) if log.get('details') is not None else None)
+                     for log in logs]
+                )
+            self._notify_write('logs')
+            return True
+
+        except Exception as e:
+            self.logger.error(f"批量添加监控日志失败: {e}")
+            return False
+
+    def get_monitor_stats(self, channel_id: str = None, days: int = 30) -> List[Dict]:
+        """获取监控统计信息"""
+        try:
+            sql = ('SELECT channel_id, check_time, new_videos_count, status, message, details '
+                   'FROM monitor_logs WHERE check_time >= ?')
+            params = [datetime.now() - timedelta(days=days)]
+            if channel_id:
+                sql += ' AND channel_id = ?'
+                params.append(channel_id)
+
+            return self._find(sql + ' ORDER BY check_time DESC', params)
+
+        except Exception as e:
+            self.logger.error(f"获取监控统计失败: {e}")
+            return []
+
+    def get_last_cycle_log(self) -> Optional[Dict]:
+        """获取最近一次检查周期的汇总日志"""
+        try:
+            return self._find_one(
+                'SELECT channel_id, check_time, new_videos_count, status, message, details '
+                "FROM monitor_logs WHERE status = 'cycle' ORDER BY check_time DESC LIMIT 1"
+            )
+
+        except Exception as e:
+            self.logger.error(f"获取检查周期汇总失败: {e}")
+            return None
+
+    # ===== 实时事件 =====
+    def add_events(self, events: List[Dict]) -> bool:
+        """发布实时事件，每条包含 type/data（写入events表，供Web端推送）"""
+        if not events:
+            return True
+
+        try:
+            now = datetime.now()
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT INTO events (type, data, created_at) VALUES (?, ?, ?)',
+                    [(event['type'], json.dumps(event['data'], ensure_ascii=False, default=str), now)
+                     for event in events]
+                )
+                # 只保留最新的 EVENTS_MAX_ROWS 条
+                self.conn.execute(
+                    'DELETE FROM events WHERE id <= (SELECT MAX(id) FROM events) - ?', (self.EVENTS_MAX_ROWS,)
+                )
+            return True
+
+        except Exception as e:
+            self.logger.error(f"发布实时事件失败: {e}")
+            return False
+
+    def tail_events(self, since: datetime):
+        """轮询events表，返回 created_at >= since 的事件（包括之后新写入的）"""
+        return _EventTail(self, since)
+
+    # ===== 新视频通知 =====
+    def get_videos_discovered_after(self, after: Tuple[datetime, str], until: datetime = None,
+                                    limit: int = 100) -> List[Dict]:
+        """按 (discovered_at, video_id) 正序读取高水位之后发现的视频（使用discovered_at的分页索引）"""
+        try:
+            discovered_at, video_id = after
+            condition = '(discovered_at > ? OR (discovered_at = ? AND video_id > ?))'
+            params = [discovered_at, discovered_at, video_id]
+            if until:
+                condition += ' AND discovered_at <= ?'
+                params.append(until)
+
+            return self._find(
+                f'SELECT * FROM videos WHERE {condition} ORDER BY discovered_at, video_id LIMIT ?',
+                [*params, limit]
+            )
+
+        except Exception as e:
+            self.logger.error(f"读取新发现的视频失败: {e}")
+            return []
+
+    def watch_new_videos(self, resume_token: Dict = None):
+        """SQLite没有变更流，新视频通知改用高水位轮询"""
+        return None
+
+    # ===== 多节点分片租约 =====
+    def claim_shard_lease(self, owner: str, lease_seconds: int, ready_before: datetime = None) -> Optional[Dict]:
+        """在一个 BEGIN IMMEDIATE 事务中选出最早到期的空闲分片并写入持有者，
+        多个进程同时领取时每个分片只会交给其中一个"""
+        try:
+            now = datetime.now()
+            with self.conn:
+                self.conn.execute('BEGIN IMMEDIATE')
+                row = self.conn.execute(
+                    'SELECT shard FROM shard_leases WHERE expires_at <= ? AND next_run_at <= ? '
+                    'ORDER BY next_run_at LIMIT 1',
+                    (now, ready_before or now)
+                ).fetchone()
+                if row is None:
+                    return None
+                self.conn.execute(
+                    'UPDATE shard_leases SET owner = ?, claimed_at = ?, expires_at = ? WHERE shard = ?',
+                    (owner, now, now + timedelta(seconds=lease_seconds), row['shard'])
+                )
+                return self._find_one('SELECT * FROM shard_leases WHERE shard = ?', (row['shard'],))
+
+        except Exception as e:
+            self.logger.error(f"领取分片租约失败: {e}")
+            return None
+
+    def renew_shard_lease(self, shard: int, owner: str, lease_seconds: int) -> bool:
+        """续租；租约已被其他进程接管时返回False"""
+        try:
+            with self.conn:
+                cursor = self.conn.execute(
+                    'UPDATE shard_leases SET expires_at = ? WHERE shard = ? AND owner = ?',
+                    (datetime.now() + timedelta(seconds=lease_seconds), shard, owner)
+                )
+            return cursor.rowcount > 0
+
+        except Exception as e:
+            self.logger.error(f"分片续租失败: {e}")
+            return False
+
+    def release_shard_lease(self, shard: int, owner: str, next_run_at: datetime) -> bool:
+        """释放租约并设置分片下次可领取的时间；租约已被其他进程接管时返回False"""
+        try:
+            with self.conn:
+                cursor = self.conn.execute(
+                    'UPDATE shard_leases SET owner = NULL, expires_at = ?, next_run_at = ? '
+                    'WHERE shard = ? AND owner = ?',
+                    (datetime.now(), next_run_at, shard, owner)
+                )
+            return cursor.rowcount > 0
+
+        except Exception as e:
+            self.logger.error(f"释放分片租约失败: {e}")
+            return False
+
+    def get_shard_leases(self) -> List[Dict]:
+        """获取所有分片的租约状态"""
+        try:
+            return self._find('SELECT * FROM shard_leases ORDER BY shard')
+
+        except Exception as e:
+            self.logger.error(f"获取分片租约失败: {e}")
+            return []
+
+    def get_shard_channels(self, shard: int, due_only: bool = False, now: datetime = None) -> List[Dict]:
+        """获取分片内的活跃频道（due_only=True时只返回到期的频道）"""
+        try:
+            if due_only:
+                return self._find(
+                    'SELECT * FROM channels WHERE shard = ? AND is_active = 1 '
+                    'AND (next_check_at IS NULL OR next_check_at <= ?) ORDER BY channel_name',
+                    (shard, now or datetime.now())
+                )
+            return self._find('SELECT * FROM channels WHERE shard = ? AND is_active = 1 ORDER BY channel_name',
+                              (shard,))
+
+        except Exception as e:
+            self.logger.error(f"获取分片频道失败: {e}")
+            return []
+
+    def record_worker_stats(self, worker_id: str, shards: int, channels: int, new_videos: int,
+                            busy_seconds: float) -> bool:
+        """累加轮询节点的处理量"""
+        try:
+            now = datetime.now()
+            with self.conn:
+                self.conn.execute(
+                    'INSERT INTO poll_workers (worker_id, shards_processed, channels_checked, new_videos, '
+                    'busy_seconds, started_at, last_seen_at) VALUES (?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (worker_id) DO UPDATE SET '
+                    'shards_processed = shards_processed + excluded.shards_processed, '
+                    'channels_checked = channels_checked + excluded.channels_checked, '
+                    'new_videos = new_videos + excluded.new_videos, '
+                    'busy_seconds = busy_seconds + excluded.busy_seconds, '
+                    'last_seen_at = excluded.last_seen_at',
+                    (worker_id, shards, channels, new_videos, busy_seconds, now, now)
+                )
+            return True
+
+        except Exception as e:
+            self.logger.error(f"记录节点处理量失败: {e}")
+            return False
+
+    def get_worker_stats(self, active_since: datetime = None) -> List[Dict]:
+        """获取轮询节点的累计处理量（按最近活跃时间倒序）"""
+        try:
+            if active_since:
+                return self._find('SELECT * FROM poll_workers WHERE last_seen_at >= ? ORDER BY last_seen_at DESC',
+                                  (active_since,))
+            return self._find('SELECT * FROM poll_workers ORDER BY last_seen_at DESC')
+
+        except Exception as e:
+            self.logger.error(f"获取节点处理量失败: {e}")
+            return []
+
+    # ===== 性能指标 =====
+    def add_metric_series(self, series: List[Dict]) -> bool:
+        """累加性能指标（每个分桶一行，在一条UPSERT中累加，多个进程同时写入也不会丢失）"""
+        if not series:
+            return True
+
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT INTO metric_series (metric, labels, name, value) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (metric, labels, name) DO UPDATE SET value = value + excluded.value',
+                    [(item['metric'], json.dumps(item['labels'], ensure_ascii=False), name, value)
+                     for item in series for name, value in item['values'].items()]
+                )
+            return True
+
+        except Exception as e:
+            self.logger.error(f"记录性能指标失败: {e}")
+            return False
+
+    def get_metric_series(self) -> List[Dict]:
+        """获取所有进程累加的性能指标"""
+        try:
+            series = {}
+            for row in self._query('SELECT metric, labels, name, value FROM metric_series'):
+                item = series.setdefault((row['metric'], row['labels']), {
+                    'metric': row['metric'], 'labels': json.loads(row['labels']), 'values': {}
+                })
+                item['values'][row['name']] = row['value']
+            return list(series.values())
+
+        except Exception as e:
+            self.logger.error(f"获取性能指标失败: {e}")
+            return []
+
+    # ===== 后台任务 =====
+    def _job_to_dict(self, row: Optional[sqlite3.Row], keep_active: bool = False) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        if keep_active:
+            job['active'] = bool(job['active']) if job['active'] is not None else None
+        else:
+            job.pop('active')
+        return job
+
+    def create_job(self, job_doc: Dict) -> bool:
+        """创建后台任务；已有相同dedup_key的进行中任务（或写入失败）时返回False"""
+        try:
+            job = {**job_doc, 'active': True}
+            columns = [column for column in JOB_COLUMNS if column in job]
+            with self.conn:
+                self.conn.execute(
+                    f'INSERT INTO jobs ({", ".join(columns)}) VALUES ({self._placeholders(columns)})',
+                    [job[column] for column in columns]
+                )
+            return True
+
+        except sqlite3.IntegrityError:
+            return False
+        except Exception as e:
+            self.logger.error(f"创建后台任务失败: {e}")
+            return False
+
+    def get_active_job(self, dedup_key: str) -> Optional[Dict]:
+        """获取指定dedup_key的进行中任务"""
+        try:
+            row = self.conn.execute(
+                'SELECT * FROM jobs WHERE dedup_key = ? AND active = 1', (dedup_key,)
+            ).fetchone()
+            return self._job_to_dict(row, keep_active=True)
+
+        except Exception as e:
+            self.logger.error(f"获取进行中任务失败: {e}")
+            return None
+
+    def update_job(self, job_id: str, fields: Dict, finished: bool = False, expected_status: str = None) -> bool:
+        """更新任务状态和进度；finished=True时释放去重键；expected_status不为None时只在任务仍处于该状态时更新"""
+        try:
+            now = datetime.now()
+            fields = {**fields, 'updated_at': now}
+            if finished:
+                fields['finished_at'] = now
+                fields['active'] = None
+
+            unknown = set(fields) - set(JOB_COLUMNS)
+            if unknown:
+                raise ValueError(f"未知的任务字段: {', '.join(sorted(unknown))}")
+
+            condition, params = 'job_id = ?', [job_id]
+            if expected_status is not None:
+                condition += ' AND status = ?'
+                params.append(expected_status)
+
+            with self.conn:
+                cursor = self.conn.execute(
+                    f'UPDATE jobs SET {", ".join(f"{column} = ?" for column in fields)} WHERE {condition}',
+                    [*fields.values(), *params]
+                )
+                if finished:
+                    # 没有TTL索引，任务结束时顺便清理过期的已完成任务
+                    self.conn.execute(
+                        'DELETE FROM jobs WHERE finished_at < ?',
+                        (now - timedelta(seconds=Config.JOB_RETENTION_SECONDS),)
+                    )
+            return cursor.rowcount > 0
+
+        except Exception as e:
+            self.logger.error(f"更新后台任务失败: {e}")
+            return False
+
+    def heartbeat_jobs(self, worker_id: str) -> int:
+        """刷新该工作进程所有进行中任务的心跳时间"""
+        try:
+            with self.conn:
+                cursor = self.conn.execute(
+                    'UPDATE jobs SET heartbeat_at = ? WHERE worker_id = ? AND active = 1',
+                    (datetime.now(), worker_id)
+                )
+            return cursor.rowcount
+
+        except Exception as e:
+            self.logger.error(f"刷新后台任务心跳失败: {e}")
+            return 0
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """获取单个任务"""
+        try:
+            return self._job_to_dict(self.conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone())
+
+        except Exception as e:
+            self.logger.error(f"获取后台任务失败: {e}")
+            return None
+
+    def get_recent_jobs(self, limit: int = 20) -> List[Dict]:
+        """获取最近的任务"""
+        try:
+            rows = self._query('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,))
+            return [self._job_to_dict(row) for row in rows]
+
+        except Exception as e:
+            self.logger.error(f"获取后台任务列表失败: {e}")
+            return []
+
+    # ===== 配置管理 =====
+    def get_config(self, key: str) -> Optional[str]:
+        """获取配置值"""
+        try:
+            row = self.conn.execute('SELECT config_value FROM config WHERE config_key = ?', (key,)).fetchone()
+            return row['config_value'] if row else None
+
+        except Exception as e:
+            self.logger.error(f"获取配置失败: {e}")
+            return None
+
+    def set_config(self, key: str, value: str, description: str = '') -> bool:
+        """设置配置值"""
+        try:
+            now = datetime.now()
+            with self.conn:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO config (config_key, config_value, description, created_at, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, value, description, now, now)
+                )
+            return True
+
+        except Exception as e:
+            self.logger.error(f"设置配置失败: {e}")
+            return False
+
+    # ===== 清理维护 =====
+    def cleanup_old_logs(self, days: int = None) -> int:
+        """清理过期的监控日志"""
+        days = days or Config.RETENTION_DAYS
+        try:
+            with self.conn:
+                deleted_count = self.conn.execute(
+                    'DELETE FROM monitor_logs WHERE check_time < ?', (datetime.now() - timedelta(days=days),)
+                ).rowcount
+            self._notify_write('logs')
+            self.logger.info(f"清理了 {deleted_count} 条过期日志")
+            return deleted_count
+
+        except Exception as e:
+            self.logger.error(f"清理日志失败: {e}")
+            return 0
+
+    def get_database_stats(self) -> Dict:
+        """获取数据库统计信息"""
+        try:
+            row = self.conn.execute(
+                'SELECT '
+                '(SELECT COUNT(*) FROM channels WHERE is_active = 1) AS active_channels, '
+                '(SELECT COUNT(*) FROM videos) AS total_videos, '
+                '(SELECT COUNT(*) FROM videos WHERE discovered_at >= ?) AS videos_last_7_days, '
+                '(SELECT COUNT(*) FROM monitor_logs) AS total_logs',
+                (datetime.now() - timedelta(days=7),)
+            ).fetchone()
+            return dict(row)
+
+        except Exception as e:
+            self.logger.error(f"获取数据库统计失败: {e}")
+            return {}
+
+    def close_connection(self):
+        """关闭数据库连接"""
+        with self._connections_lock:
+            for holder in list(self._connections):
+                holder.conn.close()
+            self._connections = weakref.WeakSet()
+        self._local = threading.local()
+        self.logger.info("SQLite连接已关闭")
+
+    def test_connection(self) -> bool:
+        """测试数据库连接"""
+        try:
+            self.conn.execute('SELECT 1').fetchone()
+            return True
+        except Exception as e:
+            self.logger.error(f"数据库连接测试失败: {e}")
+            return False
+
+    # ===== 频道统计计数 =====
+    def _inc_channel_stats(self, video_rows: List[Dict]):
+        """在当前事务中为新视频增加频道计数（总数、最新发布时间、按发现日期分桶）"""
+        if not video_rows:
+            return
+
+        per_channel = {}
+        for row in video_rows:
+            stats = per_channel.setdefault(row['channel_id'], {'count': 0, 'latest': None, 'daily': {}})
+            stats['count'] += 1
+            if row.get('published_at') and (stats['latest'] is None or row['published_at'] > stats['latest']):
+                stats['latest'] = row['published_at']
+            day = self._stats_day(row['discovered_at'])
+            stats['daily'][day] = stats['daily'].get(day, 0) + 1
+
+        now = datetime.now()
+        self.conn.executemany(
+            'INSERT INTO channel_stats (channel_id, total_videos, latest_video_date, updated_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (channel_id) DO UPDATE SET total_videos = total_videos + excluded.total_videos, '
+            'latest_video_date = MAX(COALESCE(latest_video_date, excluded.latest_video_date), '
+            'COALESCE(excluded.latest_video_date, latest_video_date)), updated_at = excluded.updated_at',
+            [(channel_id, stats['count'], stats['latest'], now) for channel_id, stats in per_channel.items()]
+        )
+        self.conn.executemany(
+            'INSERT INTO channel_stats_daily (channel_id, day, count) VALUES (?, ?, ?) '
+            'ON CONFLICT (channel_id, day) DO UPDATE SET count = count + excluded.count',
+            [(channel_id, day, count)
+             for channel_id, stats in per_channel.items() for day, count in stats['daily'].items()]
+        )
+        # 同一事务中删除超出保留天数的分桶
+        self.conn.execute('DELETE FROM channel_stats_daily WHERE day < ?',
+                          (self._stats_day(now - timedelta(days=Config.STATS_BUCKET_DAYS)),))
+
+    def _dec_channel_stats(self, video_row: Dict):
+        """在当前事务中为删除的视频减少频道计数"""
+        channel_id = video_row['channel_id']
+        self.conn.execute(
+            'UPDATE channel_stats SET total_videos = total_videos - 1, updated_at = ? WHERE channel_id = ?',
+            (datetime.now(), channel_id)
+        )
+        if video_row.get('discovered_at'):
+            self.conn.execute(
+                'UPDATE channel_stats_daily SET count = count - 1 WHERE channel_id = ? AND day = ?',
+                (channel_id, self._stats_day(video_row['discovered_at']))
+            )
+
+        # 删除的是最新视频时重新查询最新发布时间
+        self.conn.execute(
+            'UPDATE channel_stats SET latest_video_date = '
+            '(SELECT MAX(published_at) FROM videos WHERE channel_id = ?) '
+            'WHERE channel_id = ? AND latest_video_date = ?',
+            (channel_id, channel_id, video_row.get('published_at'))
+        )
+
+    def rebuild_channel_stats(self) -> int:
+        """根据videos表重建所有频道的统计计数（用于修复不一致），返回频道数"""
+        try:
+            now = datetime.now()
+            with self.conn:
+                self.conn.execute('DELETE FROM channel_stats')
+                self.conn.execute('DELETE FROM channel_stats_daily')
+                count = self.conn.execute(
+                    'INSERT INTO channel_stats (channel_id, total_videos, latest_video_date, updated_at) '
+                    'SELECT channel_id, COUNT(*), MAX(published_at), ? FROM videos GROUP BY channel_id',
+                    (now,)
+                ).rowcount
+                # 只保留最近 STATS_BUCKET_DAYS 天的分桶
+                self.conn.execute(
+                    'INSERT INTO channel_stats_daily (channel_id, day, count) '
+                    'SELECT channel_id, substr(discovered_at, 1, 10), COUNT(*) FROM videos '
+                    'WHERE discovered_at >= ? GROUP BY channel_id, substr(discovered_at, 1, 10)',
+                    (now - timedelta(days=Config.STATS_BUCKET_DAYS),)
+                )
+            self._notify_write('videos')
+
+            self.logger.info(f"重建频道统计完成: {count} 个频道")
+            return count
+
+        except Exception as e:
+            self.logger.error(f"重建频道统计失败: {e}")
+            return 0
+
+    def get_channel_video_stats(self) -> List[Dict]:
+        """获取每个频道的视频统计（读取增量维护的计数，不扫描videos表）"""
+        try:
+            # 最近7天（含今天）的分桶
+            first_day = self._stats_day(datetime.now() - timedelta(days=6))
+            rows = self._query(
+                'SELECT c.channel_id, c.channel_name, c.is_active, '
+                'COALESCE(s.total_videos, 0) AS total_videos, '
+                's.latest_video_date AS "latest_video_date [DATETIME]", '
+                '(SELECT COALESCE(SUM(d.count), 0) FROM channel_stats_daily d '
+                ' WHERE d.channel_id = c.channel_id AND d.day >= ?) AS videos_last_7_days '
+                'FROM channels c LEFT JOIN channel_stats s ON s.channel_id = c.channel_id '
+                'WHERE c.is_active = 1',
+                (first_day,)
+            )
+            return [self._row_to_dict(row) for row in rows]
+
+        except Exception as e:
+            self.logger.error(f"获取频道视频统计失败: {e}")
+            return []
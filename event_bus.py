@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时事件分发
+检查更新时各进程把事件写入MongoDB的events固定集合；
+每个Web进程只用一个后台线程tail该集合，再分发给本进程所有SSE连接；
+分发前按事件类型让本进程的响应缓存失效（其他进程写入的数据不会触发本进程的写入监听）
+"""
+
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Set
+
+from config import Config
+
+# 各类事件对应数据变化的缓存标签（{channel_id} 按事件数据填充）
+EVENT_CACHE_TAGS = {
+    'video': ('videos', 'channel:{channel_id}'),
+    'channel_checked': ('channels', 'logs'),
+    'check_completed': ('channels', 'videos', 'logs'),
+}
+
+
+class EventBus:
+    def __init__(self, db, invalidate: Callable[[Iterable[str]], None] = None):
+        self.db = db  # 存储后端（StorageBackend）
+        self.invalidate = invalidate  # 响应缓存按标签失效（ResponseCache.invalidate）
+        self.logger = logging.getLogger(__name__)
+        self._subscribers: Set[queue.Queue] = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self) -> queue.Queue:
+        """订阅事件，返回接收事件的队列；收到None表示连接积压过多被断开"""
+        subscriber = queue.Queue(maxsize=Config.SSE_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._tail, name='event-tail', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        """取消订阅，没有订阅者时后台线程自动退出"""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        """当前进程的订阅连接数"""
+        with self._lock:
+            return len(self._subscribers)
+
+    def _invalidate_cache(self, event: Dict):
+        """事件表示的数据变化可能来自其他进程（定时检查、其他worker），先让本进程缓存的相关响应失效"""
+        tags = EVENT_CACHE_TAGS.get(event['type'])
+        if not tags or self.invalidate is None:
+            return
+        try:
+            self.invalidate([tag.format(**event['data']) for tag in tags])
+        except Exception as e:
+            self.logger.error(f"事件触发缓存失效失败: {e}")
+
+    def _dispatch(self, event: Dict):
+        """把事件放入每个订阅者的队列，队列已满的订阅者被断开"""
+        self._invalidate_cache(event)
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                self.logger.warning("事件流连接积压过多，断开该连接")
+                self.unsubscribe(subscriber)
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait(None)
+
+    def _tail(self):
+        """后台线程：tail events集合，只分发订阅开始之后的事件"""
+        now = datetime.now()
+        since = now.replace(microsecond=now.microsecond // 1000 * 1000)  # MongoDB时间精度为毫秒
+        seen_ids = set()  # created_at 等于 since 的已分发事件，游标重建时跳过
+
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+
+            try:
+                cursor = self.db.tail_events(since)
+                while cursor.alive:
+                    for doc in cursor:
+                        if doc['_id'] in seen_ids:
+                            continue
+                        if doc['created_at'] > since:
+                            since, seen_ids = doc['created_at'], set()
+                        seen_ids.add(doc['_id'])
+
+                        self._dispatch({
+                            'id': str(doc['_id']),
+                            'type': doc['type'],
+                            'data': doc['data']
+                        })
+
+                    # 等待新事件超时返回，顺便检查是否还有订阅者
+                    with self._lock:
+                        if not self._subscribers:
+                            break
+                cursor.close()
+
+            except Exception as e:
+                self.logger.error(f"读取实时事件失败: {e}")
+
+            # 集合为空或游标失效时稍后重建
+            time.sleep(1)
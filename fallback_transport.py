@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+备用HTTP连接
+主连接请求失败时使用：独立的连接池、不同的TLS设置（不验证证书、放宽密码套件、最高TLS1.2），
+每个主机一个熔断器，连续失败后在一段时间内直接跳过，不再每次都重试
+"""
+
+import ssl
+import time
+import logging
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from metrics import timed, FALLBACK_REQUESTS, FALLBACK_BREAKER_TRIPS
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold  # 连续失败多少次后熔断
+        self.reset_seconds = reset_seconds  # 熔断后多久放行一次试探请求
+        self.failures = 0
+        self.opened_at = None  # 熔断开始时间，None表示正常放行
+        self.probing = False  # 是否已有试探请求在进行中
+
+    def allow(self) -> bool:
+        """是否放行请求；熔断超时后只放行一个试探请求"""
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.reset_seconds:
+            return False
+        self.probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self) -> bool:
+        """记录一次失败，返回这次是否触发了熔断"""
+        self.failures += 1
+        if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            self.probing = False
+            return True
+        return False
+
+
+class _AlternateTLSAdapter(HTTPAdapter):
+    """与主连接不同的TLS设置，绕开对TLS1.3或新密码套件处理有问题的代理和中间设备"""
+
+    def __init__(self, verify_ssl: bool, **kwargs):
+        self.ssl_context = ssl.create_default_context()
+        if not verify_ssl:
+            self.ssl_context.check_hostname = False
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+        self.ssl_context.set_ciphers('DEFAULT:@SECLEVEL=1')
+        self.ssl_context.maximum_version = ssl.TLSVersion.TLSv1_2
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self.ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+
+class FallbackTransport:
+    def __init__(self, pool_size: int = None, failure_threshold: int = None, reset_seconds: float = None):
+        self.pool_size = pool_size or Config.FALLBACK_POOL_SIZE
+        self.failure_threshold = failure_threshold or Config.FALLBACK_BREAKER_FAILURES
+        self.reset_seconds = reset_seconds or Config.FALLBACK_BREAKER_RESET
+        self.verify_ssl = Config.FALLBACK_VERIFY_SSL
+        self.logger = logging.getLogger(__name__)
+        self.session = self._create_session()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _create_session(self) -> requests.Session:
+        """独立的连接池，不做自动重试（失败交给熔断器处理）"""
+        session = requests.Session()
+        adapter = _AlternateTLSAdapter(
+            self.verify_ssl,
+            max_retries=0,
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.verify = self.verify_ssl
+        session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+            'Accept': 'application/atom+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Encoding': 'gzip, deflate',
+        })
+        return session
+
+    def _breaker(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+        return breaker
+
+    def allow(self, url: str) -> bool:
+        """主机是否处于熔断中（熔断时不发请求，直接计为short_circuited）"""
+        with self._lock:
+            allowed = self._breaker(urlparse(url).netloc).allow()
+        if not allowed:
+            FALLBACK_REQUESTS.inc(result='short_circuited')
+        return allowed
+
+    def get(self, url: str, timeout: float = 10, headers: Dict = None) -> Optional[requests.Response]:
+        """发送请求（应先调用 allow）；网络错误和5xx计为失败，返回None或响应"""
+        host = urlparse(url).netloc
+        try:
+            with timed('fetch_fallback'):
+                response = self.session.get(url, timeout=timeout, headers=headers)
+        except Exception as e:
+            self.logger.error(f"备用连接请求失败: {e}")
+            self._record(host, success=False)
+            FALLBACK_REQUESTS.inc(result='error')
+            return None
+
+        success = response.status_code < 500
+        self._record(host, success)
+        FALLBACK_REQUESTS.inc(result='ok' if success else 'http_error')
+        return response
+
+    def _record(self, host: str, success: bool):
+        with self._lock:
+            breaker = self._breaker(host)
+            if success:
+                breaker.record_success()
+                return
+            tripped = breaker.record_failure()
+
+        if tripped:
+            FALLBACK_BREAKER_TRIPS.inc(host=host)
+            self.logger.warning(f"{host} 备用连接连续失败，熔断 {self.reset_seconds:.0f} 秒")
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YouTube RSS(Atom) feed 流式解析器
+使用 iterparse 增量解析，只提取入库需要的字段
+"""
+
+import io
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import List, Dict, Optional
+
+# 预先拼好带命名空间的标签名，避免每次解析都构建 ns 字典和 .// 路径查找
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+YT_NS = '{http://www.youtube.com/xml/schemas/2015}'
+MEDIA_NS = '{http://search.yahoo.com/mrss/}'
+
+ENTRY_TAG = ATOM_NS + 'entry'
+TITLE_TAG = ATOM_NS + 'title'
+LINK_TAG = ATOM_NS + 'link'
+PUBLISHED_TAG = ATOM_NS + 'published'
+UPDATED_TAG = ATOM_NS + 'updated'
+VIDEO_ID_TAG = YT_NS + 'videoId'
+MEDIA_GROUP_TAG = MEDIA_NS + 'group'
+MEDIA_DESCRIPTION_TAG = MEDIA_NS + 'description'
+MEDIA_THUMBNAIL_TAG = MEDIA_NS + 'thumbnail'
+
+
+def parse_datetime(datetime_str: str) -> datetime:
+    """解析RSS中的时间格式"""
+    try:
+        # RSS时间格式: 2024-01-15T10:00:00+00:00
+        if 'T' in datetime_str:
+            datetime_str = datetime_str.split('+')[0].split('Z')[0]
+            return datetime.fromisoformat(datetime_str)
+        else:
+            return datetime.now()
+    except:
+        return datetime.now()
+
+
+def parse_feed_title(xml_content: bytes) -> Optional[str]:
+    """获取feed的频道标题（读到第一个title即停止）"""
+    for event, elem in ET.iterparse(io.BytesIO(xml_content), events=('end',)):
+        if elem.tag == TITLE_TAG:
+            return elem.text
+    return None
+
+
+def parse_feed(xml_content: bytes, channel_id: str, max_results: int = 50) -> List[Dict]:
+    """流式解析feed中的视频条目，解析到 max_results 个后停止"""
+    videos = []
+    if max_results <= 0:
+        return videos
+
+    # 只监听 end 事件：entry 结束时其子元素已完整，直接遍历子元素取字段
+    for event, elem in ET.iterparse(io.BytesIO(xml_content), events=('end',)):
+        if elem.tag != ENTRY_TAG:
+            continue
+
+        videos.append(_build_video(_extract_fields(elem), channel_id))
+        # 释放已处理条目占用的内存
+        elem.clear()
+        if len(videos) >= max_results:
+            break
+
+    return videos
+
+
+def _extract_fields(entry: ET.Element) -> Dict:
+    """从entry的直接子元素中提取需要的字段"""
+    fields = {}
+    for child in entry:
+        tag = child.tag
+        if tag == VIDEO_ID_TAG:
+            fields.setdefault('video_id', child.text)
+        elif tag == TITLE_TAG:
+            fields.setdefault('title', child.text)
+        elif tag == LINK_TAG:
+            if child.get('rel') == 'alternate':
+                fields.setdefault('video_url', child.get('href'))
+        elif tag == PUBLISHED_TAG:
+            fields.setdefault('published', child.text)
+        elif tag == UPDATED_TAG:
+            fields.setdefault('updated', child.text)
+        elif tag == MEDIA_GROUP_TAG and 'media_group' not in fields:
+            # 只取第一个 media:group 中的描述和缩略图
+            fields['media_group'] = True
+            for media_child in child:
+                if media_child.tag == MEDIA_DESCRIPTION_TAG:
+                    fields.setdefault('description', media_child.text)
+                elif media_child.tag == MEDIA_THUMBNAIL_TAG:
+                    fields.setdefault('thumbnail_url', media_child.get('url'))
+    return fields
+
+
+def _build_video(fields: Dict, channel_id: str) -> Dict:
+    """由解析出的字段构建视频数据（字段与原ElementTree解析结果一致）"""
+    return {
+        'video_id': fields['video_id'] if 'video_id' in fields else '',
+        'channel_id': channel_id,
+        'title': fields['title'] if 'title' in fields else 'Unknown',
+        'description': fields.get('description') or '',
+        'video_url': fields['video_url'] if 'video_url' in fields else '',
+        'published_at': parse_datetime(fields['published']) if 'published' in fields else datetime.now(),
+        'updated_at': parse_datetime(fields['updated']) if 'updated' in fields else datetime.now(),
+        'thumbnail_url': fields.get('thumbnail_url'),
+        'duration': None,  # RSS中没有时长信息
+        'view_count': None,  # RSS中没有观看次数
+        'like_count': None,  # RSS中没有点赞数
+        'comment_count': None  # RSS中没有评论数
+    }
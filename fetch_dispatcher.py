@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP请求调度器
+按主机做令牌桶限流，统一处理Retry-After，并提供抖动的轮询时间分布
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from config import Config
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # 每秒补充的令牌数
+        self.capacity = capacity  # 桶容量（允许的突发请求数）
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """尝试获取一个令牌：成功返回0，令牌不足时返回需要等待的秒数（不阻塞）"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞等待"""
+        while True:
+            wait = self.reserve()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class FetchDispatcher:
+    def __init__(self, rate: float = None, burst: float = None):
+        self.rate = rate or Config.RATE_LIMIT_PER_SECOND
+        self.burst = burst or Config.RATE_LIMIT_BURST
+        self.logger = logging.getLogger(__name__)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._paused_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        """获取主机对应的令牌桶（所有线程共享）"""
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def acquire(self, url: str):
+        """请求前调用：等待主机的Retry-After暂停结束，再获取限流令牌"""
+        host = urlparse(url).netloc
+        while True:
+            pause = self.paused_for(url)
+            if pause > 0:
+                time.sleep(pause)
+                continue
+
+            self._bucket(host).acquire()
+            # 等待令牌期间其他线程可能收到了Retry-After，需要再确认一次
+            if self.paused_for(url) <= 0:
+                return
+
+    async def acquire_async(self, url: str):
+        """acquire 的协程版本（异步客户端使用），与同步请求共用令牌桶和暂停状态"""
+        host = urlparse(url).netloc
+        while True:
+            pause = self.paused_for(url)
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+
+            wait = self._bucket(host).reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            if self.paused_for(url) <= 0:
+                return
+
+    def observe(self, url: str, response) -> bool:
+        """请求后调用：遇到429/503时暂停该主机的所有请求，返回是否被限流"""
+        if response.status_code not in (429, 503):
+            return False
+
+        retry_after = self._parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is None:
+            if response.status_code == 503:
+                # 没有Retry-After的503按普通服务器错误处理
+                return False
+            retry_after = Config.RATE_LIMIT_DEFAULT_BACKOFF
+        retry_after = min(retry_after, Config.RATE_LIMIT_MAX_BACKOFF)
+
+        host = urlparse(url).netloc
+        with self._lock:
+            self._paused_until[host] = max(self._paused_until.get(host, 0), time.monotonic() + retry_after)
+
+        self.logger.warning(f"{host} 返回 {response.status_code}，暂停该主机请求 {retry_after:.0f} 秒")
+        return True
+
+    def paused_for(self, url: str) -> float:
+        """主机剩余的暂停秒数"""
+        host = urlparse(url).netloc
+        with self._lock:
+            return max(0.0, self._paused_until.get(host, 0) - time.monotonic())
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """解析Retry-After（秒数或HTTP日期）"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def spread_offsets(count: int, window: float) -> List[float]:
+        """把 count 次请求均匀分到 window 秒内，每个时间槽内随机抖动，返回递增的偏移秒数"""
+        if count <= 0 or window <= 0:
+            return [0.0] * max(count, 0)
+
+        slot = window / count
+        return [i * slot + random.uniform(0, slot) for i in range(count)]
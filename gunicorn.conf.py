@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Web服务生产模式配置（Linux）
+用法: gunicorn -c gunicorn.conf.py web_ui:app  或  ./start_production.sh
+"""
+
+import os
+import sys
+
+# 从其他目录启动时也能找到项目模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+
+bind = f"{Config.WEB_HOST}:{Config.WEB_PORT}"
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+worker_class = 'gthread'
+
+# 创建app时不连接数据库，预加载后再fork是安全的；
+# 每个worker第一次处理请求时才创建自己的MongoDB连接
+preload_app = True
+
+# 手动检查更新在后台任务中执行，请求本身不会长时间占用worker
+timeout = 60
+graceful_timeout = 30
+
+accesslog = '-'
+errorlog = '-'
+loglevel = Config.LOG_LEVEL.lower()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台任务队列
+网页上的手动检查更新在后台线程池中执行，接口立即返回任务ID；
+任务状态和进度保存在MongoDB的jobs集合中，多个Web进程都能查询，并按频道去重；
+进度同时作为 job 事件推送到 /api/events；
+每个进程的任务队列定期刷新自己任务的心跳，排队中的任务只有在所属进程停止心跳后才会被其他进程当作中断
+"""
+
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from config import Config
+
+
+class JobQueue:
+    def __init__(self, monitor, workers: int = None):
+        self.monitor = monitor  # YouTubeMonitorRSS
+        self.db = monitor.db
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=workers or Config.JOB_WORKERS,
+                                            thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True).start()
+
+    def _heartbeat(self):
+        """后台线程：定期刷新本进程排队中和执行中任务的心跳"""
+        while True:
+            time.sleep(Config.JOB_HEARTBEAT_SECONDS)
+            self.db.heartbeat_jobs(self.worker_id)
+
+    @staticmethod
+    def dedup_key(channel_id: Optional[str]) -> str:
+        """同一频道（或全部频道）同时只允许一个检查任务"""
+        return f"check_updates:{channel_id or '*'}"
+
+    def submit_check(self, channel_id: str = None) -> Tuple[Optional[Dict], bool]:
+        """提交检查更新任务，返回 (任务, 是否新建)；已有相同的进行中任务时直接返回该任务"""
+        key = self.dedup_key(channel_id)
+
+        with self._lock:
+            for _ in range(2):
+                job = {
+                    'job_id': uuid.uuid4().hex,
+                    'type': 'check_updates',
+                    'dedup_key': key,
+                    'channel_id': channel_id,
+                    'status': 'queued',
+                    'total_channels': None,
+                    'channels_done': 0,
+                    'new_videos': 0,
+                    'error': None,
+                    'worker_id': self.worker_id,
+                    'heartbeat_at': datetime.now(),
+                    'created_at': datetime.now(),
+                    'updated_at': datetime.now()
+                }
+                if self.db.create_job(job):
+                    self._executor.submit(self._run_check, job['job_id'], channel_id)
+                    job.pop('dedup_key')
+                    return job, True
+
+                existing = self.db.get_active_job(key)
+                if existing is None:
+                    # 写入失败，或者进行中的任务刚好结束
+                    continue
+
+                if self._is_abandoned(existing):
+                    # 执行任务的进程已退出（重启或崩溃），释放去重键后重新提交
+                    self.logger.warning(f"后台任务已没有进程在执行，标记为中断: {existing['job_id']}")
+                    self.db.update_job(existing['job_id'], {'status': 'failed', 'error': '任务已中断'},
+                                       finished=True, expected_status=existing['status'])
+                    continue
+
+                for field in ('active', 'dedup_key', 'worker_id', 'heartbeat_at'):
+                    existing.pop(field, None)
+                return existing, False
+
+        return None, False
+
+    @staticmethod
+    def _is_abandoned(job: Dict) -> bool:
+        """执行中的任务长时间没有进度，或排队中的任务所属进程停止了心跳（排队再久也不算中断）"""
+        now = datetime.now()
+        if job['status'] == 'queued':
+            heartbeat_at = job.get('heartbeat_at') or job['updated_at']
+            return heartbeat_at < now - timedelta(seconds=Config.JOB_HEARTBEAT_SECONDS * 3)
+        return job['updated_at'] < now - timedelta(seconds=Config.JOB_STALE_SECONDS)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """查询任务状态和进度"""
+        return self.db.get_job(job_id)
+
+    def _run_check(self, job_id: str, channel_id: Optional[str]):
+        """在工作线程中执行检查，并把进度写回任务；任务已不在排队状态（如被标记为中断）时不再执行"""
+        if not self.db.update_job(job_id, {'status': 'running', 'started_at': datetime.now()},
+                                  expected_status='queued'):
+            self.logger.warning(f"后台任务已不在排队状态，跳过: {job_id}")
+            return
+
+        def report(done: int, total: int, new_videos: int):
+            progress = {'channels_done': done, 'total_channels': total, 'new_videos': new_videos}
+            self.db.update_job(job_id, progress)
+            self.db.add_events([{'type': 'job', 'data': {'job_id': job_id, 'status': 'running', **progress}}])
+
+        try:
+            result = self.monitor.check_channel_updates(channel_id, progress=report)
+            if result.get('error'):
+                raise RuntimeError(result['error'])
+            
+            final = {
+                'status': 'done',
+                'total_channels': result['total_channels'],
+                'channels_done': result['total_channels'],
+                'new_videos': result['total_new_videos'],
+                'elapsed_seconds': result.get('elapsed_seconds')
+            }
+            if not self.db.update_job(job_id, final, finished=True, expected_status='running'):
+                self.logger.warning(f"后台任务在完成前已被标记为中断: {job_id}")
+                return
+            self.db.add_events([{'type': 'job', 'data': {'job_id': job_id, **final}}])
+            self.logger.info(f"后台任务完成: {job_id}, 新视频 {result['total_new_videos']} 个")
+
+        except Exception as e:
+            self.logger.error(f"后台任务执行失败: {e}")
+            self.db.update_job(job_id, {'status': 'failed', 'error': str(e)}, finished=True, expected_status='running')
+            self.db.add_events([{'type': 'job', 'data': {'job_id': job_id, 'status': 'failed', 'error': str(e)}}])
@@ -7,12 +7,22 @@ YouTube视频监控系统 - RSS版本
 
 import argparse
 import sys
+import json
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Set
 
-from database_mongodb import MongoDBManager
+from config import Config
+from storage import create_storage
+from resolve_cache import ChannelResolveCache
+from poll_scheduler import compute_poll_interval, next_check_time
+from metrics import (timed, collect_timings, summarize_cycle, REGISTRY, CHANNEL_SECONDS, CYCLE_SECONDS,
+                     CHANNEL_CHECKS)
+from fetch_dispatcher import FetchDispatcher
 from youtube_rss import YouTubeRSSMonitor
+from thumbnail_cache import ThumbnailCache
 
 # 配置日志
 logging.basicConfig(
@@ -26,10 +36,43 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+def normalize_channel_url(value: str) -> Optional[str]:
+    """把频道URL、@handle或UC开头的频道ID统一为完整的频道URL"""
+    value = (value or '').strip()
+    if not value:
+        return None
+    
+    if value.startswith('http://') or value.startswith('https://'):
+        return value
+    if value.startswith('@'):
+        return f"https://www.youtube.com/{value}"
+    if value.startswith('UC') and len(value) == 24:
+        return f"https://www.youtube.com/channel/{value}"
+    if value.startswith('www.youtube.com') or value.startswith('youtube.com'):
+        return f"https://{value}"
+    return value
+
+def parse_channel_list(text: str) -> List[str]:
+    """解析频道列表：JSON数组，或每行一个URL/ID（#开头为注释）"""
+    text = text.strip()
+    if text.startswith('['):
+        return [str(item) for item in json.loads(text)]
+    
+    return [line.strip() for line in text.splitlines()
+            if line.strip() and not line.strip().startswith('#')]
+
 class YouTubeMonitorRSS:
     def __init__(self):
-        self.db = MongoDBManager()
-        self.rss_monitor = YouTubeRSSMonitor()
+        self.db = create_storage()
+        self.rss_monitor = YouTubeRSSMonitor(resolve_cache=ChannelResolveCache(self.db))
+        self.thumbnail_cache = ThumbnailCache()
+        # 上次保存失败的视频ID（按频道）：下次检查时不受最新发布时间的过滤，避免部分保存后永久丢失
+        self._unsaved_videos: Dict[str, Set[str]] = {}
+    
+    def _prefetch_thumbnails(self, videos: List[Dict]):
+        """开启THUMBNAIL_PREFETCH时在后台预先下载并转换新视频的缩略图"""
+        if Config.THUMBNAIL_PREFETCH and videos:
+            self.thumbnail_cache.prefetch(videos)
     
     def add_channel(self, channel_url: str) -> bool:
         """添加要监控的频道"""
@@ -60,11 +103,12 @@ class YouTubeMonitorRSS:
                 print("📥 正在获取最新视频...")
                 videos = self.rss_monitor.get_latest_videos(channel_info['channel_id'], max_results=10)
                 
-                new_count = 0
-                for video in videos:
-                    if not self.db.video_exists(video['video_id']):
-                        if self.db.add_video(video):
-                            new_count += 1
+                # 一次查询已存在的视频，一次批量写入新视频
+                existing_ids = self.db.get_existing_video_ids([video['video_id'] for video in videos])
+                new_videos = [video for video in videos if video['video_id'] not in existing_ids]
+                saved_ids = set(self.db.add_videos(new_videos))
+                new_count = len(saved_ids)
+                self._prefetch_thumbnails([video for video in new_videos if video['video_id'] in saved_ids])
                 
                 print(f"📊 添加了 {new_count} 个新视频")
                 
@@ -86,88 +130,474 @@ class YouTubeMonitorRSS:
             print(f"❌ 添加频道时出错: {e}")
             return False
     
-    def check_channel_updates(self, channel_id: str = None) -> Dict:
-        """检查频道更新"""
+    def _fetch_channel_for_import(self, channel_url: str) -> Dict:
+        """解析频道并获取初始视频（在工作线程中执行）"""
         try:
-            # 获取要检查的频道
-            if channel_id:
-                channels = [ch for ch in self.db.get_active_channels() if ch['channel_id'] == channel_id]
-                if not channels:
-                    print(f"❌ 未找到频道: {channel_id}")
-                    return {'total_channels': 0, 'total_new_videos': 0}
-            else:
-                channels = self.db.get_active_channels()
+            channel_info = self.rss_monitor.get_channel_info(channel_url)
+            if not channel_info:
+                return {'channel_info': None, 'videos': [], 'error': '无法获取频道信息'}
             
-            if not channels:
-                print("❌ 没有可监控的频道")
-                return {'total_channels': 0, 'total_new_videos': 0}
+            videos = self.rss_monitor.get_latest_videos(channel_info['channel_id'], max_results=10)
+            return {'channel_info': channel_info, 'videos': videos, 'error': None}
             
-            print(f"🔍 开始检查 {len(channels)} 个频道的更新...")
+        except Exception as e:
+            logger.error(f"导入频道 {channel_url} 失败: {e}")
+            return {'channel_info': None, 'videos': [], 'error': str(e)}
+    
+    def import_channels(self, urls: List[str]) -> Dict:
+        """批量导入频道：去重、并发解析和获取，批量写入频道、视频和日志"""
+        results = []
+        pending = []
+        seen_keys = set()
+        
+        # 规范化并去重，保持原有顺序
+        for raw_url in urls:
+            channel_url = normalize_channel_url(raw_url)
+            if not channel_url:
+                continue
             
-            total_new_videos = 0
+            key = ChannelResolveCache.make_key(channel_url) or channel_url
+            result = {'url': raw_url, 'status': 'pending', 'channel_id': None,
+                      'channel_name': None, 'new_videos': 0, 'error': None}
+            results.append(result)
             
-            for i, channel in enumerate(channels, 1):
-                try:
-                    print(f"\n[{i}/{len(channels)}] 检查频道: {channel['channel_name']}")
-                    
-                    # 获取最新视频发布时间
-                    latest_date = self.db.get_latest_video_date(channel['channel_id'])
-                    
-                    # 获取RSS中的最新视频
-                    videos = self.rss_monitor.get_latest_videos(channel['channel_id'], max_results=20)
-                    
-                    new_videos = []
-                    for video in videos:
-                        # 检查是否是新视频
-                        if not self.db.video_exists(video['video_id']):
-                            if latest_date is None or video['published_at'] > latest_date:
-                                new_videos.append(video)
-                    
-                    # 保存新视频
-                    saved_count = 0
-                    for video in new_videos:
-                        if self.db.add_video(video):
-                            saved_count += 1
-                            print(f"  📥 新视频: {video['title']}")
-                    
-                    total_new_videos += saved_count
+            if key in seen_keys:
+                result['status'] = 'duplicate'
+                continue
+            seen_keys.add(key)
+            pending.append((channel_url, result))
+        
+        if pending:
+            workers = max(1, min(Config.POLL_WORKERS, len(pending)))
+            print(f"📡 正在导入 {len(pending)} 个频道 (并发数: {workers})...")
+            
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                fetched = list(executor.map(self._fetch_channel_for_import, [url for url, _ in pending]))
+            
+            # 不同URL可能解析到同一个频道
+            channels = []
+            videos_by_channel = {}
+            for (channel_url, result), item in zip(pending, fetched):
+                channel_info = item['channel_info']
+                if not channel_info:
+                    result['status'] = 'failed'
+                    result['error'] = item['error']
+                    continue
+                
+                result['channel_id'] = channel_info['channel_id']
+                result['channel_name'] = channel_info['channel_name']
+                if channel_info['channel_id'] in videos_by_channel:
+                    result['status'] = 'duplicate'
+                    continue
+                
+                channels.append(channel_info)
+                videos_by_channel[channel_info['channel_id']] = item['videos']
+            
+            # 一次批量写入所有频道
+            saved_channel_ids = set(self.db.add_channels(channels))
+            
+            # 一次查询已存在的视频，一次批量写入所有新视频
+            all_videos = [video for channel_id in saved_channel_ids for video in videos_by_channel[channel_id]]
+            existing_ids = self.db.get_existing_video_ids([video['video_id'] for video in all_videos])
+            new_videos = [video for video in all_videos if video['video_id'] not in existing_ids]
+            saved_video_ids = set(self.db.add_videos(new_videos))
+            self._prefetch_thumbnails([video for video in new_videos if video['video_id'] in saved_video_ids])
+            
+            new_counts = {}
+            for video in new_videos:
+                if video['video_id'] in saved_video_ids:
+                    new_counts[video['channel_id']] = new_counts.get(video['channel_id'], 0) + 1
+            
+            for _, result in pending:
+                if result['status'] != 'pending':
+                    continue
+                if result['channel_id'] in saved_channel_ids:
+                    result['status'] = 'added'
+                    result['new_videos'] = new_counts.get(result['channel_id'], 0)
+                else:
+                    result['status'] = 'failed'
+                    result['error'] = '频道保存失败'
+            
+            # 批量记录监控日志
+            self.db.add_monitor_logs([
+                {
+                    'channel_id': result['channel_id'],
+                    'new_videos_count': result['new_videos'],
+                    'status': 'success',
+                    'message': '频道添加完成'
+                }
+                for _, result in pending if result['status'] == 'added'
+            ])
+        
+        summary = {
+            'total': len(results),
+            'added': sum(1 for r in results if r['status'] == 'added'),
+            'duplicates': sum(1 for r in results if r['status'] == 'duplicate'),
+            'failed': sum(1 for r in results if r['status'] == 'failed'),
+            'new_videos': sum(r['new_videos'] for r in results),
+            'results': results
+        }
+        
+        logger.info(f"批量导入完成: 共 {summary['total']} 个, 成功 {summary['added']} 个, "
+                    f"重复 {summary['duplicates']} 个, 失败 {summary['failed']} 个")
+        return summary
+    
+    def _check_single_channel(self, channel: Dict, feed_state: Dict = None) -> Dict:
+        """检查单个频道的更新（在工作线程中执行）"""
+        # 输出先缓存，由调用方按频道顺序打印，保证并发时输出与串行一致
+        lines = []
+        try:
+            # 条件请求获取RSS，feed未变化时跳过解析和数据库操作
+            feed = self.rss_monitor.fetch_feed(channel['channel_id'], feed_state)
+            
+            if feed['status'] in ('not_modified', 'unchanged'):
+                old_state = feed_state or {}
+                with timed('db_write'):
+                    if (old_state.get('etag'), old_state.get('last_modified')) != (feed['etag'], feed['last_modified']):
+                        self.db.save_feed_state(channel['channel_id'], feed['etag'],
+                                                feed['last_modified'], feed['content_hash'])
                     
-                    # 记录监控日志
                     self.db.add_monitor_log(
                         channel_id=channel['channel_id'],
-                        new_videos_count=saved_count,
+                        new_videos_count=0,
                         status='success',
-                        message=f'找到 {saved_count} 个新视频'
+                        message='找到 0 个新视频 (feed未变化)'
                     )
-                    
-                    if saved_count == 0:
-                        print(f"  ✅ 没有新视频")
+                lines.append(f"  ✅ 没有新视频 (feed未变化)")
+                
+                return {
+                    'channel_id': channel['channel_id'],
+                    'status': 'success',
+                    'fetch_status': feed['status'],
+                    'new_videos': 0,
+                    'videos': [],
+                    'lines': lines
+                }
+            
+            # 获取最新视频发布时间
+            with timed('db_read'):
+                latest_date = self.db.get_latest_video_date(channel['channel_id'])
+            
+            # 解析RSS中的最新视频
+            videos = []
+            if feed['content']:
+                videos = self.rss_monitor.parse_videos(feed['content'], channel['channel_id'], max_results=20)
+            
+            # 一次$in查询整个feed中已存在的视频
+            with timed('db_read'):
+                existing_ids = self.db.get_existing_video_ids([video['video_id'] for video in videos])
+            
+            unsaved_before = self._unsaved_videos.get(channel['channel_id'], set())
+            new_videos = []
+            for video in videos:
+                # 检查是否是新视频（上次没保存成功的视频发布时间可能早于已保存的最新视频）
+                if video['video_id'] not in existing_ids:
+                    if latest_date is None or video['published_at'] > latest_date \
+                            or video['video_id'] in unsaved_before:
+                        new_videos.append(video)
+            
+            # 批量保存新视频
+            with timed('db_write'):
+                saved_ids = set(self.db.add_videos(new_videos))
+            saved_videos = [video for video in new_videos if video['video_id'] in saved_ids]
+            saved_count = len(saved_videos)
+            unsaved = {video['video_id'] for video in new_videos} - saved_ids
+            self._prefetch_thumbnails(saved_videos)
+            for video in saved_videos:
+                lines.append(f"  📥 新视频: {video['title']}")
+            
+            with timed('db_write'):
+                if unsaved:
+                    # 有视频没保存成功时保留旧的抓取状态，下个周期重新获取并处理整个feed
+                    self._unsaved_videos[channel['channel_id']] = unsaved
+                    message = f'找到 {saved_count} 个新视频, {len(unsaved)} 个保存失败'
+                else:
+                    self._unsaved_videos.pop(channel['channel_id'], None)
+                    message = f'找到 {saved_count} 个新视频'
+                    # 所有视频都保存后再记录抓取状态
+                    if feed['status'] == 'modified':
+                        self.db.save_feed_state(channel['channel_id'], feed['etag'],
+                                                feed['last_modified'], feed['content_hash'])
+                
+                # 记录监控日志
+                self.db.add_monitor_log(
+                    channel_id=channel['channel_id'],
+                    new_videos_count=saved_count,
+                    status='error' if unsaved else 'success',
+                    message=message
+                )
+            
+            if unsaved:
+                lines.append(f"  ⚠️ {len(unsaved)} 个新视频保存失败，下次检查时重试")
+            if saved_count > 0:
+                lines.append(f"  ✅ 添加了 {saved_count} 个新视频")
+            elif not unsaved:
+                lines.append(f"  ✅ 没有新视频")
+            
+            return {
+                'channel_id': channel['channel_id'],
+                'status': 'error' if unsaved else 'success',
+                'fetch_status': feed['status'],
+                'new_videos': saved_count,
+                'videos': saved_videos,
+                'lines': lines
+            }
+            
+        except Exception as e:
+            logger.error(f"检查频道 {channel['channel_id']} 失败: {e}")
+            lines.append(f"  ❌ 检查失败: {e}")
+            
+            # 记录错误日志
+            self.db.add_monitor_log(
+                channel_id=channel['channel_id'],
+                new_videos_count=0,
+                status='error',
+                message=str(e)
+            )
+            
+            return {
+                'channel_id': channel['channel_id'],
+                'status': 'error',
+                'fetch_status': 'failed',
+                'new_videos': 0,
+                'videos': [],
+                'lines': lines
+            }
+    
+    def _check_and_schedule_channel(self, channel: Dict, feed_state: Dict = None, start_at: float = None) -> Dict:
+        """检查单个频道并根据发布历史计算下次检查间隔（在工作线程中执行）"""
+        # 分散检查时等到该频道分配的时间点再开始
+        if start_at is not None:
+            delay = start_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        
+        # 记录该频道各阶段的耗时
+        with collect_timings(CHANNEL_SECONDS) as timings:
+            result = self._check_single_channel(channel, feed_state)
+            
+            if result['status'] == 'error':
+                # 检查失败时尽快重试
+                poll_interval = Config.SCHEDULE_MIN_INTERVAL
+            elif result['fetch_status'] in ('not_modified', 'unchanged') and channel.get('poll_interval'):
+                # feed没有变化，发布历史也不会变，沿用上次的间隔
+                poll_interval = channel['poll_interval']
+            else:
+                with timed('db_read'):
+                    publish_times = self.db.get_recent_publish_times(channel['channel_id'])
+                poll_interval = compute_poll_interval(publish_times)
+            
+            result['poll_interval'] = poll_interval
+            result['next_check_at'] = next_check_time(poll_interval)
+            
+            # 检查完立即推送结果（不等待排在前面的频道）
+            with timed('db_write'):
+                self._publish_channel_events(channel, result)
+        
+        result['timings'] = timings
+        CHANNEL_CHECKS.inc(status=result['status'], fetch_status=result['fetch_status'])
+        return result
+    
+    def _publish_channel_events(self, channel: Dict, result: Dict):
+        """发布频道检查结果和新发现视频的实时事件"""
+        events = [
+            {
+                'type': 'video',
+                'data': {
+                    'video_id': video['video_id'],
+                    'channel_id': channel['channel_id'],
+                    'channel_name': channel['channel_name'],
+                    'title': video['title'],
+                    'video_url': video['video_url'],
+                    'thumbnail_url': video.get('thumbnail_url'),
+                    'published_at': video['published_at'].strftime('%Y-%m-%d %H:%M:%S')
+                }
+            }
+            for video in result['videos']
+        ]
+        events.append({
+            'type': 'channel_checked',
+            'data': {
+                'channel_id': channel['channel_id'],
+                'channel_name': channel['channel_name'],
+                'status': result['status'],
+                'fetch_status': result['fetch_status'],
+                'new_videos': result['new_videos']
+            }
+        })
+        self.db.add_events(events)
+    
+    def check_channel_updates(self, channel_id: str = None, due_only: bool = False,
+                              spread_seconds: float = 0, progress: Callable = None,
+                              channels: List[Dict] = None) -> Dict:
+        """检查频道更新（due_only=True时只检查到期的频道，channels不为None时只检查给定的频道（如多节点领取的分片），
+        spread_seconds>0时把请求分散到该时间窗口内，
+        progress(已完成频道数, 频道总数, 新视频数) 在开始时和每个频道完成后调用）；
+        每个周期各阶段的耗时汇总写入监控日志（status='cycle'）；检查出错时结果中带 error"""
+        with collect_timings() as cycle_timings:
+            result = self._check_channel_updates(channel_id, due_only, spread_seconds, progress, channels)
+        
+        if result.get('channel_results'):
+            CYCLE_SECONDS.observe(cycle_timings['total'])
+            self._save_cycle_summary(result, cycle_timings)
+            # 本进程的耗时直方图增量累加到数据库，/metrics 在任何进程中都能看到
+            REGISTRY.flush(self.db.add_metric_series)
+            # 周期汇总写入后再通知，页面收到事件时重新加载的统计已包含本周期
+            self.db.add_events([{
+                'type': 'check_completed',
+                'data': {
+                    'total_channels': result['total_channels'],
+                    'total_new_videos': result['total_new_videos'],
+                    'elapsed_seconds': result['elapsed_seconds']
+                }
+            }])
+        return result
+    
+    def _save_cycle_summary(self, result: Dict, cycle_timings: Dict):
+        """把本周期的耗时汇总（各阶段p50/p95、最慢的频道）以JSON写入监控日志"""
+        summary = summarize_cycle(result['channel_results'], cycle_timings)
+        summary['errors'] = sum(1 for r in result['channel_results'] if r['status'] == 'error')
+        summary['not_modified'] = result['not_modified_count']
+        summary['unchanged'] = result['hash_hit_count']
+        
+        self.db.add_monitor_log(
+            channel_id=None,
+            new_videos_count=result['total_new_videos'],
+            status='cycle',
+            message=f"检查周期: {summary['channels']} 个频道, 耗时 {summary['elapsed_seconds']} 秒",
+            details=summary
+        )
+        
+        slowest = summary['slowest_channels'][0] if summary['slowest_channels'] else None
+        if slowest:
+            logger.info(f"最慢的频道: {slowest['channel_id']} ({slowest['timings'].get('total', 0):.2f} 秒)")
+    
+    def _check_channel_updates(self, channel_id: str, due_only: bool, spread_seconds: float,
+                               progress: Optional[Callable], channels: Optional[List[Dict]]) -> Dict:
+        try:
+            # 获取要检查的频道
+            if channels is None:
+                with timed('db_read'):
+                    if channel_id:
+                        channels = [ch for ch in self.db.get_active_channels() if ch['channel_id'] == channel_id]
+                    elif due_only:
+                        channels = self.db.get_due_channels()
                     else:
-                        print(f"  ✅ 添加了 {saved_count} 个新视频")
-                    
-                except Exception as e:
-                    logger.error(f"检查频道 {channel['channel_id']} 失败: {e}")
-                    print(f"  ❌ 检查失败: {e}")
+                        channels = self.db.get_active_channels()
+            
+            if channel_id and not channels:
+                print(f"❌ 未找到频道: {channel_id}")
+                return {'total_channels': 0, 'total_new_videos': 0}
+            
+            if not channels:
+                if due_only:
+                    print("✅ 没有到期需要检查的频道")
+                else:
+                    print("❌ 没有可监控的频道")
+                return {'total_channels': 0, 'total_new_videos': 0}
+            
+            workers = max(1, min(Config.POLL_WORKERS, len(channels)))
+            if progress:
+                progress(0, len(channels), 0)
+            print(f"🔍 开始检查 {len(channels)} 个频道的更新 (并发数: {workers})...")
+            
+            total_new_videos = 0
+            not_modified_count = 0
+            hash_hit_count = 0
+            channel_results = []
+            start_time = time.perf_counter()
+            
+            # 一次查询所有频道的RSS抓取状态
+            with timed('db_read'):
+                feed_states = self.db.get_feed_states([ch['channel_id'] for ch in channels])
+            states = [feed_states.get(ch['channel_id']) for ch in channels]
+            
+            # 带抖动地把各频道的开始时间分散到时间窗口内，避免整点突发请求
+            start_base = time.monotonic()
+            start_times = [start_base + offset
+                           for offset in FetchDispatcher.spread_offsets(len(channels), spread_seconds)]
+            
+            # 频道并发检查；executor.map 按提交顺序返回结果，输出顺序与串行一致
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(self._check_and_schedule_channel, channels, states, start_times)
+                for i, (channel, result) in enumerate(zip(channels, results), 1):
+                    print(f"\n[{i}/{len(channels)}] 检查频道: {channel['channel_name']}")
+                    for line in result.pop('lines'):
+                        print(line)
                     
-                    # 记录错误日志
-                    self.db.add_monitor_log(
-                        channel_id=channel['channel_id'],
-                        new_videos_count=0,
-                        status='error',
-                        message=str(e)
-                    )
+                    total_new_videos += result['new_videos']
+                    if result['fetch_status'] == 'not_modified':
+                        not_modified_count += 1
+                    elif result['fetch_status'] == 'unchanged':
+                        hash_hit_count += 1
+                    channel_results.append(result)
+                    if progress:
+                        progress(i, len(channels), total_new_videos)
+            
+            # 视频详情已通过事件推送，不再保留在结果中
+            for result in channel_results:
+                result.pop('videos')
+            
+            # 批量保存每个频道的下次检查时间
+            with timed('db_write'):
+                self.db.update_channel_schedules([
+                    {
+                        'channel_id': result['channel_id'],
+                        'poll_interval': result['poll_interval'],
+                        'next_check_at': result['next_check_at']
+                    }
+                    for result in channel_results
+                ])
+            
+            elapsed_seconds = round(time.perf_counter() - start_time, 3)
             
-            print(f"\n🎉 检查完成! 总共发现 {total_new_videos} 个新视频")
+            print(f"\n🎉 检查完成! 总共发现 {total_new_videos} 个新视频 (耗时 {elapsed_seconds:.1f} 秒)")
+            print(f"📉 feed未变化: 304响应 {not_modified_count} 个, 内容哈希命中 {hash_hit_count} 个")
+            logger.info(f"检查周期完成: {len(channels)} 个频道, {total_new_videos} 个新视频, 耗时 {elapsed_seconds} 秒, "
+                        f"304响应 {not_modified_count} 个, 哈希命中 {hash_hit_count} 个")
             
             return {
                 'total_channels': len(channels),
-                'total_new_videos': total_new_videos
+                'total_new_videos': total_new_videos,
+                'not_modified_count': not_modified_count,
+                'hash_hit_count': hash_hit_count,
+                'elapsed_seconds': elapsed_seconds,
+                'channel_results': channel_results
             }
             
         except Exception as e:
             logger.error(f"检查更新失败: {e}")
             print(f"❌ 检查更新时出错: {e}")
-            return {'total_channels': 0, 'total_new_videos': 0}
+            return {'total_channels': 0, 'total_new_videos': 0, 'error': str(e)}
+    
+    def import_channels_from_file(self, file_path: str):
+        """从文件批量导入频道并打印结果报告"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                urls = parse_channel_list(f.read())
+            
+            if not urls:
+                print(f"❌ 文件中没有频道: {file_path}")
+                return
+            
+            summary = self.import_channels(urls)
+            
+            print(f"\n📋 导入结果 (共 {summary['total']} 个):")
+            print("=" * 80)
+            for result in summary['results']:
+                if result['status'] == 'added':
+                    print(f"✅ {result['url']} -> {result['channel_name']} ({result['channel_id']}), {result['new_videos']} 个视频")
+                elif result['status'] == 'duplicate':
+                    print(f"⏭️  {result['url']} 重复，已跳过")
+                else:
+                    print(f"❌ {result['url']} 失败: {result['error']}")
+            print("=" * 80)
+            print(f"成功 {summary['added']} 个, 重复 {summary['duplicates']} 个, 失败 {summary['failed']} 个, "
+                  f"新视频 {summary['new_videos']} 个")
+            
+        except Exception as e:
+            logger.error(f"批量导入频道失败: {e}")
+            print(f"❌ 批量导入频道时出错: {e}")
     
     def list_channels(self):
         """列出所有监控频道"""
@@ -246,6 +676,9 @@ class YouTubeMonitorRSS:
                 print(f"\n🔍 最近 {days} 天监控统计:")
                 print("-" * 40)
                 for stat in monitor_stats:
+                    if stat['status'] == 'cycle':
+                        print(f"{stat['message']}, 时间: {stat['check_time'].strftime('%Y-%m-%d %H:%M')}")
+                        continue
                     print(f"频道ID: {stat['channel_id']}, 状态: {stat['status']}, 新视频: {stat['new_videos_count']}, 时间: {stat['check_time'].strftime('%Y-%m-%d %H:%M')}")
             
         except Exception as e:
@@ -261,9 +694,9 @@ class YouTubeMonitorRSS:
             # 测试数据库连接
             print("1. 测试数据库连接...")
             if self.db.test_connection():
-                print("   ✅ MongoDB连接正常")
+                print(f"   ✅ 数据库连接正常 ({Config.STORAGE_BACKEND})")
             else:
-                print("   ❌ MongoDB连接失败")
+                print(f"   ❌ 数据库连接失败 ({Config.STORAGE_BACKEND})")
                 return False
             
             # 测试RSS监控
@@ -298,13 +731,14 @@ def main():
     parser = argparse.ArgumentParser(description='YouTube视频监控系统 - RSS版本')
     
     parser.add_argument('command', choices=[
-        'test-system', 'add-channel', 'list-channels', 
-        'check-updates', 'show-recent', 'show-stats'
+        'test-system', 'add-channel', 'import-channels', 'list-channels', 
+        'check-updates', 'show-recent', 'show-stats', 'rebuild-stats', 'backfill-channel-fields', 'migrate'
     ], help='要执行的命令')
     
-    parser.add_argument('url_or_id', nargs='?', help='频道URL或频道ID')
+    parser.add_argument('url_or_id', nargs='?', help='频道URL或频道ID（import-channels时为频道列表文件）')
     parser.add_argument('--days', type=int, default=7, help='天数 (默认: 7)')
     parser.add_argument('--channel-id', help='特定频道ID')
+    parser.add_argument('--force', action='store_true', help='migrate时从头重新执行所有迁移步骤（如重建被删除的索引）')
     
     args = parser.parse_args()
     
@@ -321,6 +755,12 @@ def main():
                 sys.exit(1)
             monitor.add_channel(args.url_or_id)
             
+        elif args.command == 'import-channels':
+            if not args.url_or_id:
+                print("❌ 请提供频道列表文件")
+                sys.exit(1)
+            monitor.import_channels_from_file(args.url_or_id)
+            
         elif args.command == 'list-channels':
             monitor.list_channels()
             
@@ -333,6 +773,24 @@ def main():
         elif args.command == 'show-stats':
             monitor.show_stats(args.days)
             
+        elif args.command == 'rebuild-stats':
+            print("🔧 正在根据视频数据重建频道统计...")
+            count = monitor.db.rebuild_channel_stats()
+            print(f"✅ 已重建 {count} 个频道的统计")
+            
+        elif args.command == 'backfill-channel-fields':
+            print("🔧 正在为视频回填频道名称和URL...")
+            count = monitor.db.backfill_video_channel_fields()
+            print(f"✅ 已更新 {count} 个视频")
+            
+        elif args.command == 'migrate':
+            print(f"🔧 正在迁移数据库结构 (当前版本 v{monitor.db.get_schema_version()})...")
+            result = monitor.db.migrate(force=args.force)
+            if result['from_version'] == result['to_version']:
+                print(f"✅ 数据库结构已是最新版本 v{result['to_version']}")
+            else:
+                print(f"✅ 已迁移: v{result['from_version']} -> v{result['to_version']} (耗时 {result['elapsed_seconds']} 秒)")
+            
     except KeyboardInterrupt:
         print("\n\n👋 程序被用户中断")
     except Exception as e:
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能指标
+检查周期中各阶段（解析频道ID、HTTP请求、XML解析、数据库读写）的耗时按阶段汇总到直方图，
+由 web_ui.py 的 /metrics 以Prometheus文本格式输出。
+各进程先在内存中记录，执行检查的进程（auto_monitor.py、Web后台任务）每个周期结束后把增量累加到数据库，
+/metrics 输出数据库中所有进程的累计值，多个worker每次抓取看到的都是同一组序列
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 单个阶段/单个频道的耗时分桶（秒）
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# 整个检查周期的耗时分桶（秒）
+CYCLE_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, label_names: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = STAGE_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List] = {}  # 标签值 -> [各分桶计数, 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """记录一次观测值"""
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        """当前各序列的值：{标签值: {分桶序号: 计数, 'sum': 总和, 'count': 次数}}"""
+        with self._lock:
+            return {
+                key: {**{str(i): bucket_count for i, bucket_count in enumerate(counts)}, 'sum': total, 'count': count}
+                for key, (counts, total, count) in self._series.items()
+            }
+
+    def render(self, series: Dict[Tuple[str, ...], Dict[str, float]] = None) -> List[str]:
+        """Prometheus文本格式（series为None时输出本进程的值）"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for key, values in sorted((self.snapshot() if series is None else series).items()):
+            for i, bound in enumerate(self.buckets):
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(values.get(str(i), 0))}")
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {_format_value(values.get('count', 0))}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {values.get('sum', 0):.6f}")
+            lines.append(f"{self.name}_count{labels} {_format_value(values.get('count', 0))}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, description: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """计数增加"""
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        """当前各序列的值：{标签值: {'value': 计数}}"""
+        with self._lock:
+            return {key: {'value': value} for key, value in self._values.items()}
+
+    def render(self, series: Dict[Tuple[str, ...], Dict[str, float]] = None) -> List[str]:
+        """Prometheus文本格式（series为None时输出本进程的值）"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for key, values in sorted((self.snapshot() if series is None else series).items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(values.get('value', 0))}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._flushed: Dict[str, Dict] = {}  # 已累加到数据库的值（指标名 -> 快照）
+        self._flush_lock = threading.Lock()
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def flush(self, write: Callable[[List[Dict]], bool]) -> bool:
+        """把上次累加之后的增量交给 write（StorageBackend.add_metric_series），写入成功后才记为已累加"""
+        with self._flush_lock:
+            snapshots = {metric.name: metric.snapshot() for metric in self._metrics}
+            series = []
+            for name, snapshot in snapshots.items():
+                flushed = self._flushed.get(name, {})
+                for key, values in snapshot.items():
+                    previous = flushed.get(key, {})
+                    delta = {field: value - previous.get(field, 0) for field, value in values.items()
+                             if value != previous.get(field, 0)}
+                    if delta:
+                        series.append({'metric': name, 'labels': list(key), 'values': delta})
+
+            if series and not write(series):
+                return False
+            self._flushed = snapshots
+            return True
+
+    def render(self, series: List[Dict] = None) -> List[str]:
+        """输出所有指标；series 为数据库中累加的值（get_metric_series），为None时输出本进程的值"""
+        by_metric = None
+        if series is not None:
+            by_metric = {}
+            for item in series:
+                by_metric.setdefault(item['metric'], {})[tuple(item['labels'])] = item['values']
+
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(None if by_metric is None else by_metric.get(metric.name, {})))
+        return lines
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'youtube_monitor_stage_seconds',
+    '各阶段耗时（resolve/throttle/fetch/fetch_fallback/parse/db_read/db_write）',
+    ['stage']
+)
+CHANNEL_SECONDS = REGISTRY.histogram(
+    'youtube_monitor_channel_check_seconds', '单个频道检查的总耗时'
+)
+CYCLE_SECONDS = REGISTRY.histogram(
+    'youtube_monitor_cycle_seconds', '一次检查周期的总耗时', buckets=CYCLE_BUCKETS
+)
+CHANNEL_CHECKS = REGISTRY.counter(
+    'youtube_monitor_channel_checks_total', '频道检查次数', ['status', 'fetch_status']
+)
+FALLBACK_REQUESTS = REGISTRY.counter(
+    'youtube_monitor_fallback_requests_total',
+    '主连接失败后经备用连接的请求次数（ok/http_error/error/short_circuited）',
+    ['result']
+)
+FALLBACK_BREAKER_TRIPS = REGISTRY.counter(
+    'youtube_monitor_fallback_breaker_trips_total', '备用连接按主机熔断的次数', ['host']
+)
+
+_local = threading.local()
+
+
+@contextmanager
+def timed(stage: str):
+    """记录一个阶段的耗时：写入直方图，并累加到当前线程正在收集的耗时（见 collect_timings）"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = getattr(_local, 'timings', None)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+@contextmanager
+def collect_timings(histogram: Optional[Histogram] = None):
+    """收集当前线程中各阶段的耗时，结束时 timings['total'] 为总耗时（并记录到 histogram）"""
+    timings = {}
+    previous = getattr(_local, 'timings', None)
+    _local.timings = timings
+    started = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+        timings['total'] = time.perf_counter() - started
+        if histogram is not None:
+            histogram.observe(timings['total'])
+
+
+def summarize_cycle(channel_results: List[Dict], cycle_timings: Dict, slowest: int = 5) -> Dict:
+    """汇总一个检查周期的耗时：各阶段在所有频道上的总和/p50/p95/最大值，以及最慢的几个频道"""
+    stages = {}
+    for result in channel_results:
+        for stage, seconds in result.get('timings', {}).items():
+            stages.setdefault(stage, []).append(seconds)
+
+    def percentile(values: List[float], q: float) -> float:
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    stage_summary = {}
+    for stage, values in stages.items():
+        values.sort()
+        stage_summary[stage] = {
+            'total': round(sum(values), 3),
+            'p50': round(percentile(values, 0.5), 4),
+            'p95': round(percentile(values, 0.95), 4),
+            'max': round(values[-1], 4)
+        }
+
+    slowest_channels = sorted(channel_results, key=lambda r: r.get('timings', {}).get('total', 0), reverse=True)
+    return {
+        'channels': len(channel_results),
+        'elapsed_seconds': round(cycle_timings.get('total', 0), 3),
+        'cycle_stages': {stage: round(seconds, 4) for stage, seconds in cycle_timings.items() if stage != 'total'},
+        'channel_stages': stage_summary,
+        'slowest_channels': [
+            {
+                'channel_id': result['channel_id'],
+                'fetch_status': result.get('fetch_status'),
+                'timings': {stage: round(seconds, 4) for stage, seconds in result.get('timings', {}).items()}
+            }
+            for result in slowest_channels[:slowest]
+        ]
+    }
+
+
+def render_last_cycle(log: Optional[Dict]) -> List[str]:
+    """把数据库中最近一次检查周期的汇总输出为gauge（包括其他进程执行的周期，如auto_monitor.py）"""
+    if not log or not log.get('details'):
+        return []
+
+    details = log['details']
+    lines = [
+        "# HELP youtube_monitor_last_cycle_timestamp_seconds 最近一次检查周期的完成时间",
+        "# TYPE youtube_monitor_last_cycle_timestamp_seconds gauge",
+        f"youtube_monitor_last_cycle_timestamp_seconds {log['check_time'].timestamp():.0f}",
+        "# HELP youtube_monitor_last_cycle_seconds 最近一次检查周期的总耗时",
+        "# TYPE youtube_monitor_last_cycle_seconds gauge",
+        f"youtube_monitor_last_cycle_seconds {details.get('elapsed_seconds', 0)}",
+        "# HELP youtube_monitor_last_cycle_channels 最近一次检查周期检查的频道数",
+        "# TYPE youtube_monitor_last_cycle_channels gauge",
+        f"youtube_monitor_last_cycle_channels {details.get('channels', 0)}",
+        "# HELP youtube_monitor_last_cycle_new_videos 最近一次检查周期发现的新视频数",
+        "# TYPE youtube_monitor_last_cycle_new_videos gauge",
+        f"youtube_monitor_last_cycle_new_videos {log.get('new_videos_count', 0)}",
+        "# HELP youtube_monitor_last_cycle_stage_seconds 最近一次检查周期各阶段在所有频道上的耗时总和",
+        "# TYPE youtube_monitor_last_cycle_stage_seconds gauge",
+    ]
+    for stage, summary in sorted(details.get('channel_stages', {}).items()):
+        if stage == 'total':
+            continue
+        lines.append(f'youtube_monitor_last_cycle_stage_seconds{{stage="{stage}"}} {summary["total"]}')
+    return lines
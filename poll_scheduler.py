@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应轮询调度
+根据频道的历史发布间隔（EWMA）计算每个频道的检查间隔
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from config import Config
+
+
+def compute_poll_interval(publish_times: List[datetime], now: Optional[datetime] = None) -> int:
+    """根据发布时间计算检查间隔（秒），结果限制在配置的最小/最大间隔之间"""
+    now = now or datetime.now()
+    times = sorted(t for t in publish_times if t is not None)
+
+    if len(times) < 2:
+        # 历史不足，使用默认检查间隔
+        return _clamp(Config.CHECK_INTERVAL)
+
+    gaps = [(later - earlier).total_seconds() for earlier, later in zip(times, times[1:])]
+    gaps = [gap for gap in gaps if gap > 0]
+    if not gaps:
+        return _clamp(Config.CHECK_INTERVAL)
+
+    # 按时间顺序计算EWMA，越近的间隔权重越大
+    alpha = Config.SCHEDULE_EWMA_ALPHA
+    ewma = gaps[0]
+    for gap in gaps[1:]:
+        ewma = alpha * gap + (1 - alpha) * ewma
+
+    # 距上次发布已超过平均间隔，说明频道变得不活跃，把这段空档也计入
+    since_last = (now - times[-1]).total_seconds()
+    if since_last > ewma:
+        ewma = alpha * since_last + (1 - alpha) * ewma
+
+    # 在一个预期发布间隔内检查若干次，控制发现延迟
+    return _clamp(ewma * Config.SCHEDULE_POLL_FACTOR)
+
+
+def next_check_time(poll_interval: int, now: Optional[datetime] = None) -> datetime:
+    """计算下次检查时间（加随机抖动，避免大量频道在同一时刻到期）"""
+    jitter = random.uniform(-Config.SCHEDULE_JITTER, Config.SCHEDULE_JITTER)
+    return (now or datetime.now()) + timedelta(seconds=poll_interval * (1 + jitter))
+
+
+def _clamp(interval: float) -> int:
+    """把间隔限制在最小/最大值之间"""
+    return int(min(max(interval, Config.SCHEDULE_MIN_INTERVAL), Config.SCHEDULE_MAX_INTERVAL))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+频道ID解析缓存
+把 @handle、/c/、/user/ 等URL映射到规范的 UC… 频道ID和频道名称，
+进程内LRU在前，MongoDB持久化缓存在后（带TTL和否定结果）
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from config import Config
+
+
+class ChannelResolveCache:
+    def __init__(self, db=None, max_size: int = None):
+        self.db = db  # 存储后端（StorageBackend），为None时只使用进程内缓存
+        self.max_size = max_size or Config.RESOLVE_CACHE_SIZE
+        self.logger = logging.getLogger(__name__)
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(url: str) -> Optional[str]:
+        """根据频道URL生成缓存键，无法识别的URL返回None"""
+        for marker, kind in (('/channel/', 'channel'), ('/@', 'handle'), ('/c/', 'c'), ('/user/', 'user')):
+            if marker in url:
+                name = url.split(marker)[-1].split('/')[0].split('?')[0]
+                if not name:
+                    return None
+                # 频道ID区分大小写，handle和自定义名称不区分
+                return f"{kind}:{name if kind == 'channel' else name.lower()}"
+        return None
+
+    def get(self, key: str) -> Optional[Dict]:
+        """查询缓存；未命中返回None，命中返回 {'channel_id', 'channel_name'}（否定结果的channel_id为None）"""
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                if entry['expires_at'] > now:
+                    self._lru.move_to_end(key)
+                    return entry
+                del self._lru[key]
+
+        if self.db is None:
+            return None
+
+        doc = self.db.get_channel_resolution(key)
+        if not doc:
+            return None
+
+        entry = {
+            'channel_id': doc.get('channel_id'),
+            'channel_name': doc.get('channel_name'),
+            'expires_at': doc['expires_at'].timestamp()
+        }
+        if entry['expires_at'] <= now:
+            return None
+
+        self._remember(key, entry)
+        return entry
+
+    def set(self, key: str, channel_id: Optional[str], channel_name: str = None):
+        """写入缓存；channel_id为None表示否定结果，使用较短的TTL"""
+        ttl = Config.RESOLVE_CACHE_TTL if channel_id else Config.RESOLVE_NEGATIVE_TTL
+        entry = {
+            'channel_id': channel_id,
+            'channel_name': channel_name,
+            'expires_at': time.time() + ttl
+        }
+        self._remember(key, entry)
+
+        if self.db is not None:
+            self.db.save_channel_resolution(key, channel_id, channel_name, ttl)
+
+    def _remember(self, key: str, entry: Dict):
+        """写入进程内LRU，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._lru[key] = entry
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内响应缓存
+TTL过期 + 容量上限LRU淘汰，条目带标签，数据库写入时按标签精确失效
+"""
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from config import Config
+
+
+class ResponseCache:
+    def __init__(self, max_size: int = None, ttl: float = None):
+        self.max_size = max_size or Config.RESPONSE_CACHE_SIZE
+        self.ttl = ttl or Config.RESPONSE_CACHE_TTL
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0  # 每次失效加一，用于丢弃计算期间已过时的响应
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'not_modified': 0}
+
+    @staticmethod
+    def make_etag(body: bytes) -> str:
+        """根据响应内容生成ETag（不含引号）"""
+        return hashlib.sha1(body).hexdigest()
+
+    @property
+    def generation(self) -> int:
+        """当前失效代数，查询数据库前记录，写入缓存时传回"""
+        with self._lock:
+            return self._generation
+
+    def get(self, key: str) -> Optional[Dict]:
+        """获取缓存条目 {'body', 'etag'}，未命中或已过期返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['expires_at'] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+    def set(self, key: str, body: bytes, tags: Iterable[str], generation: int = None) -> Dict:
+        """写入缓存条目，超出容量时淘汰最久未使用的条目；
+        查询期间发生过失效（generation已变化）时只返回条目而不缓存"""
+        entry = {
+            'body': body,
+            'etag': self.make_etag(body),
+            'tags': set(tags),
+            'expires_at': time.monotonic() + self.ttl
+        }
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return entry
+
+    def invalidate(self, tags: Iterable[str]):
+        """删除带有任一标签的条目；以 ':*' 结尾的标签按前缀匹配"""
+        exact = set()
+        prefixes = []
+        for tag in tags:
+            if tag.endswith(':*'):
+                prefixes.append(tag[:-1])
+            else:
+                exact.add(tag)
+
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry['tags'] & exact or any(tag.startswith(prefix) for tag in entry['tags'] for prefix in prefixes)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.stats['invalidations'] += len(stale)
+
+    def record_not_modified(self):
+        """记录一次304响应"""
+        with self._lock:
+            self.stats['not_modified'] += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        """命中率等统计信息"""
+        with self._lock:
+            total = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hit_rate': round(self.stats['hits'] / total, 4) if total else 0.0
+            }
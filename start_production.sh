@@ -0,0 +1,14 @@
+#!/bin/bash
+
+# YouTube RSS监控系统 - 生产模式启动（Linux，多进程gunicorn）
+# worker数、线程数、监听地址通过 WEB_WORKERS / WEB_THREADS / WEB_HOST / WEB_PORT 环境变量配置
+
+cd "$(dirname "$0")"
+
+if ! command -v gunicorn >/dev/null 2>&1; then
+    echo "❌ 未安装gunicorn，请先运行: pip install -r requirements.txt"
+    exit 1
+fi
+
+echo "🚀 以生产模式启动Web服务..."
+exec gunicorn -c gunicorn.conf.py web_ui:app
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存储后端接口
+上层代码（监控、Web、后台任务）只通过这里定义的方法读写数据；
+MongoDBManager（database_mongodb.py）和 SQLiteManager（database_sqlite.py）实现同一套方法，
+通过 STORAGE_BACKEND 配置选择
+"""
+
+import json
+import zlib
+import base64
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from config import Config
+
+
+class StorageBackend(ABC):
+    # 频道按channel_id哈希分到固定数量的分片，多节点轮询时以分片为单位领取租约（修改需要重新迁移分片号）
+    LEASE_SHARDS = 64
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._write_listeners = []
+
+    # ===== 写入通知 =====
+    def add_write_listener(self, callback):
+        """注册写入回调，每次写入后以受影响的标签集合调用（用于缓存失效）"""
+        self._write_listeners.append(callback)
+
+    def _notify_write(self, *tags: str):
+        """通知写入回调：channels/videos/logs 表示集合，channel:<id> 表示单个频道，channel:* 表示所有频道"""
+        for callback in self._write_listeners:
+            try:
+                callback(set(tags))
+            except Exception as e:
+                self.logger.error(f"写入回调执行失败: {e}")
+
+    # ===== 游标分页 =====
+    @staticmethod
+    def encode_cursor(sort_value: datetime, video_id: str) -> str:
+        """把页末视频的排序键编码成不透明的分页游标"""
+        raw = json.dumps([sort_value.isoformat(), video_id]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+        """解析分页游标，格式错误时抛出ValueError"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            sort_value, video_id = json.loads(raw)
+            return datetime.fromisoformat(sort_value), str(video_id)
+        except Exception as e:
+            raise ValueError(f"无效的分页游标: {cursor}") from e
+
+    @staticmethod
+    def _stats_day(value: datetime) -> str:
+        """统计按天分桶的键"""
+        return value.strftime('%Y-%m-%d')
+
+    @classmethod
+    def channel_shard(cls, channel_id: str) -> int:
+        """频道所属的分片号（与进程无关的稳定哈希）"""
+        return zlib.crc32(channel_id.encode('utf-8')) % cls.LEASE_SHARDS
+
+    # ===== 结构版本与迁移 =====
+    @abstractmethod
+    def get_schema_version(self) -> int:
+        """读取数据库当前的结构版本（从未迁移过为0）"""
+
+    @abstractmethod
+    def migrate(self, force: bool = False) -> Dict:
+        """执行落后的迁移步骤，返回 {'from_version', 'to_version', 'elapsed_seconds'}"""
+
+    # ===== 频道管理 =====
+    @abstractmethod
+    def add_channel(self, channel_id: str, channel_name: str, channel_url: str,
+                    description: str = None, subscriber_count: int = None) -> bool:
+        """添加要监控的频道（已存在则覆盖）"""
+
+    @abstractmethod
+    def add_channels(self, channels: List[Dict]) -> List[str]:
+        """批量添加频道，返回成功保存的频道ID列表"""
+
+    @abstractmethod
+    def backfill_video_channel_fields(self) -> int:
+        """为所有视频回填冗余的频道名称和URL，返回更新的视频数"""
+
+    @abstractmethod
+    def get_channel(self, channel_id: str) -> Optional[Dict]:
+        """获取单个频道"""
+
+    @abstractmethod
+    def get_active_channels(self) -> List[Dict]:
+        """获取所有活跃的监控频道（按名称排序）"""
+
+    @abstractmethod
+    def get_due_channels(self, now: datetime = None) -> List[Dict]:
+        """获取到期需要检查的活跃频道"""
+
+    @abstractmethod
+    def update_channel_schedules(self, schedules: List[Dict]) -> bool:
+        """批量更新频道的检查间隔和下次检查时间"""
+
+    @abstractmethod
+    def update_channel_status(self, channel_id: str, is_active: bool) -> bool:
+        """更新频道监控状态"""
+
+    # ===== RSS抓取状态 =====
+    @abstractmethod
+    def get_feed_states(self, channel_ids: List[str]) -> Dict[str, Dict]:
+        """批量获取频道的RSS抓取状态"""
+
+    @abstractmethod
+    def save_feed_state(self, channel_id: str, etag: str = None, last_modified: str = None,
+                        content_hash: str = None) -> bool:
+        """保存频道的RSS抓取状态"""
+
+    # ===== 频道ID解析缓存 =====
+    @abstractmethod
+    def get_channel_resolution(self, key: str) -> Optional[Dict]:
+        """获取未过期的频道URL解析结果"""
+
+    @abstractmethod
+    def save_channel_resolution(self, key: str, channel_id: Optional[str], channel_name: str = None,
+                                ttl_seconds: int = None) -> bool:
+        """保存频道URL的解析结果"""
+
+    # ===== 视频管理 =====
+    @abstractmethod
+    def add_video(self, video_data: Dict) -> bool:
+        """添加单个视频"""
+
+    @abstractmethod
+    def add_videos(self, videos: List[Dict]) -> List[str]:
+        """批量添加视频，返回成功保存的视频ID列表"""
+
+    @abstractmethod
+    def get_video(self, video_id: str) -> Optional[Dict]:
+        """获取单个视频"""
+
+    @abstractmethod
+    def video_exists(self, video_id: str) -> bool:
+        """检查视频是否已存在"""
+
+    @abstractmethod
+    def get_existing_video_ids(self, video_ids: List[str]) -> Set[str]:
+        """批量检查视频是否存在，返回已有的视频ID集合"""
+
+    @abstractmethod
+    def update_video_status(self, video_ids: List[str], is_new: bool = False) -> bool:
+        """更新视频的新旧状态"""
+
+    @abstractmethod
+    def delete_video(self, video_id: str) -> bool:
+        """删除单个视频"""
+
+    @abstractmethod
+    def delete_channel_and_videos(self, channel_id: str) -> Dict[str, int]:
+        """删除频道及其所有视频、日志和统计"""
+
+    @abstractmethod
+    def get_channel_videos(self, channel_id: str, limit: int = None) -> List[Dict]:
+        """获取指定频道的视频（按发布时间倒序）"""
+
+    @abstractmethod
+    def iter_channel_videos(self, channel_id: str, is_new: bool = None,
+                            since: datetime = None, until: datetime = None) -> Iterator[Dict]:
+        """按发布时间倒序逐条读取频道视频"""
+
+    @abstractmethod
+    def get_latest_video_date(self, channel_id: str) -> Optional[datetime]:
+        """获取频道最新视频的发布日期"""
+
+    @abstractmethod
+    def get_recent_publish_times(self, channel_id: str, limit: int = 20) -> List[datetime]:
+        """获取频道最近若干个视频的发布时间"""
+
+    @abstractmethod
+    def get_recent_videos(self, days: int = 7) -> List[Dict]:
+        """获取最近几天发现的视频"""
+
+    @abstractmethod
+    def get_channel_videos_page(self, channel_id: str, limit: int, cursor: str = None) -> Dict:
+        """按发布时间倒序分页获取频道视频，返回 {'videos', 'next_cursor'}"""
+
+    @abstractmethod
+    def get_recent_videos_page(self, days: int, limit: int, cursor: str = None) -> Dict:
+        """按发现时间倒序分页获取最近几天的视频，返回 {'videos', 'next_cursor'}"""
+
+    @abstractmethod
+    def get_channel_video_count(self, channel_id: str) -> int:
+        """获取频道视频总数"""
+
+    # ===== 监控日志 =====
+    @abstractmethod
+    def add_monitor_log(self, channel_id: Optional[str], new_videos_count: int = 0,
+                        status: str = 'success', message: str = '', details: Dict = None) -> bool:
+        """添加监控日志（details为可选的结构化数据，如检查周期的耗时汇总）"""
+
+    @abstractmethod
+    def add_monitor_logs(self, logs: List[Dict]) -> bool:
+        """批量添加监控日志"""
+
+    @abstractmethod
+    def get_monitor_stats(self, channel_id: str = None, days: int = 30) -> List[Dict]:
+        """获取最近几天的监控日志（按检查时间倒序）"""
+
+    @abstractmethod
+    def get_last_cycle_log(self) -> Optional[Dict]:
+        """获取最近一次检查周期的汇总日志（status='cycle'）"""
+
+    # ===== 实时事件 =====
+    @abstractmethod
+    def add_events(self, events: List[Dict]) -> bool:
+        """发布实时事件，每条包含 type/data"""
+
+    @abstractmethod
+    def tail_events(self, since: datetime):
+        """返回 created_at >= since 的事件游标（包括之后新写入的）：
+        带 alive 属性和 close()，每轮迭代最多等待约1秒"""
+
+    # ===== 新视频通知 =====
+    @abstractmethod
+    def get_videos_discovered_after(self, after: Tuple[datetime, str], until: datetime = None,
+                                    limit: int = 100) -> List[Dict]:
+        """按 (discovered_at, video_id) 正序读取高水位 after 之后发现的视频（until不为None时只读取到该时间）"""
+
+    @abstractmethod
+    def watch_new_videos(self, resume_token: Dict = None):
+        """打开新插入视频的变更流（带 try_next()/resume_token/alive/close()），从resume_token之后继续，
+        断点已失效时从当前位置开始；存储不支持变更流时返回None"""
+
+    # ===== 多节点分片租约 =====
+    @abstractmethod
+    def claim_shard_lease(self, owner: str, lease_seconds: int, ready_before: datetime = None) -> Optional[Dict]:
+        """原子地领取一个分片：未被持有（或租约已过期）且 next_run_at <= ready_before，
+        返回 {'shard', 'owner', 'claimed_at', 'expires_at', 'next_run_at'}，没有可领取的分片时返回None"""
+
+    @abstractmethod
+    def renew_shard_lease(self, shard: int, owner: str, lease_seconds: int) -> bool:
+        """续租；租约已被其他节点接管时返回False"""
+
+    @abstractmethod
+    def release_shard_lease(self, shard: int, owner: str, next_run_at: datetime) -> bool:
+        """释放租约并设置分片下次可领取的时间；租约已被其他节点接管时返回False"""
+
+    @abstractmethod
+    def get_shard_leases(self) -> List[Dict]:
+        """获取所有分片的租约状态（按分片号排序）"""
+
+    @abstractmethod
+    def get_shard_channels(self, shard: int, due_only: bool = False, now: datetime = None) -> List[Dict]:
+        """获取分片内的活跃频道（due_only=True时只返回到期的频道）"""
+
+    @abstractmethod
+    def record_worker_stats(self, worker_id: str, shards: int, channels: int, new_videos: int,
+                            busy_seconds: float) -> bool:
+        """累加轮询节点的处理量（分片数、频道数、新视频数、处理耗时）"""
+
+    @abstractmethod
+    def get_worker_stats(self, active_since: datetime = None) -> List[Dict]:
+        """获取轮询节点的累计处理量（按最近活跃时间倒序）"""
+
+    # ===== 性能指标 =====
+    @abstractmethod
+    def add_metric_series(self, series: List[Dict]) -> bool:
+        """累加性能指标：每项包含 metric、labels（标签值列表）、values（{分桶/sum/count: 增量}）"""
+
+    @abstractmethod
+    def get_metric_series(self) -> List[Dict]:
+        """获取所有进程累加的性能指标（格式同 add_metric_series）"""
+
+    # ===== 后台任务 =====
+    @abstractmethod
+    def create_job(self, job_doc: Dict) -> bool:
+        """创建后台任务；已有相同dedup_key的进行中任务时返回False"""
+
+    @abstractmethod
+    def get_active_job(self, dedup_key: str) -> Optional[Dict]:
+        """获取指定dedup_key的进行中任务"""
+
+    @abstractmethod
+    def update_job(self, job_id: str, fields: Dict, finished: bool = False, expected_status: str = None) -> bool:
+        """更新任务状态和进度；finished=True时释放去重键；
+        expected_status不为None时只在任务仍处于该状态时更新（否则返回False）"""
+
+    @abstractmethod
+    def heartbeat_jobs(self, worker_id: str) -> int:
+        """刷新该工作进程所有进行中任务的心跳时间，返回任务数"""
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """获取单个任务"""
+
+    @abstractmethod
+    def get_recent_jobs(self, limit: int = 20) -> List[Dict]:
+        """获取最近的任务"""
+
+    # ===== 配置管理 =====
+    @abstractmethod
+    def get_config(self, key: str) -> Optional[str]:
+        """获取配置值"""
+
+    @abstractmethod
+    def set_config(self, key: str, value: str, description: str = '') -> bool:
+        """设置配置值"""
+
+    # ===== 清理维护 =====
+    @abstractmethod
+    def cleanup_old_logs(self, days: int = None) -> int:
+        """清理过期的监控日志，返回删除条数"""
+
+    @abstractmethod
+    def get_database_stats(self) -> Dict:
+        """获取数据库统计信息"""
+
+    @abstractmethod
+    def close_connection(self):
+        """关闭数据库连接"""
+
+    @abstractmethod
+    def test_connection(self) -> bool:
+        """测试数据库连接"""
+
+    # ===== 频道统计计数 =====
+    @abstractmethod
+    def rebuild_channel_stats(self) -> int:
+        """根据视频数据重建所有频道的统计计数，返回频道数"""
+
+    @abstractmethod
+    def get_channel_video_stats(self) -> List[Dict]:
+        """获取每个活跃频道的视频统计"""
+
+
+def create_storage(backend: str = None) -> StorageBackend:
+    """按 STORAGE_BACKEND 配置（或指定的backend）创建存储后端（只导入用到的后端）"""
+    backend = (backend or Config.STORAGE_BACKEND).lower()
+
+    if backend == 'sqlite':
+        from database_sqlite import SQLiteManager
+        return SQLiteManager()
+    if backend == 'mongodb':
+        from database_mongodb import MongoDBManager
+        return MongoDBManager()
+
+    raise ValueError(f"不支持的存储后端: {backend}（可选 mongodb / sqlite）")
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from storage import create_storage  # noqa: E402
+
+TEST_DATABASE = 'youtube_monitor_test'
+
+
+def mongodb_available() -> bool:
+    try:
+        from pymongo import MongoClient
+        client = MongoClient(Config.MONGODB_URL, serverSelectionTimeoutMS=500)
+        client.admin.command('ping')
+        client.close()
+        return True
+    except Exception:
+        return False
+
+
+@pytest.fixture(params=['sqlite', 'mongodb'])
+def storage(request, tmp_path, monkeypatch):
+    """同一套测试分别跑在两种存储后端上；没有可用的mongod时跳过mongodb"""
+    if request.param == 'mongodb':
+        if not mongodb_available():
+            pytest.skip('没有可用的MongoDB')
+        monkeypatch.setattr(Config, 'MONGODB_DATABASE', TEST_DATABASE)
+    else:
+        monkeypatch.setattr(Config, 'SQLITE_PATH', str(tmp_path / 'test.db'))
+
+    db = create_storage(request.param)
+    if request.param == 'mongodb':
+        # 从干净的数据库开始（迁移会重新建集合和索引）
+        db.client.drop_database(TEST_DATABASE)
+        db.migrate(force=True)
+    yield db
+
+    if request.param == 'mongodb':
+        db.client.drop_database(TEST_DATABASE)
+    db.close_connection()
@@ -0,0 +1,33 @@
+"""实时事件分发：其他进程写入的事件让本进程的响应缓存失效"""
+
+from event_bus import EventBus
+from response_cache import ResponseCache
+
+
+def test_events_invalidate_response_cache(storage):
+    cache = ResponseCache(max_size=10, ttl=600)
+    bus = EventBus(storage, cache.invalidate)
+    subscriber = bus.subscribe()
+
+    cache.set('/api/stats', b'{}', ['channels', 'videos', 'logs'])
+    cache.set('/api/channels/UCa/videos', b'{}', ['channel:UCa'])
+    cache.set('/api/channels/UCb/videos', b'{}', ['channel:UCb'])
+
+    # 相当于定时检查进程写入的事件（不经过本进程的写入监听）
+    storage.add_events([{'type': 'video', 'data': {'video_id': 'v1', 'channel_id': 'UCa'}}])
+    assert subscriber.get(timeout=5)['type'] == 'video'
+    assert cache.get('/api/channels/UCa/videos') is None
+    assert cache.get('/api/channels/UCb/videos') is not None
+
+    cache.set('/api/stats', b'{}', ['channels', 'videos', 'logs'])
+    storage.add_events([{'type': 'check_completed', 'data': {'total_channels': 1, 'total_new_videos': 1}}])
+    assert subscriber.get(timeout=5)['type'] == 'check_completed'
+    # 页面收到事件后重新请求统计时不会命中旧的缓存
+    assert cache.get('/api/stats') is None
+    assert cache.get('/api/channels/UCb/videos') is not None
+
+    # 等后台线程退出后再关闭数据库连接
+    thread = bus._thread
+    bus.unsubscribe(subscriber)
+    thread.join(timeout=10)
+    assert not thread.is_alive()
@@ -0,0 +1,155 @@
+"""限流调度：对本地HTTP服务发送真实请求，验证令牌桶限流和Retry-After暂停"""
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config import Config
+from fetch_dispatcher import FetchDispatcher, TokenBucket
+from youtube_rss import YouTubeRSSMonitor
+from youtube_rss_async import AsyncYouTubeRSSMonitor
+
+
+# 第一次请求返回的错误状态码和是否带Retry-After
+FAIL_ONCE = {'/limited': (429, True), '/unavailable': (503, True), '/flaky': (503, False)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((time.monotonic(), self.path))
+            failure = FAIL_ONCE.get(self.path) if self.path not in server.failed_paths else None
+            server.failed_paths.add(self.path)
+
+        if failure:
+            status, retry_after = failure
+            self.send_response(status)
+            if retry_after:
+                self.send_header('Retry-After', str(server.retry_after))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """本地HTTP服务：FAIL_ONCE 中的路径第一次请求返回错误，其余请求返回200"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.failed_paths = set()
+    server.retry_after = 1
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def url(server, path):
+    return f'http://127.0.0.1:{server.server_address[1]}{path}'
+
+
+def fetch_all(monitor, urls, workers=8):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(monitor._safe_request, urls))
+
+
+def test_requests_across_threads_respect_rate(stub_server):
+    rate, burst, count = 20, 2, 22
+    monitor = YouTubeRSSMonitor(dispatcher=FetchDispatcher(rate=rate, burst=burst))
+
+    started = time.monotonic()
+    responses = fetch_all(monitor, [url(stub_server, f'/feed?{i}') for i in range(count)])
+    elapsed = time.monotonic() - started
+
+    assert all(r.status_code == 200 for r in responses)
+    # 突发之外的每个请求都要等一个令牌
+    assert elapsed >= (count - burst) / rate
+    times = sorted(t for t, _ in stub_server.requests)
+    assert times[-1] - times[0] >= (count - burst) / rate * 0.9
+
+
+@pytest.mark.parametrize('path', ['/limited', '/unavailable'])
+def test_retry_after_pauses_all_callers_for_host(stub_server, monkeypatch, path):
+    monkeypatch.setattr(Config, 'RATE_LIMIT_RETRIES', 1)
+    dispatcher = FetchDispatcher(rate=1000, burst=1000)
+    monitor = YouTubeRSSMonitor(dispatcher=dispatcher)
+
+    # 一个线程收到429/503后暂停该主机（503不在连接上重试），暂停结束后重试成功
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        limited = executor.submit(monitor._safe_request, url(stub_server, path))
+        deadline = time.monotonic() + 5
+        while dispatcher.paused_for(url(stub_server, '/')) <= 0:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        # 其他线程对同一主机的请求同样等到暂停结束才发出
+        responses = fetch_all(monitor, [url(stub_server, f'/feed?{i}') for i in range(8)])
+        assert limited.result().status_code == 200
+
+    assert all(r.status_code == 200 for r in responses)
+    limited_at = stub_server.requests[0][0]
+    later = [t for t, _ in stub_server.requests[1:]]
+    assert len(later) == 9
+    assert min(later) >= limited_at + stub_server.retry_after
+
+
+def test_503_without_retry_after_is_retried_on_connection(stub_server):
+    dispatcher = FetchDispatcher(rate=1000, burst=1000)
+    monitor = YouTubeRSSMonitor(dispatcher=dispatcher)
+
+    response = monitor._safe_request(url(stub_server, '/flaky'))
+    assert response.status_code == 200
+    assert [path for _, path in stub_server.requests] == ['/flaky', '/flaky']
+    assert dispatcher.paused_for(url(stub_server, '/')) == 0
+
+
+def test_async_client_hands_503_retry_after_to_dispatcher(stub_server, monkeypatch):
+    monkeypatch.setattr(Config, 'RATE_LIMIT_RETRIES', 1)
+    dispatcher = FetchDispatcher(rate=1000, burst=1000)
+
+    async def fetch():
+        async with AsyncYouTubeRSSMonitor(dispatcher=dispatcher) as monitor:
+            return await monitor._safe_request(url(stub_server, '/unavailable'))
+
+    assert asyncio.run(fetch()).status_code == 200
+    (first, _), (retried, _) = stub_server.requests
+    assert retried - first >= stub_server.retry_after
+
+def test_retry_after_http_date():
+    assert FetchDispatcher._parse_retry_after('120') == 120
+    assert FetchDispatcher._parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert FetchDispatcher._parse_retry_after('soon') is None
+
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=10, capacity=3)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+
+
+@pytest.mark.parametrize('count, window', [(1, 60), (7, 60), (1000, 3600), (5, 0.5)])
+def test_spread_offsets_within_window(count, window):
+    offsets = FetchDispatcher.spread_offsets(count, window)
+    assert len(offsets) == count
+    assert all(0 <= offset <= window + 1e-9 for offset in offsets)
+    assert offsets == sorted(offsets)
+    # 每个请求落在自己的时间槽内
+    slot = window / count
+    assert all(i * slot - 1e-9 <= offset <= (i + 1) * slot + 1e-9 for i, offset in enumerate(offsets))
+
+
+def test_spread_offsets_without_window():
+    assert FetchDispatcher.spread_offsets(3, 0) == [0.0, 0.0, 0.0]
+    assert FetchDispatcher.spread_offsets(0, 60) == []
@@ -0,0 +1,96 @@
+"""后台任务队列：中断任务的判断和任务状态流转"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from job_queue import JobQueue
+
+
+class FakeMonitor:
+    def __init__(self, db, result=None):
+        self.db = db
+        self.result = result or {'total_channels': 1, 'total_new_videos': 2}
+        self.calls = 0
+
+    def check_channel_updates(self, channel_id=None, progress=None):
+        self.calls += 1
+        return self.result
+
+
+@pytest.fixture
+def queue(storage):
+    queue = JobQueue(FakeMonitor(storage), workers=1)
+    yield queue
+    queue._executor.shutdown(wait=True)
+
+
+def existing_job(queue, status, worker_id='other-node', heartbeat_at=None, updated_at=None):
+    now = datetime.now()
+    job = {
+        'job_id': f'old-{status}',
+        'type': 'check_updates',
+        'dedup_key': queue.dedup_key(None),
+        'channel_id': None,
+        'status': status,
+        'worker_id': worker_id,
+        'heartbeat_at': heartbeat_at or now,
+        'created_at': now - timedelta(hours=1),
+        'updated_at': updated_at or now - timedelta(hours=1),
+    }
+    assert queue.db.create_job(job)
+    return job
+
+
+def test_queued_job_of_live_worker_is_kept(queue):
+    # 排队很久但所属进程仍有心跳：不是中断，返回已有任务
+    job = existing_job(queue, 'queued')
+    returned, created = queue.submit_check()
+    assert not created
+    assert returned['job_id'] == job['job_id']
+    assert queue.db.get_job(job['job_id'])['status'] == 'queued'
+
+
+def test_queued_job_of_dead_worker_is_replaced(queue):
+    job = existing_job(queue, 'queued', heartbeat_at=datetime.now() - timedelta(hours=1))
+    returned, created = queue.submit_check()
+    assert created
+    assert returned['job_id'] != job['job_id']
+    assert queue.db.get_job(job['job_id'])['status'] == 'failed'
+
+
+def test_running_job_without_progress_is_replaced(queue):
+    job = existing_job(queue, 'running')
+    _, created = queue.submit_check()
+    assert created
+    assert queue.db.get_job(job['job_id'])['status'] == 'failed'
+
+
+def test_run_check_skips_job_no_longer_queued(queue):
+    job = existing_job(queue, 'queued')
+    queue.db.update_job(job['job_id'], {'status': 'failed', 'error': '任务已中断'}, finished=True)
+
+    queue._run_check(job['job_id'], None)
+    assert queue.monitor.calls == 0
+    assert queue.db.get_job(job['job_id'])['status'] == 'failed'
+
+
+def test_run_check_marks_job_done(queue):
+    job, created = queue.submit_check()
+    assert created
+    queue._executor.shutdown(wait=True)
+
+    finished = queue.db.get_job(job['job_id'])
+    assert finished['status'] == 'done'
+    assert finished['new_videos'] == 2
+
+
+def test_run_check_marks_failed_check_as_failed(storage):
+    queue = JobQueue(FakeMonitor(storage, {'total_channels': 0, 'total_new_videos': 0, 'error': '数据库不可用'}),
+                     workers=1)
+    job, _ = queue.submit_check()
+    queue._executor.shutdown(wait=True)
+
+    failed = queue.db.get_job(job['job_id'])
+    assert failed['status'] == 'failed'
+    assert failed['error'] == '数据库不可用'
@@ -0,0 +1,82 @@
+"""频道检查：新视频没有全部保存时不记录抓取状态，下个周期重新处理"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+
+class FakeRSS:
+    """固定返回同一个feed（内容哈希与已保存的抓取状态比较）"""
+
+    def __init__(self, videos):
+        self.videos = videos
+
+    def fetch_feed(self, channel_id, feed_state=None):
+        content_hash = 'hash-1'
+        status = 'unchanged' if (feed_state or {}).get('content_hash') == content_hash else 'modified'
+        return {'status': status, 'content': b'<feed/>', 'etag': '"v1"', 'last_modified': None,
+                'content_hash': content_hash}
+
+    def parse_videos(self, content, channel_id, max_results=20):
+        return [dict(video) for video in self.videos]
+
+
+@pytest.fixture
+def monitor(storage, monkeypatch, tmp_path):
+    # main_rss 导入时在当前目录创建日志文件
+    monkeypatch.chdir(tmp_path)
+    import main_rss
+
+    monkeypatch.setattr(main_rss, 'create_storage', lambda: storage)
+    monitor = main_rss.YouTubeMonitorRSS()
+    storage.add_channel('UCtest', '测试频道', 'https://www.youtube.com/channel/UCtest')
+    return monitor
+
+
+def make_videos():
+    published = datetime(2024, 1, 1)
+    return [{
+        'video_id': f'vid{i}',
+        'channel_id': 'UCtest',
+        'title': f'视频 {i}',
+        'video_url': f'https://www.youtube.com/watch?v=vid{i}',
+        'published_at': published + timedelta(hours=i),
+    } for i in range(3)]
+
+
+def check(monitor):
+    channel = monitor.db.get_channel('UCtest')
+    feed_state = monitor.db.get_feed_states(['UCtest']).get('UCtest')
+    return monitor._check_single_channel(channel, feed_state)
+
+
+def test_partially_saved_feed_is_processed_again(monitor, monkeypatch):
+    monitor.rss_monitor = FakeRSS(make_videos())
+    add_videos = monitor.db.add_videos
+
+    # 第一次保存时最早的视频写入失败（最新的视频已保存，最新发布时间已越过它）
+    monkeypatch.setattr(monitor.db, 'add_videos',
+                        lambda videos: add_videos([v for v in videos if v['video_id'] != 'vid0']))
+    result = check(monitor)
+    assert result['status'] == 'error'
+    assert result['new_videos'] == 2
+    assert 'UCtest' not in monitor.db.get_feed_states(['UCtest'])
+
+    # 下个周期重新获取feed，补存失败的视频后才记录抓取状态
+    monkeypatch.setattr(monitor.db, 'add_videos', add_videos)
+    result = check(monitor)
+    assert result['status'] == 'success'
+    assert [video['video_id'] for video in result['videos']] == ['vid0']
+    assert monitor.db.get_feed_states(['UCtest'])['UCtest']['content_hash'] == 'hash-1'
+
+    # 之后feed没有变化，直接跳过
+    assert check(monitor)['fetch_status'] == 'unchanged'
+
+
+def test_failed_save_keeps_old_feed_state(monitor, monkeypatch):
+    monitor.rss_monitor = FakeRSS(make_videos())
+    monkeypatch.setattr(monitor.db, 'add_videos', lambda videos: [])
+
+    result = check(monitor)
+    assert result['status'] == 'error'
+    assert monitor.db.get_feed_states(['UCtest']) == {}
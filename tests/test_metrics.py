@@ -0,0 +1,50 @@
+"""性能指标：多个进程的增量累加到数据库，/metrics 输出同一组累计值"""
+
+from metrics import MetricsRegistry
+
+
+def make_registry():
+    """相当于一个进程中的指标"""
+    registry = MetricsRegistry()
+    stage = registry.histogram('test_stage_seconds', '阶段耗时', ['stage'], buckets=(0.1, 1))
+    checks = registry.counter('test_checks_total', '检查次数', ['status'])
+    return registry, stage, checks
+
+
+def test_flush_accumulates_across_processes(storage):
+    worker, worker_stage, worker_checks = make_registry()
+    scheduler, scheduler_stage, _ = make_registry()
+
+    worker_stage.observe(0.05, stage='fetch')
+    worker_checks.inc(status='success')
+    scheduler_stage.observe(0.5, stage='fetch')
+    scheduler_stage.observe(2, stage='parse')
+
+    assert worker.flush(storage.add_metric_series)
+    assert scheduler.flush(storage.add_metric_series)
+    # 没有新的观测值时再次累加不会重复计数
+    assert worker.flush(storage.add_metric_series)
+
+    lines = worker.render(storage.get_metric_series())
+    assert 'test_stage_seconds_bucket{stage="fetch",le="0.1"} 1' in lines
+    assert 'test_stage_seconds_bucket{stage="fetch",le="1"} 2' in lines
+    assert 'test_stage_seconds_count{stage="fetch"} 2' in lines
+    assert 'test_stage_seconds_sum{stage="fetch"} 0.550000' in lines
+    assert 'test_stage_seconds_bucket{stage="parse",le="+Inf"} 1' in lines
+    assert 'test_checks_total{status="success"} 1' in lines
+
+    # 之后的观测值只累加增量
+    worker_checks.inc(2, status='success')
+    worker.flush(storage.add_metric_series)
+    assert 'test_checks_total{status="success"} 3' in scheduler.render(storage.get_metric_series())
+
+
+def test_failed_flush_is_retried():
+    registry, stage, _ = make_registry()
+    stage.observe(0.5, stage='fetch')
+    written = []
+
+    assert not registry.flush(lambda series: False)
+    assert registry.flush(lambda series: written.extend(series) or True)
+    assert written == [{'metric': 'test_stage_seconds', 'labels': ['fetch'],
+                        'values': {'1': 1, 'sum': 0.5, 'count': 1}}]
@@ -0,0 +1,50 @@
+"""SQLite存储特有的行为"""
+
+import gc
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from config import Config
+from storage import create_storage
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLITE_PATH', str(tmp_path / 'test.db'))
+    db = create_storage('sqlite')
+    yield db
+    db.close_connection()
+
+
+def open_fds() -> int:
+    return len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else 0
+
+
+def run_cycles(db, cycles: int):
+    """模拟检查周期：每个周期新建线程池，每个线程各用一个连接"""
+    for _ in range(cycles):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: db.get_active_channels(), range(16)))
+    gc.collect()
+
+
+def test_thread_connections_closed_when_threads_end(sqlite_storage):
+    run_cycles(sqlite_storage, 5)
+    connections, fds = len(sqlite_storage._connections), open_fds()
+
+    run_cycles(sqlite_storage, 50)
+    # 线程结束后连接随之关闭，连接数和文件描述符数不随周期数增长
+    assert len(sqlite_storage._connections) == connections <= 2
+    # 文件描述符允许少量波动（泄漏时50个周期会多出数百个）
+    assert open_fds() <= fds + 10
+
+
+def test_close_connection_closes_all_threads(sqlite_storage):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: sqlite_storage.get_active_channels(), range(4)))
+    sqlite_storage.close_connection()
+    assert len(sqlite_storage._connections) == 0
+    # 关闭后再次使用会重新连接
+    assert sqlite_storage.get_active_channels() == []
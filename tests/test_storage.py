@@ -0,0 +1,269 @@
+"""存储后端测试：每个用例在SQLite和MongoDB上各跑一次（见 conftest.py 的 storage fixture）"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import Config
+from database_sqlite import SQLiteManager
+
+
+def add_channel(db, channel_id='UCtest', name='测试频道'):
+    db.add_channel(channel_id, name, f'https://www.youtube.com/channel/{channel_id}')
+
+
+def make_video(index, channel_id='UCtest', published_at=None):
+    return {
+        'video_id': f'vid{index:04d}',
+        'channel_id': channel_id,
+        'title': f'视频 {index}',
+        'video_url': f'https://www.youtube.com/watch?v=vid{index:04d}',
+        'published_at': published_at or datetime(2024, 1, 1) + timedelta(hours=index),
+    }
+
+
+# ===== 视频 =====
+def test_add_videos_dedup(storage):
+    add_channel(storage)
+    videos = [make_video(i) for i in range(5)]
+
+    assert sorted(storage.add_videos(videos)) == [v['video_id'] for v in videos]
+    # 重复写入同样的视频不会产生新记录，也不会重复计数
+    storage.add_videos(videos[:3] + [make_video(5)])
+
+    assert storage.get_channel_video_count('UCtest') == 6
+    assert storage.get_existing_video_ids(['vid0000', 'vid0005', 'nope']) == {'vid0000', 'vid0005'}
+    assert storage.video_exists('vid0004')
+    assert not storage.video_exists('nope')
+    # 冗余的频道名称
+    assert storage.get_video('vid0000')['channel_name'] == '测试频道'
+
+
+def test_add_videos_from_many_channels(storage):
+    # 一批视频涉及的频道数超过SQLite单条语句的参数上限时分批查询频道信息
+    channel_ids = [f'UC{i:05d}' for i in range(1200)]
+    for channel_id in channel_ids:
+        add_channel(storage, channel_id, f'频道 {channel_id}')
+    storage.add_videos([make_video(i, channel_id) for i, channel_id in enumerate(channel_ids)])
+
+    assert storage.get_video('vid1199')['channel_name'] == '频道 UC01199'
+    assert storage.get_channel_video_count('UC00000') == 1
+
+
+def test_channel_stats(storage):
+    add_channel(storage)
+    add_channel(storage, 'UCother', '其他频道')
+    storage.add_videos([make_video(i) for i in range(4)])
+    storage.add_videos([make_video(4)])  # 单独一批
+    storage.add_videos([make_video(0)])  # 已存在
+
+    stats = {s['channel_id']: s for s in storage.get_channel_video_stats()}
+    assert stats['UCtest']['total_videos'] == 5
+    assert stats['UCtest']['videos_last_7_days'] == 5
+    assert stats['UCtest']['latest_video_date'] == make_video(4)['published_at']
+    assert stats['UCother']['total_videos'] == 0
+
+    assert storage.delete_video('vid0004')
+    stats = {s['channel_id']: s for s in storage.get_channel_video_stats()}
+    assert stats['UCtest']['total_videos'] == 4
+
+    # 重建的结果与增量维护的一致
+    storage.rebuild_channel_stats()
+    rebuilt = {s['channel_id']: s for s in storage.get_channel_video_stats()}
+    assert rebuilt['UCtest']['total_videos'] == 4
+    assert rebuilt['UCtest']['videos_last_7_days'] == 4
+
+
+def stats_days(storage, channel_id='UCtest'):
+    """频道统计中已有的按天分桶"""
+    if not isinstance(storage, SQLiteManager):
+        return set(storage.db.channel_stats.find_one({'channel_id': channel_id}).get('daily', {}))
+    return {row['day'] for row in storage.conn.execute(
+        'SELECT day FROM channel_stats_daily WHERE channel_id = ?', (channel_id,))}
+
+
+def test_expired_stats_buckets_pruned_on_write(storage):
+    add_channel(storage)
+    old = datetime.now() - timedelta(days=Config.STATS_BUCKET_DAYS + 3)
+    # 直接写入一个过期的分桶（相当于很久以前发现的视频）
+    storage._inc_channel_stats([dict(make_video(0), discovered_at=old)])
+    if isinstance(storage, SQLiteManager):
+        storage.conn.commit()
+
+    storage.add_videos([make_video(1)])
+    assert stats_days(storage) == {storage._stats_day(datetime.now())}
+    stats = {s['channel_id']: s for s in storage.get_channel_video_stats()}
+    assert stats['UCtest']['total_videos'] == 2
+    assert stats['UCtest']['videos_last_7_days'] == 1
+
+
+# ===== 游标分页 =====
+def test_channel_videos_cursor_pagination(storage):
+    add_channel(storage)
+    same_time = datetime(2024, 6, 1)
+    # 一半视频发布时间相同，验证 video_id 作为第二排序键
+    storage.add_videos([make_video(i, published_at=same_time if i % 2 else None) for i in range(7)])
+
+    seen, cursor = [], None
+    while True:
+        page = storage.get_channel_videos_page('UCtest', limit=3, cursor=cursor)
+        seen.extend(page['videos'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    keys = [(v['published_at'], v['video_id']) for v in seen]
+    assert len(keys) == 7
+    assert keys == sorted(keys, reverse=True)
+    assert len({v['video_id'] for v in seen}) == 7
+
+
+def test_recent_videos_page_and_invalid_cursor(storage):
+    add_channel(storage)
+    storage.add_videos([make_video(i) for i in range(4)])
+
+    first = storage.get_recent_videos_page(days=1, limit=3)
+    assert len(first['videos']) == 3
+    rest = storage.get_recent_videos_page(days=1, limit=3, cursor=first['next_cursor'])
+    assert len(rest['videos']) == 1
+    assert rest['next_cursor'] is None
+
+    with pytest.raises(ValueError):
+        storage.get_recent_videos_page(days=1, limit=3, cursor='not-a-cursor')
+
+
+# ===== 配置 =====
+def test_config(storage):
+    assert storage.get_config('missing') is None
+    assert storage.set_config('notify', 'v1', '说明')
+    assert storage.get_config('notify') == 'v1'
+    storage.set_config('notify', 'v2')
+    assert storage.get_config('notify') == 'v2'
+    # 默认配置
+    assert storage.get_config('check_interval') == '3600'
+
+
+# ===== 后台任务 =====
+def make_job(dedup_key='check_updates:*'):
+    return {
+        'job_id': uuid.uuid4().hex,
+        'type': 'check_updates',
+        'dedup_key': dedup_key,
+        'channel_id': None,
+        'status': 'queued',
+        'created_at': datetime.now(),
+        'updated_at': datetime.now(),
+    }
+
+
+def test_jobs_dedup(storage):
+    job = make_job()
+    assert storage.create_job(job)
+    # 同一dedup_key只能有一个进行中的任务
+    assert not storage.create_job(make_job())
+    assert storage.create_job(make_job('check_updates:UCtest'))
+
+    assert storage.get_active_job('check_updates:*')['job_id'] == job['job_id']
+    assert storage.update_job(job['job_id'], {'status': 'running', 'channels_done': 2})
+    assert storage.get_job(job['job_id'])['channels_done'] == 2
+
+    # 完成后释放去重键
+    storage.update_job(job['job_id'], {'status': 'done'}, finished=True)
+    assert storage.get_active_job('check_updates:*') is None
+    finished = storage.get_job(job['job_id'])
+    assert finished['status'] == 'done'
+    assert 'active' not in finished
+    assert storage.create_job(make_job())
+    assert len(storage.get_recent_jobs()) == 3
+
+
+def test_job_expected_status_and_heartbeat(storage):
+    job = dict(make_job(), worker_id='node-a', heartbeat_at=datetime(2024, 1, 1))
+    storage.create_job(job)
+
+    # 只有仍处于指定状态时才更新
+    assert not storage.update_job(job['job_id'], {'status': 'done'}, finished=True, expected_status='running')
+    assert storage.update_job(job['job_id'], {'status': 'running'}, expected_status='queued')
+    assert not storage.update_job(job['job_id'], {'status': 'running'}, expected_status='queued')
+
+    assert storage.heartbeat_jobs('node-b') == 0
+    assert storage.heartbeat_jobs('node-a') == 1
+    assert storage.get_job(job['job_id'])['heartbeat_at'] > datetime.now() - timedelta(minutes=1)
+
+    # 结束的任务不再刷新心跳
+    storage.update_job(job['job_id'], {'status': 'done'}, finished=True, expected_status='running')
+    assert storage.heartbeat_jobs('node-a') == 0
+
+
+# ===== 多节点分片租约 =====
+def test_shard_leases(storage):
+    assert len(storage.get_shard_leases()) == storage.LEASE_SHARDS
+
+    lease = storage.claim_shard_lease('node-a', 60)
+    assert lease['owner'] == 'node-a'
+    assert lease['expires_at'] > datetime.now()
+
+    # 持有中的分片不会再交给其他节点
+    claimed = {lease['shard']}
+    while True:
+        other = storage.claim_shard_lease('node-b', 60)
+        if other is None:
+            break
+        assert other['shard'] not in claimed
+        claimed.add(other['shard'])
+    assert len(claimed) == storage.LEASE_SHARDS
+
+    assert storage.renew_shard_lease(lease['shard'], 'node-a', 60)
+    assert not storage.renew_shard_lease(lease['shard'], 'node-b', 60)
+    assert not storage.release_shard_lease(lease['shard'], 'node-b', datetime.now())
+
+    # 释放时设置下次可领取的时间：未来的时间不可领取
+    assert storage.release_shard_lease(lease['shard'], 'node-a', datetime.now() + timedelta(hours=1))
+    assert storage.claim_shard_lease('node-c', 60) is None
+
+
+def test_expired_lease_is_reclaimed(storage):
+    lease = storage.claim_shard_lease('crashed', 0)  # 立即过期，相当于节点崩溃
+    reclaimed = storage.claim_shard_lease('node-b', 60, ready_before=lease['next_run_at'])
+    assert reclaimed['shard'] == lease['shard']
+    assert reclaimed['owner'] == 'node-b'
+    # 崩溃的节点不能再释放或续租
+    assert not storage.release_shard_lease(lease['shard'], 'crashed', datetime.now())
+
+
+def test_shard_channels_and_worker_stats(storage):
+    add_channel(storage, 'UCa')
+    add_channel(storage, 'UCb')
+    shard = storage.channel_shard('UCa')
+    assert 'UCa' in [c['channel_id'] for c in storage.get_shard_channels(shard)]
+
+    storage.update_channel_schedules([{'channel_id': 'UCa', 'poll_interval': 3600,
+                                       'next_check_at': datetime.now() + timedelta(hours=1)}])
+    assert 'UCa' not in [c['channel_id'] for c in storage.get_shard_channels(shard, due_only=True)]
+
+    storage.record_worker_stats('node-a', 1, 10, 2, 5.0)
+    storage.record_worker_stats('node-a', 2, 20, 0, 5.0)
+    worker = storage.get_worker_stats()[0]
+    assert worker['worker_id'] == 'node-a'
+    assert (worker['shards_processed'], worker['channels_checked'], worker['new_videos']) == (3, 30, 2)
+    assert worker['busy_seconds'] == pytest.approx(10.0)
+    assert storage.get_worker_stats(active_since=datetime.now() + timedelta(minutes=1)) == []
+
+
+# ===== 新视频通知 =====
+def test_get_videos_discovered_after(storage):
+    add_channel(storage)
+    storage.add_videos([make_video(i) for i in range(5)])
+    videos = storage.get_videos_discovered_after((datetime(2000, 1, 1), ''), limit=100)
+
+    keys = [(v['discovered_at'], v['video_id']) for v in videos]
+    assert len(keys) == 5
+    assert keys == sorted(keys)
+
+    # 从第二个视频之后继续（同一时间的视频按 video_id 区分）
+    rest = storage.get_videos_discovered_after(keys[1], limit=100)
+    assert [v['video_id'] for v in rest] == [v['video_id'] for v in videos[2:]]
+    assert storage.get_videos_discovered_after(keys[-1]) == []
+    assert storage.get_videos_discovered_after((datetime(2000, 1, 1), ''), limit=2) == videos[:2]
+    assert storage.get_videos_discovered_after((datetime(2000, 1, 1), ''), until=datetime(2001, 1, 1)) == []
@@ -0,0 +1,65 @@
+"""缩略图缓存：导出ZIP时blob已被淘汰的情况"""
+
+import io
+import os
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from thumbnail_cache import ThumbnailCache
+
+
+def jpeg_bytes() -> bytes:
+    output = io.BytesIO()
+    Image.new('RGB', (4, 4), (255, 0, 0)).save(output, 'JPEG')
+    return output.getvalue()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ThumbnailCache(str(tmp_path / 'thumbnails'))
+    monkeypatch.setattr(cache.session, 'get',
+                        lambda url, timeout=None: SimpleNamespace(status_code=200, content=jpeg_bytes()))
+    return cache
+
+
+def evict_after_first_download(cache, monkeypatch, refetch_ok: bool):
+    """第一次获取后立即删除blob，模拟写入ZIP之前被淘汰；返回获取过的URL"""
+    get = cache.get
+    calls = []
+
+    def get_then_evict(url):
+        calls.append(url)
+        if calls.count(url) > 1 and not refetch_ok:
+            return None
+        cached = get(url)
+        if calls.count(url) == 1:
+            os.unlink(cached[0])
+        return cached
+
+    monkeypatch.setattr(cache, 'get', get_then_evict)
+    return calls
+
+
+def export(cache, videos):
+    data = b''.join(cache.stream_zip(videos, workers=1))
+    return zipfile.ZipFile(io.BytesIO(data))
+
+
+def test_evicted_blob_is_fetched_again(cache, monkeypatch):
+    calls = evict_after_first_download(cache, monkeypatch, refetch_ok=True)
+
+    archive = export(cache, [{'video_id': 'a', 'title': 'A', 'thumbnail_url': 'http://img/a'}])
+    assert archive.namelist() == ['A_a.png']
+    assert Image.open(io.BytesIO(archive.read('A_a.png'))).size == (4, 4)
+    assert calls == ['http://img/a', 'http://img/a']
+
+
+def test_evicted_blob_that_cannot_be_fetched_is_missing(cache, monkeypatch):
+    evict_after_first_download(cache, monkeypatch, refetch_ok=False)
+
+    archive = export(cache, [{'video_id': 'a', 'title': 'A', 'thumbnail_url': 'http://img/a'}])
+    assert archive.namelist() == ['missing.txt']
+    assert archive.read('missing.txt') == b'a\n'
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缩略图磁盘缓存
+下载的缩略图转换为PNG后按内容哈希存放（blobs/），缩略图URL到内容哈希的映射存放在 refs/；
+总大小超过上限时按最近访问时间淘汰，重复下载只需要读一次磁盘
+"""
+
+import io
+import os
+import hashlib
+import logging
+import tempfile
+import zipfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+from config import Config
+
+
+class _ZipStream(io.RawIOBase):
+    """只写、不可seek的缓冲区，zipfile写入后由生成器取走数据"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = os.path.abspath(cache_dir or Config.THUMBNAIL_CACHE_DIR)
+        self.max_bytes = max_bytes or Config.THUMBNAIL_CACHE_MAX_MB * 1024 * 1024
+        self.blob_dir = os.path.join(self.cache_dir, 'blobs')
+        self.ref_dir = os.path.join(self.cache_dir, 'refs')
+        self.logger = logging.getLogger(__name__)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Config.THUMBNAIL_PREFETCH_WORKERS + 4)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._total_bytes = None  # 首次写入时扫描目录得到
+        self._executor = None
+
+    @staticmethod
+    def _url_key(url: str) -> str:
+        """缩略图URL的哈希，作为refs中的文件名"""
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def filename_for(video: Dict) -> str:
+        """缩略图下载文件名：标题前50个字符 + 视频ID"""
+        filename = f"{(video.get('title') or video['video_id'])[:50]}_{video['video_id']}.png"
+        return "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).strip()
+
+    def _ref_path(self, url_key: str) -> str:
+        return os.path.join(self.ref_dir, url_key[:2], url_key)
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.blob_dir, content_hash[:2], f"{content_hash}.png")
+
+    def lookup(self, url: str) -> Optional[Tuple[str, str]]:
+        """查询缓存，命中返回 (PNG文件路径, 内容哈希)，并刷新访问时间"""
+        try:
+            with open(self._ref_path(self._url_key(url)), 'r') as f:
+                content_hash = f.read().strip()
+
+            path = self._blob_path(content_hash)
+            os.utime(path)  # 记录访问时间，用于LRU淘汰
+            return path, content_hash
+
+        except (FileNotFoundError, ValueError):
+            # 没有缓存，或者blob已被淘汰
+            return None
+
+    def get(self, url: str) -> Optional[Tuple[str, str]]:
+        """获取缩略图PNG，未缓存时下载并转换，返回 (文件路径, 内容哈希)，失败返回None"""
+        cached = self.lookup(url)
+        if cached:
+            return cached
+
+        # 同一URL只下载一次，其他线程等待结果
+        url_key = self._url_key(url)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(url_key, threading.Lock())
+
+        with key_lock:
+            try:
+                cached = self.lookup(url)
+                if cached:
+                    return cached
+
+                response = self.session.get(url, timeout=10)
+                if response.status_code != 200:
+                    self.logger.warning(f"下载缩略图失败: {url} ({response.status_code})")
+                    return None
+
+                return self._store(url_key, self._to_png(response.content))
+
+            except Exception as e:
+                self.logger.error(f"缓存缩略图失败: {e}")
+                return None
+
+            finally:
+                with self._lock:
+                    self._key_locks.pop(url_key, None)
+
+    @staticmethod
+    def _to_png(content: bytes) -> bytes:
+        """把图片转换为RGB模式的PNG"""
+        image = Image.open(io.BytesIO(content))
+
+        # 转换为RGB模式
+        if image.mode in ('RGBA', 'LA', 'P'):
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            if image.mode == 'P':
+                image = image.convert('RGBA')
+            background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        output = io.BytesIO()
+        image.save(output, 'PNG')
+        return output.getvalue()
+
+    def _store(self, url_key: str, png: bytes) -> Tuple[str, str]:
+        """按内容哈希写入PNG并记录URL映射（先写临时文件再改名，多进程并发写入也安全）"""
+        content_hash = hashlib.sha256(png).hexdigest()
+        path = self._blob_path(content_hash)
+
+        if not os.path.exists(path):
+            self._write_atomic(path, png)
+            self._add_bytes(len(png))
+        self._write_atomic(self._ref_path(url_key), content_hash.encode('ascii'))
+
+        return path, content_hash
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        """写入临时文件后原子改名"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def _scan_blobs(self) -> List[Tuple[float, int, str]]:
+        """列出所有blob的 (访问时间, 大小, 路径)"""
+        blobs = []
+        for root, _, files in os.walk(self.blob_dir):
+            for name in files:
+                if name.endswith('.png'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                        blobs.append((stat.st_mtime, stat.st_size, path))
+                    except FileNotFoundError:
+                        continue
+        return blobs
+
+    def _add_bytes(self, size: int):
+        """累计缓存大小，超过上限时淘汰"""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(blob[1] for blob in self._scan_blobs())
+            else:
+                self._total_bytes += size
+            over_limit = self._total_bytes > self.max_bytes
+
+        if over_limit:
+            self._evict()
+
+    def _evict(self):
+        """按最近访问时间从旧到新删除blob，直到总大小降到上限的90%"""
+        with self._lock:
+            blobs = sorted(self._scan_blobs())
+            total = sum(blob[1] for blob in blobs)
+            target = self.max_bytes * 0.9
+            removed = 0
+
+            for _, size, path in blobs:
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                    removed += 1
+                except FileNotFoundError:
+                    continue
+
+            # 被淘汰blob的refs在下次查询时视为未命中，这里不逐个清理
+            self._total_bytes = total
+
+        self.logger.info(f"缩略图缓存淘汰 {removed} 个文件，当前 {total / 1024 / 1024:.1f} MB")
+
+    def prefetch(self, videos: List[Dict]):
+        """后台预先下载并转换新视频的缩略图（THUMBNAIL_PREFETCH开启时调用）"""
+        urls = [video['thumbnail_url'] for video in videos if video.get('thumbnail_url')]
+        if not urls:
+            return
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=Config.THUMBNAIL_PREFETCH_WORKERS,
+                                                    thread_name_prefix='thumbnail')
+        for url in urls:
+            self._executor.submit(self.get, url)
+
+    def stream_zip(self, videos: Iterable[Dict], workers: int = None) -> Iterator[bytes]:
+        """边下载边生成ZIP：最多 workers 个缩略图同时下载转换，每写完一个文件就输出一段数据，
+        内存占用与视频数量无关；下载失败的视频记录在 missing.txt 中"""
+        workers = workers or Config.THUMBNAIL_EXPORT_WORKERS
+        stream = _ZipStream()
+        missing = []
+        used_names = set()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail-zip') as executor:
+            # PNG已经是压缩格式，直接存储
+            with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+                pending = deque()
+                video_iter = iter(videos)
+
+                def submit_next() -> bool:
+                    for video in video_iter:
+                        if video.get('thumbnail_url'):
+                            pending.append((video, executor.submit(self.get, video['thumbnail_url'])))
+                            return True
+                        missing.append(video['video_id'])
+                    return False
+
+                # 只保留固定数量的进行中任务，按视频顺序写入
+                for _ in range(workers * 2):
+                    if not submit_next():
+                        break
+
+                while pending:
+                    video, future = pending.popleft()
+                    submit_next()
+
+                    name = self.filename_for(video)
+                    if name in used_names:
+                        name = f"{video['video_id']}.png"
+
+                    if not self._write_to_zip(archive, video, future.result(), name):
+                        missing.append(video['video_id'])
+                        continue
+                    used_names.add(name)
+                    yield stream.take()
+
+                if missing:
+                    archive.writestr('missing.txt', '\n'.join(missing) + '\n')
+
+            # 关闭时写入中央目录
+            yield stream.take()
+
+    def _write_to_zip(self, archive: zipfile.ZipFile, video: Dict, cached: Optional[Tuple[str, str]],
+                      name: str) -> bool:
+        """把缓存的PNG写入ZIP；下载完成后blob已被淘汰时重新获取一次，仍然失败返回False"""
+        for attempt in range(2):
+            if attempt:
+                self.logger.warning(f"缩略图在导出前被淘汰，重新获取: {video['video_id']}")
+                cached = self.get(video['thumbnail_url'])
+            if not cached:
+                return False
+            try:
+                archive.write(cached[0], arcname=name)
+                return True
+            except FileNotFoundError:
+                continue
+        return False
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+新视频通知
+跟踪videos集合新插入的视频：MongoDB副本集上使用变更流，不支持时（单机MongoDB、SQLite）按 discovered_at 高水位轮询；
+新视频攒成批后推送到各个输出（webhook、本地JSONL文件、stdout JSONL）。
+每批推送完成后把断点（变更流resume token和高水位）保存到config中，重启后从断点继续，不会重新扫描整个集合；
+推送失败的批次会重试直到成功（至少一次送达，重启前后可能重复推送最后一批）
+"""
+
+import sys
+import json
+import time
+import signal
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+import requests
+
+from config import Config
+from storage import create_storage
+
+logger = logging.getLogger(__name__)
+
+# 推送的视频字段
+PAYLOAD_FIELDS = ('video_id', 'channel_id', 'channel_name', 'title', 'video_url', 'thumbnail_url',
+                  'published_at', 'discovered_at')
+
+
+def video_payload(video: Dict) -> Dict:
+    """视频文档转换为推送内容（时间转为ISO格式字符串）"""
+    payload = {}
+    for field in PAYLOAD_FIELDS:
+        value = video.get(field)
+        payload[field] = value.isoformat() if isinstance(value, datetime) else value
+    return payload
+
+
+# ===== 输出 =====
+class NotificationSink(ABC):
+    """通知输出：send 失败时抛出异常，这批视频稍后重新推送到该输出"""
+    name = 'sink'
+
+    @abstractmethod
+    def send(self, videos: List[Dict]):
+        """推送一批视频（已转换为推送内容）"""
+
+    def close(self):
+        """释放输出占用的资源"""
+
+
+class StdoutSink(NotificationSink):
+    """每个视频一行JSON输出到stdout（日志写到stderr，不会混在一起）"""
+    name = 'stdout'
+
+    def send(self, videos: List[Dict]):
+        for video in videos:
+            sys.stdout.write(json.dumps(video, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
+
+class FileSink(NotificationSink):
+    """每个视频一行JSON追加写入本地文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = f'file:{path}'
+
+    def send(self, videos: List[Dict]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(video, ensure_ascii=False) + '\n' for video in videos)
+
+
+class WebhookSink(NotificationSink):
+    """每批一次POST，请求体为 {"count": N, "videos": [...]}，非2xx响应视为失败"""
+
+    def __init__(self, url: str, timeout: float = None):
+        self.url = url
+        self.timeout = timeout or Config.NOTIFY_WEBHOOK_TIMEOUT
+        self.name = f'webhook:{urlparse(url).netloc}'
+        self.session = requests.Session()
+
+    def send(self, videos: List[Dict]):
+        response = self.session.post(self.url, json={'count': len(videos), 'videos': videos}, timeout=self.timeout)
+        response.raise_for_status()
+
+    def close(self):
+        self.session.close()
+
+
+# ===== 通知 =====
+class VideoNotifier:
+    def __init__(self, db, sinks: List[NotificationSink], name: str = 'default', use_change_stream: bool = True):
+        self.db = db  # 存储后端（StorageBackend）
+        self.sinks = sinks
+        self.checkpoint_key = f'notifier_checkpoint:{name}'
+        self.use_change_stream = use_change_stream
+        self.batch_size = Config.NOTIFY_BATCH_SIZE
+        self.running = True
+        self.checkpoint = self._load_checkpoint()
+
+    def stop(self):
+        self.running = False
+
+    # ===== 断点 =====
+    def _load_checkpoint(self) -> Dict:
+        """读取断点；第一次运行时从当前时间开始，不推送已有的视频"""
+        raw = self.db.get_config(self.checkpoint_key)
+        if raw:
+            checkpoint = json.loads(raw)
+            return {
+                'resume_token': checkpoint.get('resume_token'),
+                'watermark': (datetime.fromisoformat(checkpoint['discovered_at']), checkpoint['video_id'])
+            }
+        # MongoDB时间精度为毫秒，高水位要与数据库中的时间精度一致，否则同一毫秒内的视频会被反复读取
+        now = datetime.now()
+        return {'resume_token': None, 'watermark': (now.replace(microsecond=now.microsecond // 1000 * 1000), '')}
+
+    def _save_checkpoint(self):
+        discovered_at, video_id = self.checkpoint['watermark']
+        self.db.set_config(self.checkpoint_key, json.dumps({
+            'resume_token': self.checkpoint['resume_token'],
+            'discovered_at': discovered_at.isoformat(),
+            'video_id': video_id
+        }), '新视频通知的断点')
+
+    def reset_checkpoint(self):
+        """丢弃断点，从当前时间开始"""
+        self.db.set_config(self.checkpoint_key, '', '新视频通知的断点')
+        self.checkpoint = self._load_checkpoint()
+
+    # ===== 主循环 =====
+    def run(self):
+        """持续推送新视频，直到 stop()；出错后稍等从内存中的断点继续"""
+        while self.running:
+            try:
+                stream = self.db.watch_new_videos(self.checkpoint['resume_token']) if self.use_change_stream else None
+                if stream is None:
+                    logger.info("按 discovered_at 高水位轮询新视频")
+                    self._poll()
+                else:
+                    logger.info("使用变更流接收新视频")
+                    try:
+                        self._follow(stream)
+                    finally:
+                        stream.close()
+
+            except Exception as e:
+                logger.error(f"新视频通知出错，5秒后重试: {e}")
+                self._sleep(5)
+
+        for sink in self.sinks:
+            sink.close()
+
+    def _poll(self):
+        """高水位轮询：只读取 NOTIFY_POLL_LAG 秒之前发现的视频，避免跳过其他进程尚未提交的写入"""
+        while self.running:
+            until = datetime.now() - timedelta(seconds=Config.NOTIFY_POLL_LAG)
+            videos = self.db.get_videos_discovered_after(self.checkpoint['watermark'], until, self.batch_size)
+            if videos and self._deliver(videos) and len(videos) == self.batch_size:
+                continue  # 还有积压，立即读取下一批
+            self._sleep(Config.NOTIFY_POLL_SECONDS)
+
+    def _follow(self, stream):
+        """变更流：收到视频后最多等待 NOTIFY_BATCH_SECONDS 或凑满一批再推送"""
+        # 变更流打开之后，补推高水位之后已经写入的视频（断点失效、从轮询切换过来时变更流不包含这些视频）
+        caught_up = self._catch_up()
+
+        batch = []
+        deadline = None
+        while self.running and stream.alive:
+            change = stream.try_next()
+            if change is not None and change['fullDocument']['video_id'] not in caught_up:
+                batch.append(change['fullDocument'])
+                deadline = deadline or time.monotonic() + Config.NOTIFY_BATCH_SECONDS
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                # 此时的resume_token正好在已读取的事件之后，批次送达后才保存
+                self._deliver(batch, stream.resume_token)
+                batch, deadline = [], None
+
+        if batch:
+            self._deliver(batch, stream.resume_token)
+
+    def _catch_up(self) -> Set[str]:
+        """按高水位推送断点之后的所有视频，返回推送过的视频ID（变更流中再次出现时跳过）"""
+        delivered = set()
+        while self.running:
+            videos = self.db.get_videos_discovered_after(self.checkpoint['watermark'], limit=self.batch_size)
+            if not videos or not self._deliver(videos):
+                break
+            delivered.update(video['video_id'] for video in videos)
+            if len(videos) < self.batch_size:
+                break
+
+        if delivered:
+            logger.info(f"补推断点之后的视频: {len(delivered)} 个")
+        return delivered
+
+    def _deliver(self, videos: List[Dict], resume_token: Optional[Dict] = None) -> bool:
+        """推送一批视频，失败的输出按指数退避重试；全部送达后推进并保存断点，停止时未送达返回False"""
+        payload = [video_payload(video) for video in videos]
+        pending = list(self.sinks)
+        delay = 1
+        while True:
+            failed = []
+            for sink in pending:
+                try:
+                    sink.send(payload)
+                except Exception as e:
+                    logger.error(f"{sink.name} 推送失败: {e}")
+                    failed.append(sink)
+
+            pending = failed
+            if not pending:
+                break
+            if not self.running:
+                return False
+            self._sleep(delay)
+            delay = min(delay * 2, Config.NOTIFY_RETRY_MAX)
+
+        latest = max((video['discovered_at'], video['video_id']) for video in videos)
+        self.checkpoint = {
+            'resume_token': resume_token or self.checkpoint['resume_token'],
+            'watermark': max(self.checkpoint['watermark'], latest)
+        }
+        self._save_checkpoint()
+        logger.info(f"推送 {len(videos)} 个新视频")
+        return True
+
+    def _sleep(self, seconds: float):
+        """可被 stop() 打断的等待"""
+        end = time.monotonic() + seconds
+        while self.running and time.monotonic() < end:
+            time.sleep(min(0.5, end - time.monotonic()))
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='新视频通知：把新发现的视频推送到webhook、本地文件或stdout')
+    parser.add_argument('--webhook', action='append', default=[], help='把新视频POST到该URL（可重复指定）')
+    parser.add_argument('--file', action='append', default=[], help='把新视频追加写入该JSONL文件（可重复指定）')
+    parser.add_argument('--stdout', action='store_true', help='把新视频以JSONL格式输出到stdout')
+    parser.add_argument('--name', default='default', help='通知名称，每个名称单独保存断点 (默认: default)')
+    parser.add_argument('--poll', action='store_true', help='不使用变更流，始终按高水位轮询')
+    parser.add_argument('--reset', action='store_true', help='丢弃已保存的断点，从当前时间开始')
+
+    args = parser.parse_args()
+
+    webhooks = args.webhook or ([Config.NOTIFY_WEBHOOK_URL] if Config.NOTIFY_WEBHOOK_URL else [])
+    sinks = [WebhookSink(url) for url in webhooks] + [FileSink(path) for path in args.file]
+    if args.stdout:
+        sinks.append(StdoutSink())
+    if not sinks:
+        parser.error('至少需要一个输出: --webhook / --file / --stdout（或设置 NOTIFY_WEBHOOK_URL）')
+
+    # 日志写到文件和stderr，stdout只输出通知内容
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('video_notifier.log', encoding='utf-8'),
+            logging.StreamHandler(sys.stderr)
+        ]
+    )
+
+    notifier = VideoNotifier(create_storage(), sinks, name=args.name, use_change_stream=not args.poll)
+    if args.reset:
+        notifier.reset_checkpoint()
+
+    def signal_handler(signum, frame):
+        logger.info(f"收到退出信号 {signum}，推送完当前批次后停止")
+        notifier.stop()
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    logger.info(f"新视频通知启动: {', '.join(sink.name for sink in sinks)}")
+    notifier.run()
+    logger.info("新视频通知已停止")
+
+
+if __name__ == '__main__':
+    main()
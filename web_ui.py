@@ -4,40 +4,145 @@
 YouTube RSS监控系统 - 网页版UI界面
 """
 
-from flask import Flask, render_template, request, jsonify, Response
+from flask import Flask, Blueprint, current_app, render_template, request, jsonify, Response, send_file, stream_with_context
+from werkzeug.local import LocalProxy
 from flask_cors import CORS
 import json
+import queue
 import logging
 import threading
 import time
-import requests
-import io
+import functools
+from urllib.parse import urlencode
 from datetime import datetime, timedelta
-from main_rss import YouTubeMonitorRSS
+from main_rss import YouTubeMonitorRSS, parse_channel_list
 from auto_monitor import AutoMonitor
-from PIL import Image
+from response_cache import ResponseCache
+from job_queue import JobQueue
+from event_bus import EventBus
+from config import Config
+import metrics
 import os
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
+bp = Blueprint('web_ui', __name__)
 
-# 全局变量
-monitor = YouTubeMonitorRSS()
+# 全局变量（每个进程各自一份）
 auto_monitor_process = None
 monitoring_status = {"running": False, "start_time": None}
 
-@app.route('/')
+# 读接口响应缓存，数据库写入时按标签失效
+response_cache = ResponseCache()
+
+_monitor = None
+_job_queue = None
+_event_bus = None
+_monitor_pid = None
+_monitor_lock = threading.Lock()
+
+def get_monitor() -> YouTubeMonitorRSS:
+    """获取当前进程的监控实例，首次使用时才连接数据库；
+    fork出的worker进程会重新创建，不共用父进程的数据库连接"""
+    global _monitor, _job_queue, _event_bus, _monitor_pid
+    if _monitor is None or _monitor_pid != os.getpid():
+        with _monitor_lock:
+            if _monitor is None or _monitor_pid != os.getpid():
+                new_monitor = YouTubeMonitorRSS()
+                response_cache.clear()
+                new_monitor.db.add_write_listener(response_cache.invalidate)
+                _job_queue = JobQueue(new_monitor)
+                _event_bus = EventBus(new_monitor.db, response_cache.invalidate)
+                _monitor, _monitor_pid = new_monitor, os.getpid()
+    return _monitor
+
+def get_job_queue() -> JobQueue:
+    """获取当前进程的后台任务队列（与监控实例一起创建）"""
+    get_monitor()
+    return _job_queue
+
+def get_event_bus() -> EventBus:
+    """获取当前进程的实时事件分发器（与监控实例一起创建）"""
+    get_monitor()
+    return _event_bus
+
+monitor = LocalProxy(get_monitor)
+
+def create_app() -> Flask:
+    """创建Flask应用（不连接数据库，监控实例在每个进程第一次处理请求时创建）"""
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(bp)
+    return app
+
+def cached_json(*tags):
+    """缓存GET接口的成功JSON响应，支持ETag/304；标签中的 {channel_id} 等按路由参数填充"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            key = request.path + '?' + urlencode(sorted(request.args.items(multi=True)))
+            entry = response_cache.get(key)
+            cache_status = 'HIT'
+            
+            if entry is None:
+                cache_status = 'MISS'
+                generation = response_cache.generation
+                result = current_app.make_response(view(**kwargs))
+                data = result.get_json(silent=True)
+                if result.status_code != 200 or not data or not data.get('success'):
+                    return result
+                entry = response_cache.set(
+                    key, result.get_data(), [tag.format(**kwargs) for tag in tags], generation
+                )
+            
+            response = Response(entry['body'], mimetype='application/json')
+            response.set_etag(entry['etag'])
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Cache'] = cache_status
+            response.make_conditional(request)
+            if response.status_code == 304:
+                response_cache.record_not_modified()
+            return response
+        return wrapper
+    return decorator
+
+def format_job(job):
+    """把任务中的时间字段格式化为字符串"""
+    for field in ('created_at', 'updated_at', 'started_at', 'finished_at'):
+        if job.get(field):
+            job[field] = job[field].strftime('%Y-%m-%d %H:%M:%S')
+    return job
+
+def submit_check_job(channel_id=None):
+    """提交检查更新任务并返回接口响应"""
+    job, created = get_job_queue().submit_check(channel_id)
+    if job is None:
+        return jsonify({"success": False, "error": "创建后台任务失败"})
+    
+    return jsonify({
+        "success": True,
+        "job_id": job['job_id'],
+        "status": job['status'],
+        "deduplicated": not created,
+        "message": "已开始在后台检查更新" if created else "已有相同的检查任务在进行中"
+    })
+
+def get_page_limit():
+    """读取分页大小参数，限制在 1 ~ VIDEO_PAGE_SIZE_MAX 之间"""
+    limit = request.args.get('limit', Config.VIDEO_PAGE_SIZE, type=int)
+    return max(1, min(limit, Config.VIDEO_PAGE_SIZE_MAX))
+
+@bp.route('/')
 def index():
     """主页"""
     return render_template('index.html')
 
 
 
-@app.route('/api/channels', methods=['GET'])
+@bp.route('/api/channels', methods=['GET'])
+@cached_json('channels')
 def get_channels():
     """获取频道列表"""
     try:
@@ -46,7 +151,7 @@ def get_channels():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/api/channels', methods=['POST'])
+@bp.route('/api/channels', methods=['POST'])
 def add_channel():
     """添加频道"""
     try:
@@ -66,7 +171,31 @@ def add_channel():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/api/channels/direct', methods=['POST'])
+@bp.route('/api/channels/bulk', methods=['POST'])
+def add_channels_bulk():
+    """批量导入频道（JSON数组、{"urls": [...]} 或上传的频道列表文件）"""
+    try:
+        if 'file' in request.files:
+            urls = parse_channel_list(request.files['file'].read().decode('utf-8'))
+        else:
+            data = request.get_json(silent=True)
+            urls = data.get('urls', []) if isinstance(data, dict) else data
+        
+        if not urls or not isinstance(urls, list):
+            return jsonify({"success": False, "error": "频道列表不能为空"})
+        
+        summary = monitor.import_channels([str(url) for url in urls])
+        
+        return jsonify({
+            "success": True,
+            "message": f"导入完成：成功 {summary['added']} 个，重复 {summary['duplicates']} 个，失败 {summary['failed']} 个",
+            **summary
+        })
+        
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+@bp.route('/api/channels/direct', methods=['POST'])
 def add_channel_direct():
     """直接添加频道（绕过YouTube连接问题）"""
     try:
@@ -95,7 +224,7 @@ def add_channel_direct():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/api/channels/<channel_id>', methods=['DELETE'])
+@bp.route('/api/channels/<channel_id>', methods=['DELETE'])
 def remove_channel(channel_id):
     """删除频道及其所有视频"""
     try:
@@ -110,42 +239,38 @@ def remove_channel(channel_id):
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/api/check-updates', methods=['POST'])
+@bp.route('/api/check-updates', methods=['POST'])
 def check_updates():
-    """手动检查更新"""
+    """手动检查更新（提交后台任务，立即返回任务ID）"""
     try:
-        data = request.get_json() or {}
-        channel_id = data.get('channel_id')
-        
-        result = monitor.check_channel_updates(channel_id)
-        
-        return jsonify({
-            "success": True,
-            "total_channels": result['total_channels'],
-            "total_new_videos": result['total_new_videos'],
-            "message": f"检查完成，发现 {result['total_new_videos']} 个新视频"
-        })
+        data = request.get_json(silent=True) or {}
+        return submit_check_job(data.get('channel_id'))
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/api/videos/recent', methods=['GET'])
+@bp.route('/api/videos/recent', methods=['GET'])
+@cached_json('videos', 'channels')
 def get_recent_videos():
-    """获取最近视频"""
+    """获取最近视频（按发现时间倒序，游标分页）"""
     try:
         days = request.args.get('days', 7, type=int)
-        videos = monitor.db.get_recent_videos(days)
+        page = monitor.db.get_recent_videos_page(days, get_page_limit(), request.args.get('cursor'))
+        videos = page['videos']
         
         for video in videos:
             video['published_at'] = video['published_at'].strftime('%Y-%m-%d %H:%M:%S')
             video['discovered_at'] = video['discovered_at'].strftime('%Y-%m-%d %H:%M:%S')
         
-        return jsonify({"success": True, "videos": videos})
+        return jsonify({"success": True, "videos": videos, "next_cursor": page['next_cursor']})
         
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/api/stats', methods=['GET'])
+@bp.route('/api/stats', methods=['GET'])
+@cached_json('channels', 'videos', 'logs')
 def get_stats():
     """获取统计信息"""
     try:
@@ -168,38 +293,65 @@ def get_stats():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/api/channels/<channel_id>/videos', methods=['GET'])
+@bp.route('/api/channels/<channel_id>/videos', methods=['GET'])
+@cached_json('channel:{channel_id}')
 def get_channel_videos(channel_id):
-    """获取指定频道的所有视频"""
+    """获取指定频道的视频（按发布时间倒序，游标分页）"""
     try:
-        videos = monitor.db.get_channel_videos(channel_id)
+        cursor = request.args.get('cursor')
+        page = monitor.db.get_channel_videos_page(channel_id, get_page_limit(), cursor)
+        videos = page['videos']
         
         for video in videos:
             video['published_at'] = video['published_at'].strftime('%Y-%m-%d %H:%M:%S')
             video['discovered_at'] = video['discovered_at'].strftime('%Y-%m-%d %H:%M:%S')
         
-        return jsonify({"success": True, "videos": videos})
+        result = {"success": True, "videos": videos, "next_cursor": page['next_cursor']}
+        if not cursor:
+            # 第一页附带视频总数
+            result["total_videos"] = monitor.db.get_channel_video_count(channel_id)
         
+        return jsonify(result)
+        
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/api/channels/<channel_id>/update', methods=['POST'])
+@bp.route('/api/channels/<channel_id>/update', methods=['POST'])
 def update_single_channel(channel_id):
-    """更新单个频道"""
+    """更新单个频道（提交后台任务，立即返回任务ID）"""
     try:
-        result = monitor.check_channel_updates(channel_id)
+        return submit_check_job(channel_id)
         
-        return jsonify({
-            "success": True,
-            "total_channels": result['total_channels'],
-            "total_new_videos": result['total_new_videos'],
-            "message": f"频道更新完成，发现 {result['total_new_videos']} 个新视频"
-        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+@bp.route('/api/jobs', methods=['GET'])
+def get_jobs():
+    """获取最近的后台任务"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        jobs = [format_job(job) for job in monitor.db.get_recent_jobs(limit)]
+        return jsonify({"success": True, "jobs": jobs})
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/api/videos/mark-old', methods=['POST'])
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询后台任务的状态和进度"""
+    try:
+        job = get_job_queue().get_job(job_id)
+        if not job:
+            return jsonify({"success": False, "error": "任务不存在"}), 404
+        
+        return jsonify({"success": True, "job": format_job(job)})
+        
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+@bp.route('/api/videos/mark-old', methods=['POST'])
 def mark_videos_as_old():
     """将视频标记为旧视频"""
     try:
@@ -222,72 +374,128 @@ def mark_videos_as_old():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/channel/<channel_id>')
+@bp.route('/api/events')
+def stream_events():
+    """实时事件流（SSE）：新视频、频道检查结果、检查完成、自动监控状态变化"""
+    bus = get_event_bus()
+    subscriber = bus.subscribe()
+    
+    def generate():
+        try:
+            # 断线后浏览器5秒后自动重连
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = subscriber.get(timeout=Config.SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                
+                if event is None:
+                    # 积压过多被断开，客户端重连后重新加载数据
+                    break
+                
+                data = json.dumps(event['data'], ensure_ascii=False, default=str)
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+        finally:
+            bus.unsubscribe(subscriber)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # 禁止反向代理缓冲
+    })
+
+@bp.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """获取响应缓存的命中统计"""
+    return jsonify({"success": True, "cache": response_cache.get_stats()})
+
+@bp.route('/metrics')
+def get_metrics():
+    """Prometheus格式的性能指标：数据库中所有进程累加的耗时直方图，以及最近一次检查周期的汇总"""
+    db = monitor.db
+    # 先把本进程尚未累加的增量（如网页上添加频道时的解析耗时）写入数据库
+    metrics.REGISTRY.flush(db.add_metric_series)
+    lines = metrics.REGISTRY.render(db.get_metric_series()) + metrics.render_last_cycle(db.get_last_cycle_log())
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+@bp.route('/channel/<channel_id>')
 def channel_detail(channel_id):
     """频道详情页面"""
     return render_template('channel_detail.html', channel_id=channel_id)
 
-@app.route('/api/download-thumbnail/<video_id>')
+@bp.route('/api/download-thumbnail/<video_id>')
 def download_thumbnail(video_id):
-    """下载视频缩略图并转换为PNG格式"""
+    """下载视频缩略图（PNG格式，经磁盘缓存，支持ETag和Range）"""
     try:
-        print(f"收到下载请求: {video_id}")
-        
         # 从数据库获取视频信息
-        video = monitor.db.db.videos.find_one({'video_id': video_id})
+        video = monitor.db.get_video(video_id)
         if not video:
-            print(f"视频不存在: {video_id}")
             return jsonify({"success": False, "error": "视频不存在"}), 404
         
         thumbnail_url = video.get('thumbnail_url')
         if not thumbnail_url:
             return jsonify({"success": False, "error": "缩略图URL不存在"}), 404
         
-        print(f"缩略图URL: {thumbnail_url}")
-        
-        # 下载图片
-        response = requests.get(thumbnail_url, timeout=10)
-        if response.status_code != 200:
+        # 命中缓存时只读一次磁盘，未命中时下载并转换为PNG后写入缓存
+        cached = monitor.thumbnail_cache.get(thumbnail_url)
+        if not cached:
             return jsonify({"success": False, "error": "下载图片失败"}), 400
+        path, content_hash = cached
         
-        # 使用PIL转换为PNG格式
-        image = Image.open(io.BytesIO(response.content))
-        
-        # 转换为RGB模式
-        if image.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-            image = background
-        elif image.mode != 'RGB':
-            image = image.convert('RGB')
+        return send_file(
+            path,
+            mimetype='image/png',
+            as_attachment=True,
+            download_name=monitor.thumbnail_cache.filename_for(video),
+            etag=content_hash,
+            conditional=True,
+            max_age=86400
+        )
         
-        # 保存为PNG格式到内存
-        img_io = io.BytesIO()
-        image.save(img_io, 'PNG', quality=95)
-        img_io.seek(0)
+    except Exception as e:
+        logger.error(f"下载缩略图失败: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/api/channels/<channel_id>/thumbnails.zip')
+def download_channel_thumbnails(channel_id):
+    """打包下载频道所有视频的缩略图（边下载边输出ZIP），可选 is_new=true/false、since/until=YYYY-MM-DD 过滤"""
+    try:
+        channel = monitor.db.get_channel(channel_id)
+        if not channel:
+            return jsonify({"success": False, "error": "频道不存在"}), 404
         
-        # 生成文件名
-        filename = f"{video.get('title', video_id)[:50]}_{video_id}.png"
-        filename = "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).strip()
+        is_new = request.args.get('is_new')
+        if is_new not in (None, 'true', 'false'):
+            return jsonify({"success": False, "error": "is_new 只能是 true 或 false"}), 400
         
-        print(f"生成文件: {filename}")
+        try:
+            since = request.args.get('since')
+            since = datetime.strptime(since, '%Y-%m-%d') if since else None
+            until = request.args.get('until')
+            # until 当天也包含在内
+            until = datetime.strptime(until, '%Y-%m-%d') + timedelta(days=1) if until else None
+        except ValueError:
+            return jsonify({"success": False, "error": "日期格式应为 YYYY-MM-DD"}), 400
+        
+        videos = monitor.db.iter_channel_videos(
+            channel_id,
+            is_new=None if is_new is None else is_new == 'true',
+            since=since,
+            until=until
+        )
         
         return Response(
-            img_io.getvalue(),
-            mimetype='image/png',
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Content-Type': 'image/png'
-            }
+            stream_with_context(monitor.thumbnail_cache.stream_zip(videos)),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename="{channel_id}_thumbnails.zip"'}
         )
         
     except Exception as e:
-        print(f"错误: {e}")
+        logger.error(f"打包下载缩略图失败: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/auto-monitor/status', methods=['GET'])
+@bp.route('/api/auto-monitor/status', methods=['GET'])
 def get_auto_monitor_status():
     """获取自动监控状态"""
     try:
@@ -300,7 +508,7 @@ def get_auto_monitor_status():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/api/auto-monitor/start', methods=['POST'])
+@bp.route('/api/auto-monitor/start', methods=['POST'])
 def start_auto_monitor():
     """启动自动监控"""
     try:
@@ -319,6 +527,7 @@ def start_auto_monitor():
         
         monitoring_status["running"] = True
         monitoring_status["start_time"] = datetime.now()
+        monitor.db.add_events([{'type': 'monitor_status', 'data': {'running': True}}])
         
         return jsonify({
             "success": True,
@@ -327,7 +536,7 @@ def start_auto_monitor():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/api/auto-monitor/stop', methods=['POST'])
+@bp.route('/api/auto-monitor/stop', methods=['POST'])
 def stop_auto_monitor():
     """停止自动监控"""
     try:
@@ -342,6 +551,7 @@ def stop_auto_monitor():
         
         monitoring_status["running"] = False
         monitoring_status["start_time"] = None
+        monitor.db.add_events([{'type': 'monitor_status', 'data': {'running': False}}])
         
         return jsonify({
             "success": True,
@@ -350,7 +560,7 @@ def stop_auto_monitor():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/api/channels/smart', methods=['POST'])
+@bp.route('/api/channels/smart', methods=['POST'])
 def add_channel_smart():
     """智能添加频道（处理各种URL格式）"""
     try:
@@ -471,7 +681,7 @@ def extract_channel_info_from_url(url):
         print(f"提取频道信息失败: {e}")
         return None
 
-@app.route('/api/videos/<video_id>', methods=['DELETE'])
+@bp.route('/api/videos/<video_id>', methods=['DELETE'])
 def delete_video(video_id):
     """删除单个视频"""
     try:
@@ -486,9 +696,12 @@ def delete_video(video_id):
         return jsonify({"success": False, "error": str(e)})
 
 
+# 兼容 `python web_ui.py` 和 `gunicorn web_ui:app`
+app = create_app()
+
 if __name__ == '__main__':
     print("🌐 启动YouTube RSS监控系统 Web界面")
-    print("📍 访问地址: http://localhost:8080")
+    print(f"📍 访问地址: http://localhost:{Config.WEB_PORT}")
     print("💡 按 Ctrl+C 停止服务")
     
-    app.run(host='127.0.0.1', port=8080, debug=False, threaded=True) 
\ No newline at end of file
+    app.run(host=Config.WEB_HOST, port=Config.WEB_PORT, debug=False, threaded=True) 
\ No newline at end of file
@@ -7,62 +7,201 @@ YouTube RSS监控系统 - 无需API密钥
 
 import re
 import ssl
+import hashlib
 import requests
-import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
 import logging
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
 import urllib3
-import subprocess
+from config import Config
+from feed_parser import parse_feed, parse_feed_title, parse_datetime
+from resolve_cache import ChannelResolveCache
+from fetch_dispatcher import FetchDispatcher
+from fallback_transport import FallbackTransport
+from metrics import timed
 
 # 禁用SSL警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# 同步和异步客户端共用的请求头
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+# 频道页面中提取频道ID的正则（@handle页面的备用方案查找externalId）
+HANDLE_PAGE_PATTERNS = [r'"channelId":"([^"]+)"', r'externalId":"([^"]+)"']
+CUSTOM_PAGE_PATTERNS = [r'"channelId":"([^"]+)"']
+
+
+def feed_url(channel_id: str) -> str:
+    return f"{Config.YOUTUBE_BASE_URL}/feeds/videos.xml?channel_id={channel_id}"
+
+
+def channel_page_lookup(url: str) -> Optional[Tuple[str, List[str]]]:
+    """@username、/c/、/user/ 格式的频道URL对应的频道页面和提取频道ID的正则，其他格式返回None"""
+    # @username 格式
+    if '/@' in url:
+        username = url.split('/@')[-1].split('/')[0].split('?')[0]
+        return f"{Config.YOUTUBE_BASE_URL}/@{username}", HANDLE_PAGE_PATTERNS
+    
+    # /c/channelname 格式
+    if '/c/' in url:
+        channel_name = url.split('/c/')[-1].split('/')[0].split('?')[0]
+        return f"{Config.YOUTUBE_BASE_URL}/c/{channel_name}", CUSTOM_PAGE_PATTERNS
+    
+    # /user/ 格式（与@username访问同一个页面）
+    if '/user/' in url:
+        username = url.split('/user/')[-1].split('/')[0].split('?')[0]
+        return f"{Config.YOUTUBE_BASE_URL}/@{username}", HANDLE_PAGE_PATTERNS
+    
+    return None
+
+
+def channel_id_from_page(response, patterns: List[str]) -> Tuple[Optional[str], bool]:
+    """从频道页面响应中提取频道ID，返回 (频道ID, 结果是否确定)"""
+    if response is not None and response.status_code == 200:
+        for pattern in patterns:
+            match = re.search(pattern, response.text)
+            if match:
+                return match.group(1), True
+        # 页面正常但找不到频道ID
+        return None, True
+    
+    # 404表示频道不存在，其他情况（网络错误、限流等）结果不确定
+    return None, response is not None and response.status_code == 404
+
+
+def conditional_headers(feed_state: Dict) -> Dict:
+    """根据上次的抓取状态生成条件请求头(ETag/Last-Modified)"""
+    headers = {}
+    if feed_state.get('etag'):
+        headers['If-None-Match'] = feed_state['etag']
+    if feed_state.get('last_modified'):
+        headers['If-Modified-Since'] = feed_state['last_modified']
+    return headers
+
+
+def build_feed_result(feed_state: Dict, response) -> Dict:
+    """根据最终的feed响应生成抓取结果
+    status: modified(有变化) / not_modified(304) / unchanged(内容哈希相同) / failed(获取失败)"""
+    result = {
+        'status': 'failed',
+        'content': None,
+        'etag': feed_state.get('etag'),
+        'last_modified': feed_state.get('last_modified'),
+        'content_hash': feed_state.get('content_hash')
+    }
+    
+    if response is not None and response.status_code == 304:
+        result['status'] = 'not_modified'
+        return result
+    
+    if response is None or response.status_code != 200:
+        return result
+    
+    xml_content = response.content
+    content_hash = hashlib.sha1(xml_content).hexdigest()
+    result['status'] = 'unchanged' if content_hash == feed_state.get('content_hash') else 'modified'
+    result['content'] = xml_content
+    result['content_hash'] = content_hash
+    result['etag'] = response.headers.get('ETag')
+    result['last_modified'] = response.headers.get('Last-Modified')
+    return result
+
+
+def build_channel_info(channel_id: str, title: Optional[str], channel_url: str) -> Dict:
+    return {
+        'channel_id': channel_id,
+        'channel_name': title if title is not None else 'Unknown',
+        'channel_url': channel_url,
+        'rss_url': feed_url(channel_id),
+        'description': f"通过RSS监控的频道",
+        'subscriber_count': None  # RSS中没有订阅者数量
+    }
+
+
+class ServerErrorRetry(Retry):
+    """5xx按次数重试；带Retry-After的503不在连接上重试，直接返回给FetchDispatcher暂停整个主机"""
+    
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if status_code == 503 and has_retry_after:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
 class YouTubeRSSMonitor:
-    def __init__(self):
+    def __init__(self, resolve_cache: ChannelResolveCache = None, dispatcher: FetchDispatcher = None,
+                 fallback: FallbackTransport = None):
         self.logger = logging.getLogger(__name__)
         self.session = self._create_session()
+        # 频道ID解析缓存，为None时每次都访问频道页面
+        self.resolve_cache = resolve_cache
+        # 所有工作线程共享的限流调度器
+        self.dispatcher = dispatcher or FetchDispatcher()
+        # 主连接失败时使用的备用连接（独立连接池，按主机熔断）
+        self.fallback = fallback or FallbackTransport()
     
     def _create_session(self):
         """创建优化的requests session"""
         session = requests.Session()
         
-        # 配置重试策略
-        retry_strategy = Retry(
+        # 配置重试策略（429和带Retry-After的503由FetchDispatcher统一处理，不在每个连接上各自退避）
+        retry_strategy = ServerErrorRetry(
             total=3,
             backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
+            status_forcelist=[500, 502, 503, 504],
+            respect_retry_after_header=False,
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # 连接池大小与并发线程数一致，避免并发检查时连接被丢弃
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=Config.POLL_WORKERS,
+            pool_maxsize=Config.POLL_WORKERS
+        )
         session.mount('http://', adapter)
         session.mount('https://', adapter)
         
         # 设置用户代理和其他headers
-        session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-        })
+        session.headers.update(DEFAULT_HEADERS)
         
         return session
     
-    def _safe_request(self, url: str, timeout: int = 10) -> Optional[requests.Response]:
-        """安全的HTTP请求，处理SSL问题"""
+    def _safe_request(self, url: str, timeout: int = 10, headers: Dict = None) -> Optional[requests.Response]:
+        """安全的HTTP请求，经过限流调度，处理SSL问题"""
+        for attempt in range(Config.RATE_LIMIT_RETRIES + 1):
+            response = self._send_request(url, timeout, headers)
+            
+            # 被限流时调度器会暂停该主机的所有请求，等暂停结束后重试
+            if response is not None and self.dispatcher.observe(url, response) \
+                    and attempt < Config.RATE_LIMIT_RETRIES:
+                continue
+            return response
+    
+    def _send_request(self, url: str, timeout: int, headers: Dict = None) -> Optional[requests.Response]:
+        """发送单次请求"""
         try:
             # 首先尝试正常请求
-            response = self.session.get(url, timeout=timeout)
+            with timed('throttle'):
+                self.dispatcher.acquire(url)
+            with timed('fetch'):
+                response = self.session.get(url, timeout=timeout, headers=headers)
             return response
         except (ssl.SSLError, requests.exceptions.SSLError) as e:
             self.logger.warning(f"SSL错误，尝试不验证SSL证书: {e}")
             try:
                 # 如果SSL失败，尝试不验证证书
-                response = self.session.get(url, timeout=timeout, verify=False)
+                with timed('throttle'):
+                    self.dispatcher.acquire(url)
+                with timed('fetch'):
+                    response = self.session.get(url, timeout=timeout, headers=headers, verify=False)
                 return response
             except Exception as e2:
                 self.logger.error(f"请求完全失败: {e2}")
@@ -71,97 +210,62 @@ class YouTubeRSSMonitor:
             self.logger.error(f"请求失败: {e}")
             return None
     
-    def _curl_request(self, url: str) -> Optional[str]:
-        """使用系统curl命令获取数据（备用方案）"""
-        try:
-            # 使用curl命令，忽略SSL证书验证
-            cmd = ['curl', '-k', '-s', '--max-time', '10', url]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
-            
-            if result.returncode == 0 and result.stdout:
-                return result.stdout
-            else:
-                self.logger.error(f"curl请求失败: {result.stderr}")
-                return None
-                
-        except subprocess.TimeoutExpired:
-            self.logger.error("curl请求超时")
-            return None
-        except Exception as e:
-            self.logger.error(f"curl请求异常: {e}")
+    def _fallback_request(self, url: str, timeout: int = 10, headers: Dict = None) -> Optional[requests.Response]:
+        """经备用连接重试（备用方案），同样经过限流调度；主机熔断时直接返回None"""
+        if not self.fallback.allow(url):
+            self.logger.info(f"备用连接熔断中，跳过: {url}")
             return None
+        
+        with timed('throttle'):
+            self.dispatcher.acquire(url)
+        response = self.fallback.get(url, timeout=timeout, headers=headers)
+        if response is not None:
+            self.dispatcher.observe(url, response)
+        return response
     
     def extract_channel_id(self, url: str) -> Optional[str]:
-        """从各种YouTube URL格式提取频道ID"""
+        """从各种YouTube URL格式提取频道ID（耗时计入resolve阶段，包括访问频道页面）"""
+        with timed('resolve'):
+            return self._extract_channel_id(url)
+    
+    def _extract_channel_id(self, url: str) -> Optional[str]:
         try:
             # 直接的频道ID URL
             if '/channel/' in url:
                 return url.split('/channel/')[-1].split('/')[0].split('?')[0]
             
-            # @username 格式
-            if '/@' in url:
-                username = url.split('/@')[-1].split('/')[0].split('?')[0]
-                return self._get_channel_id_from_username(username)
-            
-            # /c/channelname 格式  
-            if '/c/' in url:
-                channel_name = url.split('/c/')[-1].split('/')[0].split('?')[0]
-                return self._get_channel_id_from_custom_name(channel_name)
+            # 先查解析缓存，命中时不再下载频道页面
+            cache_key = ChannelResolveCache.make_key(url)
+            if self.resolve_cache and cache_key:
+                cached = self.resolve_cache.get(cache_key)
+                if cached is not None:
+                    return cached['channel_id']
             
-            # /user/ 格式
-            if '/user/' in url:
-                username = url.split('/user/')[-1].split('/')[0].split('?')[0]
-                return self._get_channel_id_from_username(username)
+            channel_id, definitive = None, False
             
-            return None
-            
-        except Exception as e:
-            self.logger.error(f"提取频道ID失败: {e}")
-            return None
-    
-    def _get_channel_id_from_username(self, username: str) -> Optional[str]:
-        """通过用户名获取频道ID"""
-        try:
-            # 尝试访问频道主页获取真实的频道ID
-            url = f"https://www.youtube.com/@{username}"
-            response = self._safe_request(url)
+            # 访问频道页面获取真实的频道ID
+            lookup = channel_page_lookup(url)
+            if lookup:
+                channel_id, definitive = self._get_channel_id_from_page(*lookup)
             
-            if response and response.status_code == 200:
-                # 从页面HTML中提取频道ID
-                pattern = r'"channelId":"([^"]+)"'
-                match = re.search(pattern, response.text)
-                if match:
-                    return match.group(1)
-                
-                # 备用方案：查找其他模式
-                pattern = r'externalId":"([^"]+)"'
-                match = re.search(pattern, response.text)
-                if match:
-                    return match.group(1)
+            # 网络错误等不确定的失败不写入否定缓存
+            if self.resolve_cache and cache_key and (channel_id or definitive):
+                self.resolve_cache.set(cache_key, channel_id)
             
-            return None
+            return channel_id
             
         except Exception as e:
-            self.logger.error(f"通过用户名获取频道ID失败: {e}")
+            self.logger.error(f"提取频道ID失败: {e}")
             return None
     
-    def _get_channel_id_from_custom_name(self, custom_name: str) -> Optional[str]:
-        """通过自定义名称获取频道ID"""
+    def _get_channel_id_from_page(self, url: str, patterns: List[str]) -> Tuple[Optional[str], bool]:
+        """从频道页面HTML中提取频道ID，返回 (频道ID, 结果是否确定)"""
         try:
-            url = f"https://www.youtube.com/c/{custom_name}"
-            response = self._safe_request(url)
-            
-            if response and response.status_code == 200:
-                pattern = r'"channelId":"([^"]+)"'
-                match = re.search(pattern, response.text)
-                if match:
-                    return match.group(1)
-            
-            return None
+            return channel_id_from_page(self._safe_request(url), patterns)
             
         except Exception as e:
-            self.logger.error(f"通过自定义名称获取频道ID失败: {e}")
-            return None
+            self.logger.error(f"从频道页面获取频道ID失败: {e}")
+            return None, False
     
     def get_channel_info(self, channel_url: str) -> Optional[Dict]:
         """获取频道信息"""
@@ -171,136 +275,90 @@ class YouTubeRSSMonitor:
                 self.logger.error("无法提取频道ID")
                 return None
             
-            # 获取频道RSS信息
-            rss_url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
-            response = self._safe_request(rss_url)
+            rss_url = feed_url(channel_id)
             
-            if not response or response.status_code != 200:
-                self.logger.error(f"获取RSS失败: {response.status_code if response else 'No response'}")
-                return None
+            # 解析缓存中已有频道名称时不再请求RSS
+            cache_keys = [ChannelResolveCache.make_key(channel_url), f"channel:{channel_id}"]
+            title = None
+            if self.resolve_cache:
+                for cache_key in filter(None, cache_keys):
+                    cached = self.resolve_cache.get(cache_key)
+                    if cached and cached['channel_id'] == channel_id and cached['channel_name']:
+                        title = cached['channel_name']
+                        break
             
-            # 解析RSS XML
-            root = ET.fromstring(response.content)
-            
-            # 提取频道信息
-            ns = {
-                'atom': 'http://www.w3.org/2005/Atom',
-                'yt': 'http://www.youtube.com/xml/schemas/2015',
-                'media': 'http://search.yahoo.com/mrss/'
-            }
-            
-            title = root.find('.//atom:title', ns)
-            author = root.find('.//atom:author/atom:name', ns)
-            
-            channel_info = {
-                'channel_id': channel_id,
-                'channel_name': title.text if title is not None else 'Unknown',
-                'channel_url': channel_url,
-                'rss_url': rss_url,
-                'description': f"通过RSS监控的频道",
-                'subscriber_count': None  # RSS中没有订阅者数量
-            }
+            if title is None:
+                # 获取频道RSS信息
+                response = self._safe_request(rss_url)
+                
+                if not response or response.status_code != 200:
+                    self.logger.error(f"获取RSS失败: {response.status_code if response else 'No response'}")
+                    return None
+                
+                # 只解析到频道标题为止
+                title = parse_feed_title(response.content)
+                
+                if self.resolve_cache and title is not None:
+                    for cache_key in set(filter(None, cache_keys)):
+                        self.resolve_cache.set(cache_key, channel_id, title)
             
-            return channel_info
+            return build_channel_info(channel_id, title, channel_url)
             
         except Exception as e:
             self.logger.error(f"获取频道信息失败: {e}")
             return None
     
+    def fetch_feed(self, channel_id: str, feed_state: Dict = None) -> Dict:
+        """获取频道RSS feed，支持条件请求(ETag/Last-Modified)和内容哈希比较"""
+        # status: modified(有变化) / not_modified(304) / unchanged(内容哈希相同) / failed(获取失败)
+        feed_state = feed_state or {}
+        rss_url = feed_url(channel_id)
+        headers = conditional_headers(feed_state)
+        
+        # 首先使用主连接
+        response = self._safe_request(rss_url, headers=headers or None)
+        
+        if response is not None and response.status_code == 429:
+            # 被限流时不再用备用连接绕过，等下次检查
+            self.logger.error(f"获取RSS被限流: {channel_id}")
+            return build_feed_result(feed_state, None)
+        
+        if response is None or response.status_code >= 500:
+            # 网络错误或服务器错误时经备用连接再试一次（同样带条件请求头）
+            self.logger.info("主连接请求失败，尝试备用连接")
+            response = self._fallback_request(rss_url, headers=headers or None)
+        
+        result = build_feed_result(feed_state, response)
+        if result['status'] == 'failed':
+            self.logger.error(f"获取RSS失败: {response.status_code if response is not None else '主连接和备用连接都失败'}")
+        return result
+    
     def get_latest_videos(self, channel_id: str, max_results: int = 50) -> List[Dict]:
         """获取频道最新视频"""
         try:
-            rss_url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
-            
-            # 首先尝试requests
-            response = self._safe_request(rss_url)
-            xml_content = None
-            
-            if response and response.status_code == 200:
-                xml_content = response.content
-            else:
-                # 如果requests失败，尝试curl
-                self.logger.info("requests失败，尝试使用curl")
-                curl_result = self._curl_request(rss_url)
-                if curl_result:
-                    xml_content = curl_result.encode('utf-8')
-                else:
-                    self.logger.error(f"获取RSS失败: 所有方法都失败")
-                    return []
-            
-            # 解析RSS XML
-            root = ET.fromstring(xml_content)
+            feed = self.fetch_feed(channel_id)
+            if not feed['content']:
+                return []
             
-            ns = {
-                'atom': 'http://www.w3.org/2005/Atom',
-                'yt': 'http://www.youtube.com/xml/schemas/2015',
-                'media': 'http://search.yahoo.com/mrss/'
-            }
-            
-            videos = []
-            entries = root.findall('.//atom:entry', ns)
-            
-            for entry in entries[:max_results]:
-                try:
-                    # 提取视频信息
-                    video_id = entry.find('.//yt:videoId', ns)
-                    title = entry.find('.//atom:title', ns)
-                    published = entry.find('.//atom:published', ns)
-                    updated = entry.find('.//atom:updated', ns)
-                    link = entry.find('.//atom:link[@rel="alternate"]', ns)
-                    
-                    # 媒体信息
-                    media_group = entry.find('.//media:group', ns)
-                    description = None
-                    thumbnail_url = None
-                    
-                    if media_group is not None:
-                        desc_elem = media_group.find('.//media:description', ns)
-                        if desc_elem is not None:
-                            description = desc_elem.text
-                        
-                        thumb_elem = media_group.find('.//media:thumbnail', ns)
-                        if thumb_elem is not None:
-                            thumbnail_url = thumb_elem.get('url')
-                    
-                    video_data = {
-                        'video_id': video_id.text if video_id is not None else '',
-                        'channel_id': channel_id,
-                        'title': title.text if title is not None else 'Unknown',
-                        'description': description or '',
-                        'video_url': link.get('href') if link is not None else '',
-                        'published_at': self._parse_datetime(published.text) if published is not None else datetime.now(),
-                        'updated_at': self._parse_datetime(updated.text) if updated is not None else datetime.now(),
-                        'thumbnail_url': thumbnail_url,
-                        'duration': None,  # RSS中没有时长信息
-                        'view_count': None,  # RSS中没有观看次数
-                        'like_count': None,  # RSS中没有点赞数
-                        'comment_count': None  # RSS中没有评论数
-                    }
-                    
-                    videos.append(video_data)
-                    
-                except Exception as e:
-                    self.logger.error(f"解析视频条目失败: {e}")
-                    continue
-            
-            return videos
+            return self.parse_videos(feed['content'], channel_id, max_results)
             
         except Exception as e:
             self.logger.error(f"获取最新视频失败: {e}")
             return []
     
+    def parse_videos(self, xml_content: bytes, channel_id: str, max_results: int = 50) -> List[Dict]:
+        """解析RSS feed中的视频列表"""
+        try:
+            with timed('parse'):
+                return parse_feed(xml_content, channel_id, max_results)
+            
+        except Exception as e:
+            self.logger.error(f"解析RSS失败: {e}")
+            return []
+    
     def _parse_datetime(self, datetime_str: str) -> datetime:
         """解析RSS中的时间格式"""
-        try:
-            # RSS时间格式: 2024-01-15T10:00:00+00:00
-            if 'T' in datetime_str:
-                datetime_str = datetime_str.split('+')[0].split('Z')[0]
-                return datetime.fromisoformat(datetime_str)
-            else:
-                return datetime.now()
-        except:
-            return datetime.now()
+        return parse_datetime(datetime_str)
 
 def test_rss_monitor():
     """测试RSS监控功能"""
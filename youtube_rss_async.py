@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YouTube RSS监控系统 - 异步客户端
+所有feed都请求同一个主机，使用共享的HTTP/2连接（多路复用、keep-alive），一个事件循环即可同时获取上千个频道；
+结果与同步的 YouTubeRSSMonitor 相同（共用URL解析、条件请求、结果生成和feed解析的代码）
+
+用法: python3 youtube_rss_async.py [--max-in-flight 100] [--limit N] [--compare] [频道URL或ID ...]
+不指定频道时获取数据库中所有活跃频道的最新视频（只读）；--compare 时再用同步客户端获取一遍并逐个比较
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import httpx
+
+from config import Config
+from feed_parser import parse_feed, parse_feed_title
+from resolve_cache import ChannelResolveCache
+from fetch_dispatcher import FetchDispatcher
+from fallback_transport import FallbackTransport
+from metrics import timed
+from youtube_rss import (DEFAULT_HEADERS, feed_url, channel_page_lookup, channel_id_from_page,
+                         conditional_headers, build_feed_result, build_channel_info)
+
+# 与同步客户端的urllib3重试策略一致：网络错误和这些状态码最多重试3次，退避 0/2/4 秒；
+# 带Retry-After的503不重试，由FetchDispatcher暂停整个主机
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 1
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class AsyncYouTubeRSSMonitor:
+    def __init__(self, resolve_cache: ChannelResolveCache = None, dispatcher: FetchDispatcher = None,
+                 fallback: FallbackTransport = None, max_in_flight: int = None):
+        self.logger = logging.getLogger(__name__)
+        # 频道ID解析缓存，为None时每次都访问频道页面
+        self.resolve_cache = resolve_cache
+        # 与同步客户端相同的限流调度器和备用连接（可以与同步客户端共用同一个实例）
+        self.dispatcher = dispatcher or FetchDispatcher()
+        self.fallback = fallback or FallbackTransport()
+        self.max_in_flight = max_in_flight or Config.ASYNC_MAX_IN_FLIGHT
+        self.client = None
+        self._in_flight = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        """在事件循环中创建共享的HTTP/2客户端和在途请求数限制"""
+        # HTTP/2不允许Connection等逐跳头
+        headers = {name: value for name, value in DEFAULT_HEADERS.items() if name != 'Connection'}
+        self.client = httpx.AsyncClient(
+            http2=True,
+            headers=headers,
+            follow_redirects=True,
+            timeout=10,
+            limits=httpx.Limits(
+                max_connections=Config.ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.ASYNC_MAX_CONNECTIONS
+            )
+        )
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """在线程池中执行阻塞调用（解析缓存读写数据库、备用连接）"""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def _safe_request(self, url: str, timeout: int = 10, headers: Dict = None) -> Optional[httpx.Response]:
+        """经过限流调度的HTTP请求"""
+        for attempt in range(Config.RATE_LIMIT_RETRIES + 1):
+            response = await self._send_request(url, timeout, headers)
+
+            # 被限流时调度器会暂停该主机的所有请求，等暂停结束后重试
+            if response is not None and self.dispatcher.observe(url, response) \
+                    and attempt < Config.RATE_LIMIT_RETRIES:
+                continue
+            return response
+
+    async def _send_request(self, url: str, timeout: int, headers: Dict = None) -> Optional[httpx.Response]:
+        """发送单次请求（网络错误和5xx按 RETRY_* 重试），同时进行的请求数不超过 max_in_flight"""
+        async with self._in_flight:
+            error = None
+            for retry in range(RETRY_TOTAL + 1):
+                if retry > 1:
+                    await asyncio.sleep(RETRY_BACKOFF * 2 ** (retry - 1))
+                try:
+                    with timed('throttle'):
+                        await self.dispatcher.acquire_async(url)
+                    with timed('fetch'):
+                        response = await self.client.get(url, timeout=timeout, headers=headers)
+                except httpx.HTTPError as e:
+                    error = e
+                    continue
+
+                if response.status_code in RETRY_STATUSES and retry < RETRY_TOTAL \
+                        and not (response.status_code == 503 and 'Retry-After' in response.headers):
+                    continue
+                return response
+
+            self.logger.error(f"请求失败: {error}")
+            return None
+
+    async def _fallback_request(self, url: str, timeout: int = 10, headers: Dict = None):
+        """经备用连接重试（在线程池中执行），主机熔断时直接返回None"""
+        if not self.fallback.allow(url):
+            self.logger.info(f"备用连接熔断中，跳过: {url}")
+            return None
+
+        with timed('throttle'):
+            await self.dispatcher.acquire_async(url)
+        response = await self._run_blocking(self.fallback.get, url, timeout=timeout, headers=headers)
+        if response is not None:
+            self.dispatcher.observe(url, response)
+        return response
+
+    async def extract_channel_id(self, url: str) -> Optional[str]:
+        """从各种YouTube URL格式提取频道ID（耗时计入resolve阶段，包括访问频道页面）"""
+        with timed('resolve'):
+            return await self._extract_channel_id(url)
+
+    async def _extract_channel_id(self, url: str) -> Optional[str]:
+        try:
+            # 直接的频道ID URL
+            if '/channel/' in url:
+                return url.split('/channel/')[-1].split('/')[0].split('?')[0]
+
+            # 先查解析缓存，命中时不再下载频道页面
+            cache_key = ChannelResolveCache.make_key(url)
+            if self.resolve_cache and cache_key:
+                cached = await self._run_blocking(self.resolve_cache.get, cache_key)
+                if cached is not None:
+                    return cached['channel_id']
+
+            channel_id, definitive = None, False
+
+            # 访问频道页面获取真实的频道ID
+            lookup = channel_page_lookup(url)
+            if lookup:
+                page_url, patterns = lookup
+                channel_id, definitive = channel_id_from_page(await self._safe_request(page_url), patterns)
+
+            # 网络错误等不确定的失败不写入否定缓存
+            if self.resolve_cache and cache_key and (channel_id or definitive):
+                await self._run_blocking(self.resolve_cache.set, cache_key, channel_id)
+
+            return channel_id
+
+        except Exception as e:
+            self.logger.error(f"提取频道ID失败: {e}")
+            return None
+
+    async def get_channel_info(self, channel_url: str) -> Optional[Dict]:
+        """获取频道信息"""
+        try:
+            channel_id = await self.extract_channel_id(channel_url)
+            if not channel_id:
+                self.logger.error("无法提取频道ID")
+                return None
+
+            # 解析缓存中已有频道名称时不再请求RSS
+            cache_keys = [ChannelResolveCache.make_key(channel_url), f"channel:{channel_id}"]
+            title = None
+            if self.resolve_cache:
+                for cache_key in filter(None, cache_keys):
+                    cached = await self._run_blocking(self.resolve_cache.get, cache_key)
+                    if cached and cached['channel_id'] == channel_id and cached['channel_name']:
+                        title = cached['channel_name']
+                        break
+
+            if title is None:
+                # 获取频道RSS信息
+                response = await self._safe_request(feed_url(channel_id))
+
+                if response is None or response.status_code != 200:
+                    self.logger.error(f"获取RSS失败: {response.status_code if response is not None else 'No response'}")
+                    return None
+
+                # 只解析到频道标题为止
+                title = parse_feed_title(response.content)
+
+                if self.resolve_cache and title is not None:
+                    for cache_key in set(filter(None, cache_keys)):
+                        await self._run_blocking(self.resolve_cache.set, cache_key, channel_id, title)
+
+            return build_channel_info(channel_id, title, channel_url)
+
+        except Exception as e:
+            self.logger.error(f"获取频道信息失败: {e}")
+            return None
+
+    async def fetch_feed(self, channel_id: str, feed_state: Dict = None) -> Dict:
+        """获取频道RSS feed，支持条件请求(ETag/Last-Modified)和内容哈希比较（结果与同步客户端相同）"""
+        feed_state = feed_state or {}
+        rss_url = feed_url(channel_id)
+        headers = conditional_headers(feed_state)
+
+        # 首先使用HTTP/2主连接
+        response = await self._safe_request(rss_url, headers=headers or None)
+
+        if response is not None and response.status_code == 429:
+            # 被限流时不再用备用连接绕过，等下次检查
+            self.logger.error(f"获取RSS被限流: {channel_id}")
+            return build_feed_result(feed_state, None)
+
+        if response is None or response.status_code >= 500:
+            # 网络错误或服务器错误时经备用连接再试一次（同样带条件请求头）
+            self.logger.info("主连接请求失败，尝试备用连接")
+            response = await self._fallback_request(rss_url, headers=headers or None)
+
+        result = build_feed_result(feed_state, response)
+        if result['status'] == 'failed':
+            self.logger.error(f"获取RSS失败: {response.status_code if response is not None else '主连接和备用连接都失败'}")
+        return result
+
+    async def get_latest_videos(self, channel_id: str, max_results: int = 50) -> List[Dict]:
+        """获取频道最新视频"""
+        try:
+            feed = await self.fetch_feed(channel_id)
+            if not feed['content']:
+                return []
+
+            return self.parse_videos(feed['content'], channel_id, max_results)
+
+        except Exception as e:
+            self.logger.error(f"获取最新视频失败: {e}")
+            return []
+
+    def parse_videos(self, xml_content: bytes, channel_id: str, max_results: int = 50) -> List[Dict]:
+        """解析RSS feed中的视频列表"""
+        try:
+            with timed('parse'):
+                return parse_feed(xml_content, channel_id, max_results)
+
+        except Exception as e:
+            self.logger.error(f"解析RSS失败: {e}")
+            return []
+
+
+async def poll_latest_videos(monitor: AsyncYouTubeRSSMonitor, channel_ids: List[str],
+                             max_results: int = 50) -> Dict[str, List[Dict]]:
+    """在一个事件循环中同时获取多个频道的最新视频（在途请求数由 monitor.max_in_flight 限制）"""
+    results = await asyncio.gather(*(monitor.get_latest_videos(channel_id, max_results) for channel_id in channel_ids))
+    return dict(zip(channel_ids, results))
+
+
+async def _poll(channel_ids: List[str], urls: List[str], max_in_flight: int, max_results: int):
+    async with AsyncYouTubeRSSMonitor(max_in_flight=max_in_flight) as monitor:
+        if urls:
+            infos = await asyncio.gather(*(monitor.get_channel_info(url) for url in urls))
+            for url, info in zip(urls, infos):
+                if info:
+                    print(f"✓ {url} -> {info['channel_name']} ({info['channel_id']})")
+                    channel_ids.append(info['channel_id'])
+                else:
+                    print(f"❌ 获取频道信息失败: {url}")
+
+        started = time.perf_counter()
+        results = await poll_latest_videos(monitor, channel_ids, max_results)
+        return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用异步客户端获取频道的最新视频')
+    parser.add_argument('channels', nargs='*', help='频道URL或UC开头的频道ID（默认: 数据库中的活跃频道）')
+    parser.add_argument('--max-in-flight', type=int, default=Config.ASYNC_MAX_IN_FLIGHT,
+                        help=f'同时进行的请求数 (默认: {Config.ASYNC_MAX_IN_FLIGHT})')
+    parser.add_argument('--limit', type=int, help='最多获取的频道数')
+    parser.add_argument('--max-results', type=int, default=50, help='每个频道最多解析的视频数 (默认: 50)')
+    parser.add_argument('--compare', action='store_true', help='再用同步客户端获取一遍并比较结果')
+    args = parser.parse_args()
+
+    channel_ids = [value for value in args.channels if value.startswith('UC') and '/' not in value]
+    urls = [value for value in args.channels if value not in channel_ids]
+    if not args.channels:
+        from storage import create_storage
+        db = create_storage()
+        channel_ids = [channel['channel_id'] for channel in db.get_active_channels()]
+        db.close_connection()
+    if args.limit:
+        channel_ids = channel_ids[:args.limit]
+
+    if not channel_ids and not urls:
+        print("❌ 没有要获取的频道")
+        return
+
+    results, elapsed = asyncio.run(_poll(channel_ids, urls, args.max_in_flight, args.max_results))
+    total_videos = sum(len(videos) for videos in results.values())
+    empty = sum(1 for videos in results.values() if not videos)
+    print(f"🎉 异步获取 {len(results)} 个频道, {total_videos} 个视频, 耗时 {elapsed:.2f} 秒 "
+          f"({len(results) / elapsed:.1f} 频道/秒), 无结果 {empty} 个")
+
+    if args.compare:
+        from youtube_rss import YouTubeRSSMonitor
+        monitor = YouTubeRSSMonitor()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=Config.POLL_WORKERS) as executor:
+            sync_results = dict(zip(results, executor.map(
+                lambda channel_id: monitor.get_latest_videos(channel_id, args.max_results), results)))
+        sync_elapsed = time.perf_counter() - started
+
+        different = [channel_id for channel_id in results if results[channel_id] != sync_results[channel_id]]
+        print(f"🔁 同步客户端 ({Config.POLL_WORKERS} 线程) 耗时 {sync_elapsed:.2f} 秒")
+        if different:
+            # 两次获取之间频道可能发布了新视频
+            print(f"⚠️ {len(different)} 个频道的结果不同: {', '.join(different[:10])}")
+        else:
+            print("✅ 同步和异步客户端的结果完全相同")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()